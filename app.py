@@ -1,19 +1,143 @@
 # app.py
 import streamlit as st
+import atexit
+import csv
+import functools
+import io
+import os
+import time
+from collections import deque
 from datetime import datetime
-import pandas as pd
-from database import HospitalDatabase
+from availability import WEEKDAYS
+from backup import SnapshotScheduler, list_snapshots, restore_database, take_snapshot
+from calendar_feed import FEED_FUTURE_DAYS, FEED_PAST_DAYS, DoctorFeeds
+from database import SLOT_TAKEN, HospitalDatabase
+from dedup import scan as scan_for_duplicates
+from maintenance import MAINTENANCE_INTERVAL_SECONDS, MaintenanceWorker
+from reports import FORMATS as REPORT_FORMATS, generate_reports
+from repository import open_database
+from profiling import profiler_from_env, span
+from purge import PURGE_INTERVAL_SECONDS, PurgeWorker
+from scheduler import ClinicDayPlanner, requests_from_csv
+from seed_data import seed_demo_data
+from triage import SEVERITY_LEVELS
+
+# pandas is imported by the tabs that build DataFrames: it takes longer to
+# import than everything else here, and the dashboard never needs it
 
 # Initialize database
 @st.cache_resource
 def get_database():
-    return HospitalDatabase()
+    # HOSPITAL_DB_URL picks the backend (SQLite hospital.db by default);
+    # HOSPITAL_DB_STATS=1 collects per-method query statistics from startup
+    slow_query_ms = os.environ.get("HOSPITAL_SLOW_QUERY_MS")
+    return open_database(
+        instrument=os.environ.get("HOSPITAL_DB_STATS") == "1",
+        slow_query_ms=float(slow_query_ms) if slow_query_ms else None
+    )
+
+@st.cache_resource
+def get_doctor_feeds():
+    # Rendered calendar feeds, shared by all sessions
+    return DoctorFeeds(get_database())
+
+@st.cache_resource
+def get_rerun_timings():
+    # Shared by all sessions; newest entries last
+    return deque(maxlen=500)
+
+@st.cache_resource
+def get_profiler():
+    # None unless HOSPITAL_PROFILE is set; shared by all sessions
+    profiler = profiler_from_env()
+    if profiler is not None and os.environ.get("HOSPITAL_PROFILE_DIR"):
+        atexit.register(profiler.dump, os.environ["HOSPITAL_PROFILE_DIR"])
+    return profiler
+
+BACKUP_DIR = os.environ.get("HOSPITAL_BACKUP_DIR", "backups")
+
+@st.cache_resource
+def get_snapshot_scheduler():
+    # HOSPITAL_SNAPSHOT_INTERVAL (seconds) turns on periodic snapshots
+    interval = os.environ.get("HOSPITAL_SNAPSHOT_INTERVAL")
+    if not interval or not isinstance(get_database(), HospitalDatabase):
+        return None
+    keep = int(os.environ.get("HOSPITAL_SNAPSHOT_KEEP", "24"))
+    return SnapshotScheduler(get_database(), BACKUP_DIR, float(interval), keep).start()
+
+@st.cache_resource
+def get_purge_worker():
+    # Removes soft-deleted rows in the background; HOSPITAL_PURGE_INTERVAL=0 disables it
+    interval = float(os.environ.get("HOSPITAL_PURGE_INTERVAL", PURGE_INTERVAL_SECONDS))
+    if interval <= 0:
+        return None
+    return PurgeWorker(get_database(), interval).start()
+
+@st.cache_resource
+def get_maintenance_worker():
+    # Statistics, incremental vacuum and integrity checks when due;
+    # HOSPITAL_MAINTENANCE_INTERVAL=0 disables it
+    interval = float(os.environ.get("HOSPITAL_MAINTENANCE_INTERVAL", MAINTENANCE_INTERVAL_SECONDS))
+    if interval <= 0 or not isinstance(get_database(), HospitalDatabase):
+        return None
+    return MaintenanceWorker(get_database(), interval).start()
 
 db = get_database()
+profiler = get_profiler()
+snapshot_scheduler = get_snapshot_scheduler()
+purge_worker = get_purge_worker()
+maintenance_worker = get_maintenance_worker()
+
+# Fragments (st.fragment, or st.experimental_fragment before 1.37) rerun only
+# their own function when a widget inside them changes
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+def tab_fragment(func=None, *, run_every=None):
+    """Run a management tab as an independently rerunning fragment, also every
+    ``run_every`` seconds when given"""
+    if func is None:
+        return functools.partial(tab_fragment, run_every=run_every)
+    
+    @functools.wraps(func)
+    def run_tab():
+        if profiler is None:
+            return func()
+        if profiler.in_rerun():
+            with profiler.span(func.__name__):
+                return func()
+        # Widget interaction inside this tab: only the fragment reruns
+        with profiler.rerun(f"fragment:{func.__name__}"):
+            return func()
+    
+    if not _fragment:
+        return run_tab
+    return _fragment(run_tab, run_every=run_every) if run_every else _fragment(run_tab)
+
+def diagnostics_enabled():
+    if os.environ.get("HOSPITAL_DIAGNOSTICS") == "1":
+        return True
+    # The page stays hidden unless the URL carries ?diagnostics=1
+    if hasattr(st, "query_params"):
+        return st.query_params.get("diagnostics") == "1"
+    return st.experimental_get_query_params().get("diagnostics") == ["1"]
 
 def get_current_datetime():
     return datetime.now().strftime("%d-%m-%Y %H:%M:%S")
 
+def shown_version(kind, record):
+    """Version of ``record`` as shown by the previous run of its edit form.
+    
+    Sent back as expected_version, so saving over a change another session
+    made in the meantime fails instead of silently overwriting it.
+    """
+    key = f"edit_{kind}_version_{record['id']}"
+    version = st.session_state.get(key, record['version'])
+    st.session_state[key] = record['version']
+    return version
+
+def forget_shown_version(kind, record_id):
+    st.session_state.pop(f"edit_{kind}_version_{record_id}", None)
+
 def main():
     st.set_page_config(
         page_title="Hospital Appointment Manager",
@@ -62,6 +186,8 @@ def main():
         "Appointments Management": "📅 Appointments",
         "Reset All Data": "🔄 Reset Data"
     }
+    if diagnostics_enabled():
+        menu_options["Diagnostics"] = "🩺 Diagnostics"
     choice = st.radio(
         "",
         list(menu_options.keys()),
@@ -71,30 +197,39 @@ def main():
     )
     st.markdown("<hr style='margin: 0.5em 0 2em 0'>", unsafe_allow_html=True)
     
-    # Load data from database
-    patients = db.get_all_patients()
-    doctors = db.get_all_doctors()
-    appointments = db.get_all_appointments()
-    
     # Dashboard
     if choice == "Dashboard":
-        show_dashboard(patients, doctors, appointments)
+        # Management pages load their own data per tab
+        with span(profiler, "load_data"):
+            patients = db.get_all_patients()
+            doctors = db.get_all_doctors()
+            appointments = db.get_all_appointments()
+        with span(profiler, "show_dashboard"):
+            show_dashboard(patients, doctors, appointments)
     
     # Patients Management
     elif choice == "Patients Management":
-        patients_management()
+        with span(profiler, "patients_management"):
+            patients_management()
     
     # Doctors Management
     elif choice == "Doctors Management":
-        doctors_management()
+        with span(profiler, "doctors_management"):
+            doctors_management()
     
     # Appointments Management
     elif choice == "Appointments Management":
-        appointments_management(patients, doctors)
+        with span(profiler, "appointments_management"):
+            appointments_management()
     
     # Reset Data
     elif choice == "Reset All Data":
-        reset_data()
+        with span(profiler, "reset_data"):
+            reset_data()
+    
+    # Diagnostics (hidden)
+    elif choice == "Diagnostics":
+        diagnostics()
 
 def show_dashboard(patients, doctors, appointments):
     st.header("📊 Hospital Overview")
@@ -155,438 +290,1055 @@ def show_dashboard(patients, doctors, appointments):
         else:
             st.info("📝 No appointments scheduled yet. Schedule one from the Appointments Management section.")
 
+    st.markdown("---")
+    with st.expander("Demo / Test data"):
+        st.caption("Insert sample patients, doctors and appointments. Records with existing IDs are skipped.")
+        if st.button("Seed demo data"):
+            seed_demo_data(db)
+            st.success("Demo data added! Switch tabs or refresh to see it.")
+
 def patients_management():
     st.header("👥 Patients Management")
     st.caption("Add, view, edit, or remove patient records")
     
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "➕ Add Patient",
         "📋 View All",
         "✏️ Edit Patient",
         "🔍 Search Patient",
-        "❌ Delete Patient"
+        "❌ Delete Patient",
+        "🔁 Duplicates"
     ])
     
     with tab1:
-        st.subheader("Add New Patient")
-        with st.form("add_patient_form"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                pid = st.text_input("Patient ID*")
-                name = st.text_input("Patient Name*")
-                age = st.number_input("Age", min_value=0, max_value=150, value=0)
-                gender = st.selectbox("Gender", ["Male", "Female", "Other"])
-            
-            with col2:
-                address = st.text_area("Address")
-                disease = st.text_input("Disease*")
-                referred_by = st.text_input("Referred By")
-            
-            if st.form_submit_button("Add Patient"):
-                if pid and name and disease:
-                    # Check if patient ID already exists
-                    existing_patient = db.get_patient_by_id(pid)
-                    if existing_patient:
-                        st.error("Patient ID already exists! Please use a different ID.")
-                    else:
-                        patient_data = {
-                            "id": pid,
-                            "name": name,
-                            "age": age,
-                            "gender": gender,
-                            "address": address,
-                            "disease": disease,
-                            "REFERRED_BY": referred_by,
-                            "admissionDateTime": get_current_datetime(),
-                        }
-                        db.add_patient(patient_data)
-                        st.success("Patient added successfully!")
-                else:
-                    st.error("Please fill in all required fields (*)")
+        add_patient_tab()
     
     with tab2:
-        st.subheader("All Patients")
-        patients = db.get_all_patients()
-        if patients:
-            patients_df = pd.DataFrame(patients)
-            st.dataframe(patients_df, use_container_width=True)
-        else:
-            st.info("No patients found")
+        view_patients_tab()
     
     with tab3:
-        st.subheader("Edit Patient")
-        patients = db.get_all_patients()
-        if patients:
-            patient_ids = [p['id'] for p in patients]
-            selected_pid = st.selectbox("Select Patient ID to edit", patient_ids)
+        edit_patient_tab()
+    
+    with tab4:
+        search_patient_tab()
+    
+    with tab5:
+        delete_patient_tab()
+    
+    with tab6:
+        duplicate_patients_tab()
+
+@tab_fragment
+def add_patient_tab():
+    import pandas as pd
+    st.subheader("Add New Patient")
+    with st.form("add_patient_form"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            pid = st.text_input("Patient ID*")
+            name = st.text_input("Patient Name*")
+            age = st.number_input("Age", min_value=0, max_value=150, value=0)
+            gender = st.selectbox("Gender", ["Male", "Female", "Other"])
+        
+        with col2:
+            address = st.text_area("Address")
+            disease = st.text_input("Disease*")
+            referred_by = st.text_input("Referred By")
+        
+        allow_duplicate = False
+        if isinstance(db, HospitalDatabase):
+            allow_duplicate = st.checkbox("Register even if a similar patient already exists")
+        
+        if st.form_submit_button("Add Patient"):
+            if pid and name and disease:
+                # Check if patient ID already exists
+                existing_patient = db.get_patient_by_id(pid)
+                if existing_patient:
+                    st.error("Patient ID already exists! Please use a different ID.")
+                else:
+                    patient_data = {
+                        "id": pid,
+                        "name": name,
+                        "age": age,
+                        "gender": gender,
+                        "address": address,
+                        "disease": disease,
+                        "REFERRED_BY": referred_by,
+                        "admissionDateTime": get_current_datetime(),
+                    }
+                    matches = []
+                    if isinstance(db, HospitalDatabase) and not allow_duplicate:
+                        matches = db.find_duplicate_patients(patient_data)
+                    if matches:
+                        st.warning("This looks like a patient who is already registered. Use the existing "
+                                   "record, or tick the box above to register anyway.")
+                        st.dataframe(pd.DataFrame(matches), use_container_width=True)
+                    else:
+                        db.add_patient(patient_data)
+                        st.success("Patient added successfully!")
+            else:
+                st.error("Please fill in all required fields (*)")
+
+@tab_fragment
+def view_patients_tab():
+    import pandas as pd
+    st.subheader("All Patients")
+    patients = db.get_all_patients()
+    if patients:
+        patients_df = pd.DataFrame(patients)
+        st.dataframe(patients_df, use_container_width=True)
+    else:
+        st.info("No patients found")
+
+@tab_fragment
+def edit_patient_tab():
+    st.subheader("Edit Patient")
+    patients = db.get_all_patients()
+    if patients:
+        patient_ids = [p['id'] for p in patients]
+        selected_pid = st.selectbox("Select Patient ID to edit", patient_ids)
+        
+        if selected_pid:
+            patient = db.get_patient_by_id(selected_pid)
+            expected_version = shown_version("patient", patient)
             
-            if selected_pid:
-                patient = db.get_patient_by_id(selected_pid)
+            with st.form("edit_patient_form"):
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    new_name = st.text_input("Name", value=patient['name'])
+                    new_age = st.number_input("Age", value=patient['age'])
+                    new_gender = st.selectbox("Gender", ["Male", "Female", "Other"], 
+                                            index=["Male", "Female", "Other"].index(patient['gender']))
+                
+                with col2:
+                    new_address = st.text_area("Address", value=patient['address'])
+                    new_disease = st.text_input("Disease", value=patient['disease'])
+                    new_referred_by = st.text_input("Referred By", value=patient['REFERRED_BY'])
                 
-                with st.form("edit_patient_form"):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        new_name = st.text_input("Name", value=patient['name'])
-                        new_age = st.number_input("Age", value=patient['age'])
-                        new_gender = st.selectbox("Gender", ["Male", "Female", "Other"], 
-                                                index=["Male", "Female", "Other"].index(patient['gender']))
-                    
-                    with col2:
-                        new_address = st.text_area("Address", value=patient['address'])
-                        new_disease = st.text_input("Disease", value=patient['disease'])
-                        new_referred_by = st.text_input("Referred By", value=patient['REFERRED_BY'])
-                    
-                    if st.form_submit_button("Update Patient"):
-                        updated_data = {
-                            "name": new_name,
-                            "age": new_age,
-                            "gender": new_gender,
-                            "address": new_address,
-                            "disease": new_disease,
-                            "REFERRED_BY": new_referred_by,
-                            "admissionDateTime": get_current_datetime(),
-                        }
-                        db.update_patient(selected_pid, updated_data)
+                if st.form_submit_button("Update Patient"):
+                    updated_data = {
+                        "name": new_name,
+                        "age": new_age,
+                        "gender": new_gender,
+                        "address": new_address,
+                        "disease": new_disease,
+                        "REFERRED_BY": new_referred_by,
+                        "admissionDateTime": get_current_datetime(),
+                    }
+                    ok, message = db.update_patient(selected_pid, updated_data, expected_version)
+                    forget_shown_version("patient", selected_pid)
+                    if ok:
                         st.success("Patient updated successfully!")
-        else:
-            st.info("No patients available to edit")
+                    else:
+                        st.error(message)
+    else:
+        st.info("No patients available to edit")
+
+@tab_fragment
+def search_patient_tab():
+    st.subheader("View Patient by ID")
+    patients = db.get_all_patients()
+    if patients:
+        patient_ids = [p['id'] for p in patients]
+        selected_pid = st.selectbox("Select Patient ID", patient_ids)
+        
+        if selected_pid:
+            patient = db.get_patient_by_id(selected_pid)
+            st.json(patient)
+            patient_timeline(selected_pid)
+    else:
+        st.info("No patients available")
+
+def patient_timeline(patient_id):
+    import pandas as pd
+    st.markdown("**History**")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start = st.date_input("From", value=None, key="timeline_start")
+    with col2:
+        end = st.date_input("To", value=None, key="timeline_end")
+    with col3:
+        limit = st.number_input("Show at most", min_value=1, max_value=500, value=50, key="timeline_limit")
     
-    with tab4:
-        st.subheader("View Patient by ID")
-        patients = db.get_all_patients()
-        if patients:
-            patient_ids = [p['id'] for p in patients]
-            selected_pid = st.selectbox("Select Patient ID", patient_ids)
+    # Read newest first off the (patient, time) index, archived appointments included
+    events = db.get_patient_timeline(patient_id, start, end, int(limit))
+    if events:
+        timeline_df = pd.DataFrame(events).rename(columns={
+            'dateTime': 'When',
+            'kind': 'Event',
+            'id': 'ID',
+            'doctorName': 'Doctor',
+            'note': 'Note'
+        })
+        st.dataframe(timeline_df[['When', 'Event', 'ID', 'Doctor', 'Note']], use_container_width=True, hide_index=True)
+    else:
+        st.info("No history in this range")
+
+@tab_fragment
+def delete_patient_tab():
+    st.subheader("Delete Patient")
+    patients = db.get_all_patients()
+    if patients:
+        patient_ids = [p['id'] for p in patients]
+        selected_pid = st.selectbox("Select Patient ID to delete", patient_ids, key="delete_patient")
+        
+        if selected_pid:
+            patient = db.get_patient_by_id(selected_pid)
+            st.warning(f"Are you sure you want to delete patient: {patient['name']} (ID: {patient['id']})?")
             
-            if selected_pid:
-                patient = db.get_patient_by_id(selected_pid)
-                st.json(patient)
-        else:
-            st.info("No patients available")
+            if st.button("Confirm Delete"):
+                db.delete_patient(selected_pid)
+                st.success("Patient deleted successfully!")
+    else:
+        st.info("No patients available to delete")
+
+@tab_fragment
+def duplicate_patients_tab():
+    import pandas as pd
+    st.subheader("Duplicate Patients")
+    if not isinstance(db, HospitalDatabase):
+        st.info("Duplicate detection is only available with the SQLite database")
+        return
+    st.caption("Finds patients registered more than once under different IDs, by similar name, age, "
+               "gender and address. Merging moves the duplicate's appointments to the record you keep.")
     
-    with tab5:
-        st.subheader("Delete Patient")
+    if st.button("Scan for duplicates"):
         patients = db.get_all_patients()
-        if patients:
-            patient_ids = [p['id'] for p in patients]
-            selected_pid = st.selectbox("Select Patient ID to delete", patient_ids, key="delete_patient")
-            
-            if selected_pid:
-                patient = db.get_patient_by_id(selected_pid)
-                st.warning(f"Are you sure you want to delete patient: {patient['name']} (ID: {patient['id']})?")
-                
-                if st.button("Confirm Delete"):
-                    db.delete_patient(selected_pid)
-                    st.success("Patient deleted successfully!")
+        st.session_state.duplicate_pairs = scan_for_duplicates(patients)
+        st.session_state.duplicate_patients = {p['id']: p for p in patients}
+    pairs = st.session_state.get('duplicate_pairs')
+    if pairs is None:
+        return
+    if not pairs:
+        st.success("No likely duplicates found")
+        return
+    patients = st.session_state.duplicate_patients
+    labels = {f"{first} {patients[first]['name']} / {second} {patients[second]['name']} ({similarity:.0%})":
+              (first, second) for similarity, first, second in pairs}
+    first, second = labels[st.selectbox(f"{len(pairs)} likely duplicate pairs", list(labels))]
+    st.dataframe(pd.DataFrame([patients[first], patients[second]]), use_container_width=True)
+    keep_id = st.radio("Keep", [first, second], horizontal=True)
+    duplicate_id = second if keep_id == first else first
+    if st.button(f"Merge {duplicate_id} into {keep_id}"):
+        ok, message = db.merge_patients(keep_id, duplicate_id)
+        if ok:
+            st.session_state.duplicate_pairs = [pair for pair in pairs if duplicate_id not in pair[1:]]
+            st.success(message)
         else:
-            st.info("No patients available to delete")
+            st.error(message)
 
 def doctors_management():
     st.header("👨‍⚕️ Doctors Management")
     st.caption("Add, view, edit, or remove doctor records")
     
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
         "➕ Add Doctor",
         "📋 View All",
         "✏️ Edit Doctor",
         "🔍 Search Doctor",
-        "❌ Delete Doctor"
+        "❌ Delete Doctor",
+        "🕒 Availability",
+        "🖨️ Day Sheets"
     ])
     
     with tab1:
-        st.subheader("Add New Doctor")
-        with st.form("add_doctor_form"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                did = st.text_input("Doctor ID*")
-                name = st.text_input("Doctor Name*")
-            
-            with col2:
-                specialization = st.text_input("Specialization*")
-                experience = st.number_input("Experience (years)", min_value=0, max_value=50, value=0)
-            
-            if st.form_submit_button("Add Doctor"):
-                if did and name and specialization:
-                    # Check if doctor ID already exists
-                    existing_doctor = db.get_doctor_by_id(did)
-                    if existing_doctor:
-                        st.error("Doctor ID already exists! Please use a different ID.")
-                    else:
-                        doctor_data = {
-                            "id": did,
-                            "name": name,
-                            "specialization": specialization,
-                            "experience": experience,
-                        }
-                        db.add_doctor(doctor_data)
-                        st.success("Doctor added successfully!")
-                else:
-                    st.error("Please fill in all required fields (*)")
+        add_doctor_tab()
     
     with tab2:
-        st.subheader("All Doctors")
-        doctors = db.get_all_doctors()
-        if doctors:
-            doctors_df = pd.DataFrame(doctors)
-            st.dataframe(doctors_df, use_container_width=True)
-        else:
-            st.info("No doctors found")
+        view_doctors_tab()
     
     with tab3:
-        st.subheader("Edit Doctor")
-        doctors = db.get_all_doctors()
-        if doctors:
-            doctor_ids = [d['id'] for d in doctors]
-            selected_did = st.selectbox("Select Doctor ID to edit", doctor_ids)
-            
-            if selected_did:
-                doctor = db.get_doctor_by_id(selected_did)
-                
-                with st.form("edit_doctor_form"):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        new_name = st.text_input("Name", value=doctor['name'])
-                        new_specialization = st.text_input("Specialization", value=doctor['specialization'])
-                    
-                    with col2:
-                        new_experience = st.number_input("Experience (years)", value=doctor['experience'])
-                    
-                    if st.form_submit_button("Update Doctor"):
-                        updated_data = {
-                            "name": new_name,
-                            "specialization": new_specialization,
-                            "experience": new_experience,
-                        }
-                        db.update_doctor(selected_did, updated_data)
-                        st.success("Doctor updated successfully!")
-        else:
-            st.info("No doctors available to edit")
+        edit_doctor_tab()
     
     with tab4:
-        st.subheader("View Doctor by ID")
-        doctors = db.get_all_doctors()
-        if doctors:
-            doctor_ids = [d['id'] for d in doctors]
-            selected_did = st.selectbox("Select Doctor ID", doctor_ids, key="view_doctor")
-            
-            if selected_did:
-                doctor = db.get_doctor_by_id(selected_did)
-                st.json(doctor)
-        else:
-            st.info("No doctors available")
+        search_doctor_tab()
     
     with tab5:
-        st.subheader("Delete Doctor")
-        doctors = db.get_all_doctors()
-        if doctors:
-            doctor_ids = [d['id'] for d in doctors]
-            selected_did = st.selectbox("Select Doctor ID to delete", doctor_ids, key="delete_doctor")
+        delete_doctor_tab()
+    
+    with tab6:
+        doctor_availability_tab()
+    
+    with tab7:
+        day_sheets_tab()
+
+@tab_fragment
+def add_doctor_tab():
+    st.subheader("Add New Doctor")
+    with st.form("add_doctor_form"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            did = st.text_input("Doctor ID*")
+            name = st.text_input("Doctor Name*")
+        
+        with col2:
+            specialization = st.text_input("Specialization*")
+            experience = st.number_input("Experience (years)", min_value=0, max_value=50, value=0)
+        
+        if st.form_submit_button("Add Doctor"):
+            if did and name and specialization:
+                # Check if doctor ID already exists
+                existing_doctor = db.get_doctor_by_id(did)
+                if existing_doctor:
+                    st.error("Doctor ID already exists! Please use a different ID.")
+                else:
+                    doctor_data = {
+                        "id": did,
+                        "name": name,
+                        "specialization": specialization,
+                        "experience": experience,
+                    }
+                    db.add_doctor(doctor_data)
+                    st.success("Doctor added successfully!")
+            else:
+                st.error("Please fill in all required fields (*)")
+
+@tab_fragment
+def view_doctors_tab():
+    import pandas as pd
+    st.subheader("All Doctors")
+    doctors = db.get_all_doctors()
+    if doctors:
+        doctors_df = pd.DataFrame(doctors)
+        st.dataframe(doctors_df, use_container_width=True)
+        if isinstance(db, HospitalDatabase):
+            doctor_calendar_download(doctors)
+    else:
+        st.info("No doctors found")
+
+def doctor_calendar_download(doctors):
+    labels = {f"{d['name']} ({d['id']})": d['id'] for d in doctors}
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        doctor_id = labels[st.selectbox("Calendar (.ics) for", list(labels), key="calendar_doctor")]
+    # Unchanged schedules come from the rendered feed cache (see calendar_feed.py)
+    status, _, body = get_doctor_feeds().respond(doctor_id)
+    with col2:
+        st.download_button("Download Calendar", b"".join(body) if status.startswith("200") else b"",
+                           file_name=f"{doctor_id}.ics", mime="text/calendar", disabled=not status.startswith("200"))
+    st.caption(f"Appointments from {FEED_PAST_DAYS} days back to {FEED_FUTURE_DAYS} days ahead. "
+               "For a live subscription run `python calendar_feed.py serve`.")
+
+@tab_fragment
+def edit_doctor_tab():
+    st.subheader("Edit Doctor")
+    doctors = db.get_all_doctors()
+    if doctors:
+        doctor_ids = [d['id'] for d in doctors]
+        selected_did = st.selectbox("Select Doctor ID to edit", doctor_ids)
+        
+        if selected_did:
+            doctor = db.get_doctor_by_id(selected_did)
+            expected_version = shown_version("doctor", doctor)
             
-            if selected_did:
-                doctor = db.get_doctor_by_id(selected_did)
-                st.warning(f"Are you sure you want to delete doctor: {doctor['name']} (ID: {doctor['id']})?")
+            with st.form("edit_doctor_form"):
+                col1, col2 = st.columns(2)
                 
-                if st.button("Confirm Delete"):
-                    db.delete_doctor(selected_did)
-                    st.success("Doctor deleted successfully!")
-        else:
-            st.info("No doctors available to delete")
+                with col1:
+                    new_name = st.text_input("Name", value=doctor['name'])
+                    new_specialization = st.text_input("Specialization", value=doctor['specialization'])
+                
+                with col2:
+                    new_experience = st.number_input("Experience (years)", value=doctor['experience'])
+                
+                if st.form_submit_button("Update Doctor"):
+                    updated_data = {
+                        "name": new_name,
+                        "specialization": new_specialization,
+                        "experience": new_experience,
+                    }
+                    ok, message = db.update_doctor(selected_did, updated_data, expected_version)
+                    forget_shown_version("doctor", selected_did)
+                    if ok:
+                        st.success("Doctor updated successfully!")
+                    else:
+                        st.error(message)
+    else:
+        st.info("No doctors available to edit")
 
-def appointments_management(patients, doctors):
+@tab_fragment
+def search_doctor_tab():
+    st.subheader("View Doctor by ID")
+    doctors = db.get_all_doctors()
+    if doctors:
+        doctor_ids = [d['id'] for d in doctors]
+        selected_did = st.selectbox("Select Doctor ID", doctor_ids, key="view_doctor")
+        
+        if selected_did:
+            doctor = db.get_doctor_by_id(selected_did)
+            st.json(doctor)
+    else:
+        st.info("No doctors available")
+
+@tab_fragment
+def delete_doctor_tab():
+    st.subheader("Delete Doctor")
+    doctors = db.get_all_doctors()
+    if doctors:
+        doctor_ids = [d['id'] for d in doctors]
+        selected_did = st.selectbox("Select Doctor ID to delete", doctor_ids, key="delete_doctor")
+        
+        if selected_did:
+            doctor = db.get_doctor_by_id(selected_did)
+            st.warning(f"Are you sure you want to delete doctor: {doctor['name']} (ID: {doctor['id']})?")
+            
+            if st.button("Confirm Delete"):
+                db.delete_doctor(selected_did)
+                st.success("Doctor deleted successfully!")
+    else:
+        st.info("No doctors available to delete")
+
+@tab_fragment
+def doctor_availability_tab():
+    import pandas as pd
+    st.subheader("Working Hours")
+    doctors = db.get_all_doctors()
+    if not doctors:
+        st.info("No doctors available")
+        return
+    
+    doctor_ids = [d['id'] for d in doctors]
+    selected_did = st.selectbox("Select Doctor ID", doctor_ids, key="availability_doctor")
+    doctor = db.get_doctor_by_id(selected_did)
+    availability = db.get_doctor_availability(selected_did)
+    if availability is None:
+        st.caption(f"{doctor['name']} has no working hours set and can be booked at any time")
+    
+    with st.form("doctor_availability_form"):
+        weekly = availability['weekly'] if availability else {}
+        slot_minutes = st.number_input(
+            "Slot length (minutes)", min_value=5, max_value=240, step=5,
+            value=availability['slotMinutes'] if availability else 30
+        )
+        st.caption("Shifts per weekday as HH:MM-HH:MM, comma separated (e.g. 09:00-13:00, 14:00-17:00)")
+        shift_inputs = {}
+        for weekday, day_name in enumerate(WEEKDAYS):
+            shift_inputs[weekday] = st.text_input(
+                day_name,
+                value=", ".join(f"{start}-{end}" for start, end in weekly.get(weekday, [])),
+                key=f"availability_{weekday}"
+            )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            save = st.form_submit_button("Save Working Hours")
+        with col2:
+            clear = st.form_submit_button("Remove Working Hours")
+        if save:
+            try:
+                template = {
+                    weekday: [tuple(part.strip().split("-", 1)) for part in text.split(",") if part.strip()]
+                    for weekday, text in shift_inputs.items()
+                }
+                db.set_doctor_availability(selected_did, template, int(slot_minutes))
+                st.success("Working hours saved!")
+            except ValueError as e:
+                st.error(f"Invalid working hours: {e}")
+        if clear:
+            db.clear_doctor_availability(selected_did)
+            st.success("Working hours removed")
+    
+    st.subheader("Leave and Extra Hours")
+    with st.form("availability_exception_form"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            exception_day = st.date_input("Date", key="availability_exception_day")
+        with col2:
+            exception_start = st.text_input("From", value="00:00")
+        with col3:
+            exception_end = st.text_input("To", value="24:00")
+        exception_kind = st.radio("Type", ["Unavailable", "Extra hours"], horizontal=True)
+        reason = st.text_input("Reason")
+        if st.form_submit_button("Add"):
+            try:
+                db.add_availability_exception(selected_did, exception_day, exception_start, exception_end,
+                                              exception_kind == "Extra hours", reason)
+                st.success("Exception added!")
+            except ValueError as e:
+                st.error(str(e))
+    
+    exceptions = db.get_availability_exceptions(selected_did)
+    if exceptions:
+        st.dataframe(pd.DataFrame(exceptions), use_container_width=True)
+        exception_ids = [e['id'] for e in exceptions]
+        remove_id = st.selectbox("Exception to remove", exception_ids, key="availability_exception_remove")
+        if st.button("Remove Exception"):
+            db.delete_availability_exception(remove_id)
+            st.success("Exception removed")
+    
+    preview_day = st.date_input("Free slots on", key="availability_preview_day")
+    free_slots = db.get_free_slots(doctor['name'], preview_day)
+    if free_slots is None:
+        st.info("No working hours set")
+    elif free_slots:
+        st.write(", ".join(free_slots))
+    else:
+        st.info(f"No free slots on {preview_day.strftime('%d-%m-%Y')}")
+
+@tab_fragment
+def day_sheets_tab():
+    import tempfile
+    import zipfile
+    st.subheader("Printable Day Sheets")
+    if not isinstance(db, HospitalDatabase):
+        st.info("Day sheets are only available with the SQLite database")
+        return
+    st.caption("One schedule per doctor and a hospital summary for the day. Open the HTML sheets in a browser "
+               "to print them or save them as PDF. Also `python reports.py --date dd-mm-YYYY`.")
+    col1, col2 = st.columns(2)
+    with col1:
+        day = st.date_input("Day", key="day_sheets_day")
+    with col2:
+        fmt = st.selectbox("Format", REPORT_FORMATS, key="day_sheets_format")
+    if st.button("Generate Day Sheets"):
+        with tempfile.TemporaryDirectory() as out_dir:
+            result = generate_reports(db, day, out_dir, fmt)
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+                for name in sorted(os.listdir(out_dir)):
+                    zf.write(os.path.join(out_dir, name), name)
+        st.success(f"{result['reports']} day sheets with {result['appointments']} appointments "
+                   f"in {result['seconds']:.2f}s")
+        st.download_button("Download Day Sheets (.zip)", archive.getvalue(),
+                           file_name=f"day-sheets-{day.strftime('%Y-%m-%d')}.zip", mime="application/zip")
+
+def appointments_management():
     st.header("📅 Appointments Management")
     st.caption("Schedule, view, modify, or cancel appointments")
     
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
         "➕ New Appointment",
         "📋 View All",
         "✏️ Edit Appointment",
         "🔍 Search Appointment",
-        "❌ Cancel Appointment"
+        "❌ Cancel Appointment",
+        "⏳ Waitlist",
+        "🗓️ Plan Clinic Day",
+        "🚑 Walk-ins"
     ])
     
     with tab1:
-        st.subheader("Add New Appointment")
-        with st.form("add_appointment_form"):
-            aid = st.text_input("Appointment ID*")
-            
-            # Get available patients and doctors
-            patient_names = [p['name'] for p in patients]
-            doctor_names = [d['name'] for d in doctors]
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if patient_names:
-                    patient_name = st.selectbox("Patient Name*", patient_names)
-                else:
-                    st.warning("No patients available. Please add patients first.")
-                    patient_name = ""
-            
-            with col2:
-                if doctor_names:
-                    doctor_name = st.selectbox("Doctor Name*", doctor_names)
-                else:
-                    st.warning("No doctors available. Please add doctors first.")
-                    doctor_name = ""
-            
-            # Date and time selection
-            col1, col2 = st.columns(2)
-            with col1:
-                appointment_date = st.date_input(
-                    "Appointment Date*",
-                    help="Select the date for the appointment"
-                )
-            with col2:
-                appointment_time = st.time_input(
-                    "Appointment Time*",
-                    help="Select the time (appointments are in 30-minute slots)"
-                )
-            
-            if st.form_submit_button("Add Appointment"):
-                if aid and patient_name and doctor_name and appointment_date and appointment_time:
-                    # Format the appointment datetime
-                    appointment_datetime = datetime.combine(
-                        appointment_date,
-                        appointment_time
-                    ).strftime("%d-%m-%Y %H:%M:%S")
-                    
-                    # Check if appointment ID already exists
-                    existing_appointment = db.get_appointment_by_id(aid)
-                    if existing_appointment:
-                        st.error("Appointment ID already exists! Please use a different ID.")
-                    else:
-                        appointment_data = {
-                            "id": aid,
-                            "patientName": patient_name,
-                            "doctorName": doctor_name,
-                            "appointmentDateTime": appointment_datetime,
-                        }
-                        db.add_appointment(appointment_data)
-                        st.success("Appointment added successfully!")
-                else:
-                    st.error("Please fill in all required fields (*)")
+        add_appointment_tab()
     
     with tab2:
-        st.subheader("All Appointments")
-        appointments = db.get_all_appointments()
+        view_appointments_tab()
+    
+    with tab3:
+        edit_appointment_tab()
+    
+    with tab4:
+        search_appointment_tab()
+    
+    with tab5:
+        delete_appointment_tab()
+    
+    with tab6:
+        waitlist_tab()
+    
+    with tab7:
+        plan_clinic_day_tab()
+    
+    with tab8:
+        walk_ins_tab()
+
+@tab_fragment
+def add_appointment_tab():
+    st.subheader("Add New Appointment")
+    patients = db.get_all_patients()
+    doctors = db.get_all_doctors()
+    with st.form("add_appointment_form"):
+        aid = st.text_input("Appointment ID*")
         
-        if appointments:
-            # Add filter by date
-            filter_date = st.date_input(
-                "Filter by Date",
-                help="Show appointments for a specific date"
+        # Get available patients and doctors
+        patient_names = [p['name'] for p in patients]
+        doctor_names = [d['name'] for d in doctors]
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            if patient_names:
+                patient_name = st.selectbox("Patient Name*", patient_names)
+            else:
+                st.warning("No patients available. Please add patients first.")
+                patient_name = ""
+        
+        with col2:
+            if doctor_names:
+                doctor_name = st.selectbox("Doctor Name*", doctor_names)
+            else:
+                st.warning("No doctors available. Please add doctors first.")
+                doctor_name = ""
+        
+        # Date and time selection
+        col1, col2 = st.columns(2)
+        with col1:
+            appointment_date = st.date_input(
+                "Appointment Date*",
+                help="Select the date for the appointment"
             )
-            
-            # Filter appointments by selected date
-            filtered_appointments = []
-            for apt in appointments:
-                apt_date = datetime.strptime(apt['appointmentDateTime'], "%d-%m-%Y %H:%M:%S").date()
-                if apt_date == filter_date:
-                    filtered_appointments.append(apt)
-            
-            if filtered_appointments:
-                appointments_df = pd.DataFrame(filtered_appointments)
-                
-                # Format the datetime column for better display
-                appointments_df['Time'] = pd.to_datetime(appointments_df['appointmentDateTime']).dt.strftime('%I:%M %p')
-                appointments_df = appointments_df.rename(columns={
-                    'patientName': 'Patient',
-                    'doctorName': 'Doctor',
-                    'id': 'ID'
-                })
-                appointments_df = appointments_df[['ID', 'Patient', 'Doctor', 'Time']]
+        with col2:
+            appointment_time = st.time_input(
+                "Appointment Time*",
+                help="Select the time (appointments are in 30-minute slots)"
+            )
+        
+        join_waitlist = False
+        if isinstance(db, HospitalDatabase):
+            join_waitlist = st.checkbox("If this slot is taken, put the patient on the waitlist for that day")
+        
+        if st.form_submit_button("Add Appointment"):
+            if aid and patient_name and doctor_name and appointment_date and appointment_time:
+                # Format the appointment datetime
+                appointment_datetime = datetime.combine(
+                    appointment_date,
+                    appointment_time
+                ).strftime("%d-%m-%Y %H:%M:%S")
                 
-                st.dataframe(appointments_df, use_container_width=True)
+                # Check if appointment ID already exists
+                existing_appointment = db.get_appointment_by_id(aid)
+                if existing_appointment:
+                    st.error("Appointment ID already exists! Please use a different ID.")
+                else:
+                    appointment_data = {
+                        "id": aid,
+                        "patientName": patient_name,
+                        "doctorName": doctor_name,
+                        "appointmentDateTime": appointment_datetime,
+                    }
+                    ok, message = db.add_appointment(appointment_data)
+                    if ok:
+                        st.success("Appointment added successfully!")
+                    elif join_waitlist and message == SLOT_TAKEN:
+                        db.add_to_waitlist(patient_name, doctor_name=doctor_name,
+                                           earliest=f"{appointment_date.strftime('%d-%m-%Y')} 00:00:00",
+                                           latest=f"{appointment_date.strftime('%d-%m-%Y')} 23:59:59")
+                        st.warning(f"{message}. {patient_name} is on the waitlist for a cancellation that day.")
+                    else:
+                        st.error(message)
             else:
-                st.info(f"No appointments found for {filter_date.strftime('%d-%m-%Y')}")
-        else:
-            st.info("No appointments found")
+                st.error("Please fill in all required fields (*)")
+
+@tab_fragment
+def view_appointments_tab():
+    import pandas as pd
+    st.subheader("All Appointments")
     
-    with tab3:
-        st.subheader("Edit Appointment")
-        appointments = db.get_all_appointments()
-        patients = db.get_all_patients()
-        doctors = db.get_all_doctors()
+    # Add filter by date
+    filter_date = st.date_input(
+        "Filter by Date",
+        help="Show appointments for a specific date"
+    )
+    
+    # Only the selected day is read; archived days are included automatically
+    filtered_appointments = db.get_appointments_in_range(filter_date, filter_date)
+    
+    if filtered_appointments:
+        appointments_df = pd.DataFrame(filtered_appointments)
         
-        if appointments:
-            appointment_ids = [a['id'] for a in appointments]
-            selected_aid = st.selectbox("Select Appointment ID to edit", appointment_ids)
+        # Format the datetime column for better display
+        appointments_df['Time'] = pd.to_datetime(
+            appointments_df['appointmentDateTime'], format="%d-%m-%Y %H:%M:%S"
+        ).dt.strftime('%I:%M %p')
+        appointments_df = appointments_df.rename(columns={
+            'patientName': 'Patient',
+            'doctorName': 'Doctor',
+            'id': 'ID'
+        })
+        appointments_df = appointments_df[['ID', 'Patient', 'Doctor', 'Time']]
+        
+        st.dataframe(appointments_df, use_container_width=True)
+    else:
+        st.info(f"No appointments found for {filter_date.strftime('%d-%m-%Y')}")
+
+@tab_fragment
+def edit_appointment_tab():
+    st.subheader("Edit Appointment")
+    appointments = db.get_all_appointments()
+    patients = db.get_all_patients()
+    doctors = db.get_all_doctors()
+    
+    if appointments:
+        appointment_ids = [a['id'] for a in appointments]
+        selected_aid = st.selectbox("Select Appointment ID to edit", appointment_ids)
+        
+        if selected_aid:
+            appointment = db.get_appointment_by_id(selected_aid)
+            expected_version = shown_version("appointment", appointment)
             
-            if selected_aid:
-                appointment = db.get_appointment_by_id(selected_aid)
+            with st.form("edit_appointment_form"):
+                # Get available patients and doctors
+                patient_names = [p['name'] for p in patients]
+                doctor_names = [d['name'] for d in doctors]
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    if patient_names:
+                        new_patient_name = st.selectbox("Patient Name", patient_names, 
+                                                      index=patient_names.index(appointment['patientName']) if appointment['patientName'] in patient_names else 0)
+                    else:
+                        st.warning("No patients available")
+                        new_patient_name = ""
+                
+                with col2:
+                    if doctor_names:
+                        new_doctor_name = st.selectbox("Doctor Name", doctor_names,
+                                                     index=doctor_names.index(appointment['doctorName']) if appointment['doctorName'] in doctor_names else 0)
+                    else:
+                        st.warning("No doctors available")
+                        new_doctor_name = ""
                 
-                with st.form("edit_appointment_form"):
-                    # Get available patients and doctors
-                    patient_names = [p['name'] for p in patients]
-                    doctor_names = [d['name'] for d in doctors]
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        if patient_names:
-                            new_patient_name = st.selectbox("Patient Name", patient_names, 
-                                                          index=patient_names.index(appointment['patientName']) if appointment['patientName'] in patient_names else 0)
-                        else:
-                            st.warning("No patients available")
-                            new_patient_name = ""
-                    
-                    with col2:
-                        if doctor_names:
-                            new_doctor_name = st.selectbox("Doctor Name", doctor_names,
-                                                         index=doctor_names.index(appointment['doctorName']) if appointment['doctorName'] in doctor_names else 0)
-                        else:
-                            st.warning("No doctors available")
-                            new_doctor_name = ""
-                    
-                    if st.form_submit_button("Update Appointment"):
-                        updated_data = {
-                            "patientName": new_patient_name,
-                            "doctorName": new_doctor_name,
-                            "appointmentDateTime": get_current_datetime(),
-                        }
-                        db.update_appointment(selected_aid, updated_data)
+                current_datetime = datetime.strptime(appointment['appointmentDateTime'], "%d-%m-%Y %H:%M:%S")
+                col1, col2 = st.columns(2)
+                with col1:
+                    new_date = st.date_input("Appointment Date", value=current_datetime.date())
+                with col2:
+                    new_time = st.time_input("Appointment Time", value=current_datetime.time())
+                
+                if st.form_submit_button("Update Appointment"):
+                    updated_data = {
+                        "patientName": new_patient_name,
+                        "doctorName": new_doctor_name,
+                        "appointmentDateTime": datetime.combine(new_date, new_time).strftime("%d-%m-%Y %H:%M:%S"),
+                    }
+                    ok, message = db.update_appointment(selected_aid, updated_data, expected_version)
+                    forget_shown_version("appointment", selected_aid)
+                    if ok:
                         st.success("Appointment updated successfully!")
-        else:
-            st.info("No appointments available to edit")
-    
-    with tab4:
-        st.subheader("View Appointment by ID")
-        appointments = db.get_all_appointments()
-        if appointments:
-            appointment_ids = [a['id'] for a in appointments]
-            selected_aid = st.selectbox("Select Appointment ID", appointment_ids, key="view_appointment")
+                    else:
+                        st.error(message)
+    else:
+        st.info("No appointments available to edit")
+
+@tab_fragment
+def search_appointment_tab():
+    st.subheader("View Appointment by ID")
+    appointments = db.get_all_appointments()
+    if appointments:
+        appointment_ids = [a['id'] for a in appointments]
+        selected_aid = st.selectbox("Select Appointment ID", appointment_ids, key="view_appointment")
+        
+        if selected_aid:
+            appointment = db.get_appointment_by_id(selected_aid)
+            st.json(appointment)
+    else:
+        st.info("No appointments available")
+
+@tab_fragment
+def delete_appointment_tab():
+    st.subheader("Delete Appointment")
+    appointments = db.get_all_appointments()
+    if appointments:
+        appointment_ids = [a['id'] for a in appointments]
+        selected_aid = st.selectbox("Select Appointment ID to delete", appointment_ids, key="delete_appointment")
+        
+        if selected_aid:
+            appointment = db.get_appointment_by_id(selected_aid)
+            st.warning(f"Are you sure you want to delete appointment: {appointment['patientName']} with {appointment['doctorName']}?")
             
-            if selected_aid:
-                appointment = db.get_appointment_by_id(selected_aid)
-                st.json(appointment)
-        else:
-            st.info("No appointments available")
+            if st.button("Confirm Delete"):
+                offer = db.delete_appointment(selected_aid)
+                st.success("Appointment deleted successfully!")
+                if offer:
+                    st.info(f"The slot was offered to {offer['patientName']} from the waitlist "
+                            f"(appointment {offer['appointmentId']})")
+    else:
+        st.info("No appointments available to delete")
+
+@tab_fragment
+def waitlist_tab():
+    import pandas as pd
+    st.subheader("Cancellation Waitlist")
+    if not isinstance(db, HospitalDatabase):
+        st.info("The waitlist is only available with the SQLite database")
+        return
+    st.caption("Cancelled slots are offered straight away to the highest-priority patient waiting for that "
+               "doctor or specialization; the slot is held as an appointment until the offer is declined.")
     
-    with tab5:
-        st.subheader("Delete Appointment")
-        appointments = db.get_all_appointments()
-        if appointments:
-            appointment_ids = [a['id'] for a in appointments]
-            selected_aid = st.selectbox("Select Appointment ID to delete", appointment_ids, key="delete_appointment")
-            
-            if selected_aid:
-                appointment = db.get_appointment_by_id(selected_aid)
-                st.warning(f"Are you sure you want to delete appointment: {appointment['patientName']} with {appointment['doctorName']}?")
-                
-                if st.button("Confirm Delete"):
-                    db.delete_appointment(selected_aid)
-                    st.success("Appointment deleted successfully!")
+    patients = db.get_all_patients()
+    doctors = db.get_all_doctors()
+    with st.form("add_waitlist_form"):
+        patient_names = [p['name'] for p in patients]
+        col1, col2 = st.columns(2)
+        with col1:
+            patient_name = st.selectbox("Patient Name*", patient_names) if patient_names else ""
+            wait_for = st.radio("Wait for", ["Doctor", "Specialization"], horizontal=True)
+            doctor_name = st.selectbox("Doctor", [d['name'] for d in doctors]) if doctors else ""
+            specialization = st.selectbox(
+                "Specialization", sorted({d['specialization'] for d in doctors})) if doctors else ""
+        with col2:
+            earliest = st.date_input("Earliest date", key="waitlist_earliest")
+            latest = st.date_input("Latest date", key="waitlist_latest")
+            priority = st.number_input("Priority (higher is offered first)", min_value=0, max_value=100, value=0)
+        if st.form_submit_button("Add to Waitlist"):
+            if not patient_name or not doctors:
+                st.error("Add patients and doctors first")
+            else:
+                try:
+                    entry_id = db.add_to_waitlist(
+                        patient_name,
+                        doctor_name=doctor_name if wait_for == "Doctor" else None,
+                        specialization=specialization if wait_for == "Specialization" else None,
+                        earliest=f"{earliest.strftime('%d-%m-%Y')} 00:00:00",
+                        latest=f"{latest.strftime('%d-%m-%Y')} 23:59:59",
+                        priority=int(priority)
+                    )
+                    st.success(f"Added to the waitlist (#{entry_id})")
+                except ValueError as e:
+                    st.error(str(e))
+    
+    entries = db.get_waitlist()
+    if not entries:
+        st.info("Nobody is waiting")
+        return
+    st.dataframe(pd.DataFrame(entries), use_container_width=True)
+    
+    open_entries = [e for e in entries if e['status'] in ('waiting', 'offered')]
+    if open_entries:
+        labels = {f"#{e['id']} {e['patientName']} ({e['status']})": e for e in open_entries}
+        entry = labels[st.selectbox("Waitlist entry", list(labels), key="waitlist_entry")]
+        col1, col2, col3 = st.columns(3)
+        if entry['status'] == 'offered':
+            with col1:
+                if st.button("Accept Offer"):
+                    db.accept_waitlist_offer(entry['id'])
+                    st.success(f"Appointment {entry['appointmentId']} confirmed")
+            with col2:
+                if st.button("Decline Offer"):
+                    offer = db.decline_waitlist_offer(entry['id'])
+                    st.success("Offer declined")
+                    if offer:
+                        st.info(f"The slot was offered to {offer['patientName']}")
         else:
-            st.info("No appointments available to delete")
+            with col3:
+                if st.button("Remove from Waitlist"):
+                    db.cancel_waitlist_entry(entry['id'])
+                    st.success("Removed from the waitlist")
+
+@tab_fragment
+def plan_clinic_day_tab():
+    import pandas as pd
+    st.subheader("Plan a Clinic Day")
+    st.caption("Upload a CSV with the columns patientName, specialization, doctorName, date (dd-mm-YYYY), "
+               "from, to (HH:MM) and priority. Higher priorities are placed first, each in the earliest free "
+               "slot of its window, and the whole plan is booked at once.")
+    uploaded = st.file_uploader("Requests (CSV)", type=["csv"])
+    dry_run = st.checkbox("Only preview the plan", value=True)
+    if uploaded is None:
+        return
+    try:
+        requests = requests_from_csv(io.StringIO(uploaded.getvalue().decode("utf-8")))
+    except (KeyError, UnicodeDecodeError, csv.Error) as e:
+        st.error(f"Could not read the CSV: {e}")
+        return
+    if st.button("Plan" if dry_run else "Plan and Book"):
+        result = ClinicDayPlanner(db).schedule(requests, dry_run=dry_run)
+        verb = "Planned" if dry_run else "Booked"
+        st.success(f"{verb} {len(result['placed'])} of {result['requests']} requests "
+                   f"in {result['plan_ms'] + result['book_ms']:.0f} ms")
+        if result['placed']:
+            st.dataframe(pd.DataFrame(result['placed']).drop(columns=['request']), use_container_width=True)
+        if result['unplaced']:
+            st.warning(f"{len(result['unplaced'])} requests could not be placed")
+            st.dataframe(pd.DataFrame([
+                {'Row': index + 1, 'Patient': requests[index].get('patientName'), 'Reason': reason}
+                for index, reason in result['unplaced']
+            ]), use_container_width=True)
+
+# Seconds between refreshes of the walk-in board
+WALK_IN_REFRESH_SECONDS = int(os.environ.get("HOSPITAL_WALK_IN_REFRESH", "15"))
+
+def walk_ins_tab():
+    st.subheader("Walk-in Triage")
+    if not isinstance(db, HospitalDatabase):
+        st.info("The walk-in queue is only available with the SQLite database")
+        return
+    st.caption("Walk-ins are seen most severe first, then in order of arrival. Waits are estimated from the "
+               "doctors on duty, their booked appointments and how long recent consultations took.")
+    add_walk_in_form()
+    walk_in_board()
+
+@tab_fragment
+def add_walk_in_form():
+    patients = db.get_all_patients()
+    doctors = db.get_all_doctors()
+    with st.form("add_walk_in_form"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            patient_name = st.selectbox("Patient Name*", [p['name'] for p in patients]) if patients else ""
+        with col2:
+            specialization = st.selectbox(
+                "Specialization*", sorted({d['specialization'] for d in doctors})) if doctors else ""
+        with col3:
+            severity = st.selectbox("Severity", list(SEVERITY_LEVELS), index=2,
+                                    format_func=lambda level: f"{level} - {SEVERITY_LEVELS[level]}")
+        if st.form_submit_button("Add Walk-in"):
+            if not patient_name or not specialization:
+                st.error("Add patients and doctors first")
+            else:
+                entry_id = db.add_walk_in(patient_name, specialization, severity)
+                st.success(f"{patient_name} is in the {specialization} queue (#{entry_id})")
+
+@tab_fragment(run_every=WALK_IN_REFRESH_SECONDS)
+def walk_in_board():
+    import pandas as pd
+    # The queue is kept in memory; a refresh reads only the doctors on duty and today's bookings
+    boards = db.get_triage_board()
+    if not boards:
+        st.info("Nobody is waiting")
+        return
+    for board in boards:
+        specialization = board['specialization']
+        st.markdown(f"**{specialization}**: {len(board['doctorsOnDuty'])} doctors on duty, "
+                    f"about {board['averageMinutes']:g} minutes per consultation")
+        if board['waiting']:
+            st.dataframe(pd.DataFrame([{
+                'Position': entry['position'],
+                'Patient': entry['patientName'],
+                'Severity': f"{entry['severity']} - {SEVERITY_LEVELS[entry['severity']]}",
+                'Arrived': entry['arrivedAt'].strftime('%H:%M'),
+                'Estimated Wait': ("No doctor on duty" if entry['estimatedWaitMinutes'] is None
+                                   else f"{entry['estimatedWaitMinutes']} min")
+            } for entry in board['waiting']]), use_container_width=True, hide_index=True)
+        for entry in board['inConsultation']:
+            st.caption(f"{entry['doctorName']} is seeing {entry['patientName']} "
+                       f"since {entry['startedAt'].strftime('%H:%M')}")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            doctor_name = st.selectbox("Doctor", board['doctorsOnDuty'], key=f"walk_in_doctor_{specialization}")
+            if st.button("Call Next", key=f"walk_in_call_{specialization}",
+                         disabled=not board['waiting'] or not board['doctorsOnDuty']):
+                try:
+                    entry = db.call_next_walk_in(specialization, doctor_name)
+                    if entry:
+                        st.success(f"{doctor_name} is now seeing {entry['patientName']}")
+                except ValueError as e:
+                    st.error(str(e))
+        with col2:
+            seeing = {f"{e['patientName']} ({e['doctorName']})": e['id'] for e in board['inConsultation']}
+            finished = st.selectbox("In consultation", list(seeing), key=f"walk_in_seeing_{specialization}")
+            if st.button("Finish", key=f"walk_in_finish_{specialization}", disabled=not seeing):
+                db.finish_consultation(seeing[finished])
+                st.success(f"Finished with {finished}")
+        with col3:
+            waiting = {f"#{e['position']} {e['patientName']}": e['id'] for e in board['waiting']}
+            left = st.selectbox("Waiting", list(waiting), key=f"walk_in_waiting_{specialization}")
+            if st.button("Left Without Being Seen", key=f"walk_in_left_{specialization}", disabled=not waiting):
+                db.remove_walk_in(waiting[left])
+                st.success(f"Removed {left}")
 
 def reset_data():
     st.header("🔄 Reset Database")
     st.caption("Clear all data from the system")
     
+    # Archiving and file backups are SQLite features; other backends have their own tooling
+    if isinstance(db, HospitalDatabase):
+        with st.expander("🗄️ Archive old appointments"):
+            summary = db.get_archive_summary()
+            col1, col2 = st.columns(2)
+            col1.metric("Active appointments", summary['hot'])
+            col2.metric("Archived appointments", summary['archived'])
+            st.caption("Archived appointments still appear when you look up their date or ID.")
+        
+            older_than_days = st.number_input(
+                "Archive appointments older than (days)",
+                min_value=1,
+                value=db.archive_after_days
+            )
+            if st.button("Archive now"):
+                moved = db.archive_appointments(older_than_days)
+                st.success(f"Archived {moved} appointments")
+    
+        with st.expander("💾 Backup and restore"):
+            st.caption(f"Backups are copied online, so other users can keep working. Snapshots are stored in '{BACKUP_DIR}'.")
+            if snapshot_scheduler is not None:
+                st.info(f"Automatic snapshots every {snapshot_scheduler.interval:g} seconds (keeping {snapshot_scheduler.keep})")
+                if snapshot_scheduler.last_error:
+                    st.error(f"Last automatic snapshot failed: {snapshot_scheduler.last_error}")
+        
+            if st.button("Create backup now"):
+                progress = st.progress(0.0)
+                result = take_snapshot(db, BACKUP_DIR, progress=lambda done, total: progress.progress(done / total))
+                st.success(f"Backup saved to {result['path']} ({result['bytes'] / 1e6:.1f} MB in {result['seconds']:.2f}s)")
+        
+            snapshots = list_snapshots(BACKUP_DIR)
+            if snapshots:
+                selected_snapshot = st.selectbox("Backup", snapshots, format_func=os.path.basename)
+                col1, col2 = st.columns(2)
+                with col1:
+                    # The download is held in memory, so the file is read only when asked for
+                    if st.button("Prepare download"):
+                        with open(selected_snapshot, "rb") as f:
+                            st.download_button("Download backup", f, file_name=os.path.basename(selected_snapshot))
+                with col2:
+                    restore_confirm = st.text_input("Type 'RESTORE' to replace all current data with this backup")
+                    if restore_confirm == "RESTORE" and st.button("Restore backup"):
+                        try:
+                            result = restore_database(db, selected_snapshot)
+                            st.success(f"✅ Restored {selected_snapshot} ({result['rows']})")
+                            if result['warning']:
+                                st.warning(result['warning'])
+                        except ValueError as e:
+                            st.error(f"Restore failed: {e}")
+            else:
+                st.info("No backups yet")
+    
+        with st.expander("🧹 Maintenance"):
+            import pandas as pd
+            st.caption("Planner statistics, free space and integrity checks. They run in the background when due and "
+                       "never hold up bookings for more than a few milliseconds.")
+            if maintenance_worker is not None and maintenance_worker.last_error:
+                st.error(f"Last background maintenance failed: {maintenance_worker.last_error}")
+            # The per-table breakdown reads every page, so it waits for the button
+            stats = db.get_storage_stats(tables=False)
+            for schema, f in stats['files'].items():
+                col1, col2, col3 = st.columns(3)
+                col1.metric(f"File size ({schema})", f"{f['bytes'] / 1e6:.1f} MB")
+                col2.metric("Free space", f"{f['free_bytes'] / 1e6:.1f} MB",
+                            f"{f['free_pages'] / f['pages']:.1%} of pages" if f['pages'] else None, delta_color="off")
+                col3.metric("Auto-vacuum", f['auto_vacuum'])
+            if st.button("Show largest tables"):
+                tables = db.get_storage_stats()['tables']
+                if tables:
+                    st.dataframe(pd.DataFrame([{
+                        'Table / index': f"{t['schema']}.{t['name']}",
+                        'Pages': t['pages'],
+                        'Fill': f"{t['fill']:.0%}"
+                    } for t in tables[:10]]), use_container_width=True, hide_index=True)
+                else:
+                    st.info("Per-table sizes need SQLite's dbstat table, which this build lacks")
+        
+            col1, col2, col3 = st.columns(3)
+            if col1.button("Update statistics"):
+                result = db.optimize()
+                st.success(f"Statistics refreshed for {result['tables']} tables")
+            if col2.button("Reclaim free space"):
+                freed = db.incremental_vacuum()
+                st.success(f"Returned {sum(freed.values())} free pages to the file system")
+            if col3.button("Check integrity"):
+                result = db.check_integrity()
+                if result['ok']:
+                    st.success("Integrity check passed")
+                else:
+                    st.error("Integrity check failed:\n\n" + "\n\n".join(result['errors']))
+            if any(f['auto_vacuum'] != 'incremental' for f in stats['files'].values()):
+                st.info("Free space can only be reclaimed once the file is rebuilt for incremental vacuum: "
+                        "run `python maintenance.py vacuum --full` at a quiet time.")
+        
+            runs = db.get_maintenance_log(10)
+            if runs:
+                st.caption("Recent runs")
+                st.dataframe(pd.DataFrame([{
+                    'Task': run['task'],
+                    'Started': run['started'],
+                    'Seconds': round(run['seconds'], 3),
+                    'Result': str(run['result'])
+                } for run in runs]), use_container_width=True, hide_index=True)
+    
     st.warning("⚠️ Warning: This action will permanently delete all data!")
     
     with st.expander("Click to show reset options"):
@@ -596,7 +1348,7 @@ def reset_data():
             - All doctor records
             - All appointment schedules
             
-            This action CANNOT be undone. Please make sure you have backed up any important data.
+            This action CANNOT be undone. Create a backup above first if you may need this data again.
         """)
         
         confirm_text = st.text_input(
@@ -608,5 +1360,108 @@ def reset_data():
             db.reset_all_data()
             st.success("✅ All data has been reset successfully!")
 
+def diagnostics():
+    import pandas as pd
+    st.header("🩺 Diagnostics")
+    st.caption("Database query statistics and page timings for this server process")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        enabled = st.toggle("Collect query statistics", value=db.stats is not None)
+    with col2:
+        slow_query_ms = st.number_input(
+            "Slow query threshold (ms, 0 = off)",
+            min_value=0.0,
+            value=float(db.stats.slow_query_ms or 0) if db.stats else 0.0,
+            disabled=not enabled
+        )
+    
+    if enabled:
+        db.enable_instrumentation(slow_query_ms or None)
+    else:
+        db.disable_instrumentation()
+    
+    st.subheader("Query statistics")
+    if db.stats is None:
+        st.info("Statistics are off. Turn them on above or start the app with HOSPITAL_DB_STATS=1.")
+    else:
+        st.caption(f"Collecting since {db.stats.started_at.strftime('%d-%m-%Y %H:%M:%S')}")
+        snapshot = db.stats.snapshot()
+        if snapshot:
+            stats_df = pd.DataFrame([
+                {"Method": name, **{k: v for k, v in stats.items() if k != 'histogram'}}
+                for name, stats in snapshot.items()
+            ])
+            st.dataframe(stats_df, use_container_width=True)
+            
+            method = st.selectbox("Latency histogram for", list(snapshot))
+            st.bar_chart(pd.Series(snapshot[method]['histogram'], name="calls"))
+        else:
+            st.info("No queries recorded yet")
+        
+        st.subheader("Slow queries")
+        if db.stats.slow_queries:
+            st.dataframe(pd.DataFrame(list(db.stats.slow_queries)[::-1]), use_container_width=True)
+        else:
+            st.info("No slow queries logged")
+        
+        if st.button("Reset statistics"):
+            db.stats.reset()
+    
+    st.subheader("Page reruns")
+    timings = list(get_rerun_timings())
+    if timings:
+        timings_df = pd.DataFrame(timings[::-1])
+        st.dataframe(timings_df, use_container_width=True)
+        st.dataframe(
+            timings_df.groupby("page")["duration_ms"].describe(percentiles=[0.5, 0.95]),
+            use_container_width=True
+        )
+    else:
+        st.info("No reruns recorded yet")
+    
+    st.subheader("Profiling")
+    if profiler is None:
+        st.info("Profiling is off. Start the app with HOSPITAL_PROFILE=1 (spans) or HOSPITAL_PROFILE=cprofile.")
+        return
+    
+    summary = profiler.summary()
+    if summary['pages']:
+        st.dataframe(pd.DataFrame(summary['pages']).T, use_container_width=True)
+        st.dataframe(pd.DataFrame(summary['spans']).T, use_container_width=True)
+    if summary['cprofile_skipped_reruns']:
+        st.caption(f"cProfile skipped {summary['cprofile_skipped_reruns']} overlapping reruns")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download flame graph stacks", profiler.folded(), file_name="spans.folded")
+    with col2:
+        if st.button("Reset profile"):
+            profiler.reset()
+    
+    profile_text = profiler.pstats_text()
+    if profile_text:
+        with st.expander("cProfile (top functions by cumulative time)"):
+            st.code(profile_text)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if db.stats is not None:
+        # Drop database time from before this rerun
+        db.stats.take_thread_totals()
+    started = time.perf_counter()
+    if profiler is None:
+        main()
+    else:
+        with profiler.rerun(st.session_state.get("main_navigation", "Dashboard")):
+            main()
+    timing = {
+        "at": get_current_datetime(),
+        "page": st.session_state.get("main_navigation"),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+    if db.stats is not None:
+        # Connection setup, SQL and row mapping; the rest is building
+        # DataFrames and rendering the page
+        timing.update(db.stats.take_thread_totals())
+        timing["render_ms"] = round(max(0.0, timing["duration_ms"] - timing["db_ms"]), 3)
+    get_rerun_timings().append(timing)
\ No newline at end of file
@@ -0,0 +1,195 @@
+# availability.py
+"""Doctor working hours compiled into per-day slot bitmaps.
+
+A doctor's availability is a weekly template (weekday -> shifts) with one
+slot length, plus dated exceptions that block time (leave) or add extra
+hours.  For every (doctor, day) the template and that day's exceptions are
+compiled once into an int whose bit ``n`` is set when a slot may start at
+minute ``n * TICK_MINUTES``; validating a booking is then a shift and a mask.
+Doctors without a template are not restricted.
+"""
+from datetime import date, datetime
+
+TICK_MINUTES = 5
+DAY_MINUTES = 24 * 60
+DEFAULT_SLOT_MINUTES = 30
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+# Compiled days kept before the cache starts over
+MAX_COMPILED_DAYS = 50_000
+
+
+def parse_hhmm(value):
+    """'HH:MM' (or minutes) -> minutes after midnight, on the TICK_MINUTES grid."""
+    if isinstance(value, int):
+        minutes = value
+    else:
+        hours, _, mins = str(value).partition(":")
+        try:
+            minutes = int(hours) * 60 + int(mins or 0)
+        except ValueError:
+            raise ValueError(f"Invalid time '{value}', expected HH:MM") from None
+    if not 0 <= minutes <= DAY_MINUTES or minutes % TICK_MINUTES:
+        raise ValueError(f"Time '{value}' must be between 00:00 and 24:00 in {TICK_MINUTES}-minute steps")
+    return minutes
+
+
+def format_hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def normalize_weekly(weekly, slot_minutes):
+    """Validate a {weekday: [(start, end), ...]} template -> {int: [(start_min, end_min)]}"""
+    if slot_minutes <= 0 or slot_minutes % TICK_MINUTES:
+        raise ValueError(f"Slot length must be a positive multiple of {TICK_MINUTES} minutes")
+    result = {}
+    for weekday, shifts in weekly.items():
+        weekday = int(weekday)
+        if not 0 <= weekday <= 6:
+            raise ValueError(f"Invalid weekday {weekday} (0 = Monday ... 6 = Sunday)")
+        parsed = sorted((parse_hhmm(start), parse_hhmm(end)) for start, end in shifts)
+        for start, end in parsed:
+            if end - start < slot_minutes:
+                raise ValueError(f"{WEEKDAYS[weekday]} shift {format_hhmm(start)}-{format_hhmm(end)} "
+                                 f"is shorter than one {slot_minutes}-minute slot")
+        if parsed:
+            result[weekday] = parsed
+    return result
+
+
+def _range_mask(first_tick, last_tick):
+    if last_tick < first_tick:
+        return 0
+    return ((1 << (last_tick - first_tick + 1)) - 1) << first_tick
+
+
+def _shift_mask(start, end, slot_minutes):
+    mask = 0
+    for minute in range(start, end - slot_minutes + 1, slot_minutes):
+        mask |= 1 << (minute // TICK_MINUTES)
+    return mask
+
+
+def compile_day(weekly, slot_minutes, exceptions, day):
+    """Bitmap of allowed slot starts on ``day``.
+
+    ``exceptions`` are (start_min, end_min, available) for that day: extra
+    hours add slots, blocked time removes every slot that overlaps it.
+    """
+    mask = 0
+    for start, end in weekly.get(day.weekday(), ()):
+        mask |= _shift_mask(start, end, slot_minutes)
+    for start, end, available in exceptions:
+        if available:
+            mask |= _shift_mask(start, end, slot_minutes)
+    for start, end, available in exceptions:
+        if not available:
+            first = max(0, start - slot_minutes + 1)
+            mask &= ~_range_mask(-(-first // TICK_MINUTES), (end - 1) // TICK_MINUTES)
+    return mask
+
+
+def slot_starts(mask):
+    """Minutes after midnight of every slot start in a compiled day."""
+    starts = []
+    tick = 0
+    while mask:
+        if mask & 1:
+            starts.append(tick * TICK_MINUTES)
+        mask >>= 1
+        tick += 1
+    return starts
+
+
+def shift_end(mask, minute, slot_minutes):
+    """Minutes after midnight at which the shift running at ``minute`` ends, or None off duty."""
+    step = slot_minutes // TICK_MINUTES
+    # The latest slot start that still covers ``minute``
+    first = max(0, (minute - slot_minutes) // TICK_MINUTES + 1)
+    tick = minute // TICK_MINUTES
+    while tick >= first and not (mask >> tick) & 1:
+        tick -= 1
+    if tick < first:
+        return None
+    while (mask >> (tick + step)) & 1:
+        tick += step
+    return tick * TICK_MINUTES + slot_minutes
+
+
+class SlotCalendar:
+    """Compiled availability per doctor and day, loaded on first use.
+
+    ``loader(doctor_name)`` returns None for doctors without a template,
+    or {'slot_minutes', 'weekly', 'exceptions': {date: [(start, end, available)]}}.
+    ``version()``, when given, returns a value that changes whenever any
+    process writes working hours (None when unknown); everything compiled
+    is dropped when it does.  Without it, the owner passes the version to
+    ``sync`` itself, e.g. once per booking when reading it costs a round trip.
+    """
+
+    def __init__(self, loader, version=None):
+        self.loader = loader
+        self.version = version
+        self._version = None
+        self._doctors = {}
+        self._days = {}
+
+    def invalidate(self):
+        self._version = None
+        self._doctors = {}
+        self._days = {}
+
+    def sync(self, version):
+        """Drop everything compiled unless ``version`` is the one seen last (None: always)."""
+        if version is None or version != self._version:
+            self.invalidate()
+            self._version = version
+
+    def _ensure_current(self):
+        if self.version is not None:
+            self.sync(self.version())
+
+    def _config(self, doctor_name):
+        self._ensure_current()
+        if doctor_name not in self._doctors:
+            self._doctors[doctor_name] = self.loader(doctor_name)
+        return self._doctors[doctor_name]
+
+    def day_mask(self, doctor_name, day):
+        """Compiled bitmap for the day, or None when the doctor has no template."""
+        config = self._config(doctor_name)
+        if config is None:
+            return None
+        key = (doctor_name, day)
+        mask = self._days.get(key)
+        if mask is None:
+            if len(self._days) >= MAX_COMPILED_DAYS:
+                self._days = {}
+            mask = self._days[key] = compile_day(config['weekly'], config['slot_minutes'],
+                                                 config['exceptions'].get(day, ()), day)
+        return mask
+
+    def slot_minutes(self, doctor_name):
+        config = self._config(doctor_name)
+        return config['slot_minutes'] if config else DEFAULT_SLOT_MINUTES
+
+    def check(self, doctor_name, when):
+        """(ok, message) for a booking of ``doctor_name`` starting at datetime ``when``."""
+        mask = self.day_mask(doctor_name, when.date())
+        if mask is None:
+            return True, None
+        minute = when.hour * 60 + when.minute
+        if when.second or minute % TICK_MINUTES or not (mask >> (minute // TICK_MINUTES)) & 1:
+            if not mask:
+                return False, f"{doctor_name} is not available on {when.strftime('%d-%m-%Y')}"
+            return False, (f"{when.strftime('%H:%M')} is outside {doctor_name}'s working hours or not at the "
+                           f"start of a {self.slot_minutes(doctor_name)}-minute slot")
+        return True, None
+
+
+def to_date(value):
+    """date, datetime or 'dd-mm-YYYY' -> date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value[:10], "%d-%m-%Y").date()
@@ -0,0 +1,290 @@
+# backup.py
+"""Online backups, scheduled snapshots and verified restores.
+
+Copies go through SQLite's backup API a few pages at a time, so other
+sessions keep reading and booking while a backup runs.  Usage:
+
+    python backup.py backup backups/manual.db
+    python backup.py snapshot --dir backups --keep 14
+    python backup.py schedule --dir backups --interval 3600 --keep 24
+    python backup.py verify backups/manual.db
+    python backup.py restore backups/manual.db
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database import HospitalDatabase
+
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.005
+# Writers restart a paged copy; after this many restarts copy in one step
+# (a single read transaction, which in WAL mode still does not block writers)
+BACKUP_MAX_RESTARTS = 3
+SNAPSHOT_PREFIX = "hospital-"
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+TABLES = ("patients", "doctors", "appointments")
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy(source_path, target_path, pages, sleep, progress=None):
+    """Page-stepped sqlite3 backup of source_path into target_path."""
+    state = {'restarts': 0, 'remaining': None, 'steps': 0}
+
+    def on_progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state['remaining'] = remaining
+        state['steps'] += 1
+        if progress:
+            progress(total - remaining, total)
+
+    tmp_path = target_path + ".partial"
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(tmp_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=on_progress, sleep=sleep)
+        except _TooManyRestarts:
+            source.backup(target, pages=-1)
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        page_size = target.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        source.close()
+        target.close()
+    # Readers of target_path never see a half-written file
+    os.replace(tmp_path, target_path)
+    return {'pages': page_count, 'bytes': page_count * page_size,
+            'steps': state['steps'], 'restarts': state['restarts']}
+
+
+def _archive_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}.archive{ext or '.db'}"
+
+
+def backup_database(db, target_path, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP, progress=None):
+    """Copy the live database (and its archive file, if any) to target_path."""
+    os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+    start = time.perf_counter()
+    result = _copy(db.db_name, target_path, pages, sleep, progress)
+    if db.archive_db:
+        result['archive'] = _copy(db.archive_db, _archive_path(target_path), pages, sleep)
+    result['path'] = target_path
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def verify_backup(path, quick=False, name=None):
+    """Run an integrity check on a backup and return its row counts.
+
+    Raises ValueError if the file is missing, corrupt or not a hospital
+    database; messages call the file ``name`` (default: its path).
+    """
+    name = name or path
+    if not os.path.exists(path):
+        raise ValueError(f"Backup not found: {name}")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(f"Integrity check failed for {name}: {result}")
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [t for t in TABLES if t not in names]
+        if missing:
+            raise ValueError(f"{name} is not a hospital database (missing {', '.join(missing)})")
+        return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in TABLES}
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"{name} is not a valid SQLite database: {e}") from e
+    finally:
+        conn.close()
+
+
+def _check_file(path, name):
+    """integrity_check of a file that need not hold the hospital tables (an archive)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"{name} is not a valid SQLite database: {e}") from e
+    finally:
+        conn.close()
+    if result != "ok":
+        raise ValueError(f"Integrity check failed for {name}: {result}")
+
+
+def _staging_path(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{name}.restore")
+
+
+def restore_database(db, backup_path, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+    """Replace the live database with a verified backup.
+
+    The backup is first copied to a staging file next to the live one and
+    checked there (integrity_check, the hospital tables and their row
+    counts); a ValueError leaves the live data untouched.  Only then is the
+    staged copy written over the live file, and nothing after that raises:
+    row counts that differ afterwards (a writer got in between) or a failed
+    schema upgrade come back as 'warning'.
+    """
+    start = time.perf_counter()
+    archive_backup = _archive_path(backup_path)
+    restore_archive = db.archive_db and os.path.exists(archive_backup)
+    staging = _staging_path(db.db_name)
+    staging_archive = _staging_path(db.archive_db) if restore_archive else None
+    try:
+        if not os.path.exists(backup_path):
+            raise ValueError(f"Backup not found: {backup_path}")
+        try:
+            _copy(backup_path, staging, pages, sleep)
+            if restore_archive:
+                _copy(archive_backup, staging_archive, pages, sleep)
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"{backup_path} is not a valid SQLite database: {e}") from e
+        expected = verify_backup(staging, name=backup_path)
+        if restore_archive:
+            _check_file(staging_archive, archive_backup)
+
+        # From here on the live data is replaced
+        for source_path, target_path in ((staging, db.db_name), (staging_archive, db.archive_db)):
+            if not source_path:
+                continue
+            source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+            target = sqlite3.connect(target_path)
+            try:
+                source.backup(target, pages=pages, sleep=sleep)
+            finally:
+                source.close()
+                target.close()
+    finally:
+        for path in (staging, staging_archive):
+            for suffix in ('', '.partial', '-wal', '-shm'):
+                if path and os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    result = {'rows': expected, 'seconds': None, 'warning': None}
+    try:
+        # Bring the restored file up to the current schema
+        db.init_database()
+        restored = verify_backup(db.db_name, quick=True)
+        if restored != expected:
+            result['warning'] = f"Row counts {restored} differ from the backup's {expected}; other users wrote meanwhile"
+    except (sqlite3.Error, ValueError) as e:
+        result['warning'] = f"Restored, but checking the result failed: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def snapshot_path(directory, when=None):
+    when = when or datetime.now()
+    return os.path.join(directory, f"{SNAPSHOT_PREFIX}{when.strftime(SNAPSHOT_TIME_FORMAT)}.db")
+
+
+def list_snapshots(directory):
+    """Snapshot files in directory, newest first."""
+    paths = glob.glob(os.path.join(directory, f"{SNAPSHOT_PREFIX}*.db"))
+    return sorted((p for p in paths if not p.endswith(".archive.db")), reverse=True)
+
+
+def take_snapshot(db, directory, keep=None, progress=None):
+    """Write a timestamped backup into directory and prune beyond ``keep``."""
+    result = backup_database(db, snapshot_path(directory), progress=progress)
+    if keep:
+        for old in list_snapshots(directory)[keep:]:
+            for path in (old, _archive_path(old)):
+                if os.path.exists(path):
+                    os.remove(path)
+    return result
+
+
+class SnapshotScheduler:
+    """Background thread taking a snapshot every ``interval`` seconds."""
+
+    def __init__(self, db, directory, interval, keep=24):
+        self.db = db
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="snapshot-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = take_snapshot(self.db, self.directory, self.keep)
+                self.last_error = None
+            except (sqlite3.Error, OSError) as e:
+                self.last_error = str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up and restore the hospital database")
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--archive-db", help="archive SQLite file used by the app, if any")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup_cmd = commands.add_parser("backup", help="copy the live database")
+    backup_cmd.add_argument("target")
+    for name in ("snapshot", "schedule"):
+        cmd = commands.add_parser(name, help="timestamped backup with retention" if name == "snapshot"
+                                  else "take snapshots periodically until interrupted")
+        cmd.add_argument("--dir", default="backups")
+        cmd.add_argument("--keep", type=int, default=24)
+        if name == "schedule":
+            cmd.add_argument("--interval", type=float, default=3600, help="seconds between snapshots")
+    commands.add_parser("list", help="list snapshots").add_argument("--dir", default="backups")
+    commands.add_parser("verify", help="integrity-check a backup").add_argument("path")
+    commands.add_parser("restore", help="restore a verified backup").add_argument("path")
+    args = parser.parse_args()
+
+    db = HospitalDatabase(args.db, archive_db=args.archive_db)
+    if args.command == "backup":
+        result = backup_database(db, args.target)
+        print(f"Backed up {result['bytes'] / 1e6:.1f} MB to {args.target} in {result['seconds']:.2f}s "
+              f"({result['steps']} steps, {result['restarts']} restarts)")
+    elif args.command == "snapshot":
+        result = take_snapshot(db, args.dir, args.keep)
+        print(f"Snapshot {result['path']} ({result['bytes'] / 1e6:.1f} MB, {result['seconds']:.2f}s)")
+    elif args.command == "schedule":
+        print(f"Taking a snapshot every {args.interval:g}s into {args.dir} (Ctrl+C to stop)")
+        scheduler = SnapshotScheduler(db, args.dir, args.interval, args.keep).start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            scheduler.stop()
+    elif args.command == "list":
+        for path in list_snapshots(args.dir):
+            print(f"{path}  {os.path.getsize(path) / 1e6:.1f} MB")
+    elif args.command == "verify":
+        print(f"{args.path}: ok, {verify_backup(args.path)}")
+    elif args.command == "restore":
+        result = restore_database(db, args.path)
+        print(f"Restored {args.path} in {result['seconds']:.2f}s: {result['rows']}")
+        if result['warning']:
+            print(f"Warning: {result['warning']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,600 @@
+# benchmark.py
+"""Benchmark suite for HospitalDatabase and the app.py page data paths.
+
+Usage:
+    python benchmark.py --scales 10k,100k --output results.json
+    python benchmark.py --scales 10k --compare baseline.json
+    python benchmark.py --scales 10k --db-url postgresql://localhost/hospital_bench
+    python benchmark.py --scales 10k --only stress --stress-writers 16
+    python benchmark.py --scales 10k --only startup
+    python benchmark.py --scales 10k --only reports
+
+Each scale is seeded once with seed_data.py into a work directory and reused
+on later runs with the same seed.  Results are written as JSON so runs on
+different commits can be compared with --compare.  With --db-url the same
+cases run against another backend, which is emptied and reseeded per scale.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from backup import backup_database, restore_database
+from database import HospitalDatabase
+from reports import REPORT_WORKERS, generate_reports
+from repository import VERSION_CONFLICT, open_database
+from scheduler import ClinicDayPlanner
+from seed_data import (CALENDAR_START, SCALES, SPECIALIZATION_WEIGHTS, calendar_days, generate_appointments,
+                       generate_doctors, seed_database)
+
+DATETIME_FORMAT = "%d-%m-%Y %H:%M:%S"
+
+
+def _measure(func, repeat):
+    timings = []
+    rows = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func(i)
+        timings.append(time.perf_counter() - start)
+        if isinstance(result, (list, tuple)) and rows is None:
+            rows = len(result)
+    return _summary(timings, rows)
+
+
+def _summary(timings, rows=None):
+    repeat = len(timings)
+    timings = sorted(timings)
+    return {
+        'runs': repeat,
+        'min_ms': timings[0] * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'p95_ms': timings[min(repeat - 1, int(repeat * 0.95))] * 1000,
+        'rows': rows,
+    }
+
+
+def _prepare_database(workdir, scale, seed):
+    appointments, patients, doctors = SCALES[scale]
+    path = os.path.join(workdir, f"bench_{scale}_{seed}.db")
+    if not os.path.exists(path):
+        print(f"[{scale}] seeding {path} ...", flush=True)
+        start = time.perf_counter()
+        seed_database(HospitalDatabase(path), appointments, patients, doctors, seed)
+        print(f"[{scale}] seeded in {time.perf_counter() - start:.1f}s", flush=True)
+    return path
+
+
+def _sample_appointment(scale, seed):
+    appointments, patients, doctors = SCALES[scale]
+    # Reuse an existing booking so schedule and overlap checks hit real data
+    return next(generate_appointments(1, patients, doctors, seed))
+
+
+def database_cases(db, scale, seed):
+    """Yield (name, func, repeat) for every public HospitalDatabase method."""
+    appointments, patients, doctors = SCALES[scale]
+    sample = _sample_appointment(scale, seed)
+    doctor = next(generate_doctors(1, seed))
+    day = sample['appointmentDateTime'][:10]
+    new_patient = lambda i: {
+        'id': f"BENCH-P{i}", 'name': f"Bench Patient {i}", 'age': 30, 'gender': "Other",
+        'address': "1 Bench Road", 'disease': "Benchmark", 'REFERRED_BY': "",
+        'admissionDateTime': "01-01-2024 10:00:00",
+    }
+    new_doctor = lambda i: {
+        'id': f"BENCH-D{i}", 'name': f"Dr. Bench {i}", 'specialization': "Benchmarking", 'experience': 1,
+    }
+    new_appointment = lambda i: {
+        'id': f"BENCH-A{i}", 'patientName': "Bench Patient 0", 'doctorName': "Dr. Bench 0",
+        'appointmentDateTime': f"01-01-2030 {9 + i // 2:02d}:{30 * (i % 2):02d}:00",
+    }
+    lookup_patient = f"P{patients // 2:08d}"
+
+    yield "add_patient", lambda i: db.add_patient(new_patient(i)), 10
+    yield "get_patient_by_id", lambda i: db.get_patient_by_id(lookup_patient), 50
+    yield "update_patient", lambda i: db.update_patient("BENCH-P0", new_patient(0)), 10
+    yield "get_all_patients", lambda i: db.get_all_patients(), 3
+    yield "delete_patient", lambda i: db.delete_patient(f"BENCH-P{i}"), 10
+
+    yield "add_doctor", lambda i: db.add_doctor(new_doctor(i)), 10
+    yield "get_doctor_by_id", lambda i: db.get_doctor_by_id(doctor['id']), 50
+    yield "update_doctor", lambda i: db.update_doctor("BENCH-D0", new_doctor(0)), 10
+    yield "get_all_doctors", lambda i: db.get_all_doctors(), 3
+
+    yield "has_overlapping_appointments", lambda i: db.has_overlapping_appointments(
+        sample['doctorName'], sample['appointmentDateTime']), 20
+    yield "add_appointment", lambda i: db.add_appointment(new_appointment(i)), 10
+    yield "get_appointment_by_id", lambda i: db.get_appointment_by_id(f"A{appointments // 2:09d}"), 50
+    yield "get_doctor_schedule", lambda i: db.get_doctor_schedule(sample['doctorName'], day), 20
+    yield "update_appointment", lambda i: db.update_appointment("BENCH-A0", new_appointment(0)), 10
+    yield "get_all_appointments", lambda i: db.get_all_appointments(), 3
+    yield "get_appointments_in_range", lambda i: db.get_appointments_in_range(day, day), 20
+    yield "delete_appointment", lambda i: db.delete_appointment(f"BENCH-A{i}"), 10
+    yield "delete_doctor", lambda i: db.delete_doctor(f"BENCH-D{i}"), 10
+    yield "count_deleted", lambda i: db.count_deleted(), 5
+    yield "changes_since", lambda i: db.changes_since(0, 100), 20
+    yield "purge_deleted", lambda i: db.purge_deleted(pause=0), 3
+    if isinstance(db, HospitalDatabase):
+        archive_now = datetime.combine(CALENDAR_START, datetime.min.time()) + timedelta(
+            days=calendar_days(appointments, doctors) // 10 + db.archive_after_days)
+        yield "get_archive_summary", lambda i: db.get_archive_summary(), 10
+        # Archives the oldest tenth of the calendar on the first run
+        yield "archive_appointments", lambda i: db.archive_appointments(now=archive_now), 1
+
+
+def concurrent_edit_stress(db, writers=8, edits_per_writer=25):
+    """Writers race to edit one appointment and to move their own into one slot.
+    
+    Every edit re-reads the contested appointment and updates it conditional
+    on the version read, so the final version must be 1 + the applied edits
+    (nothing lost) and exactly one writer may win the contested slot.
+    """
+    day = "01-01-2031"
+    db.add_doctor({'id': "STRESS-D0", 'name': "Dr. Stress", 'specialization': "Benchmarking", 'experience': 1})
+    db.add_appointment({'id': "STRESS-A0", 'patientName': "Stress Patient", 'doctorName': "Dr. Stress",
+                        'appointmentDateTime': f"{day} 08:00:00"})
+    for w in range(writers):
+        db.add_appointment({'id': f"STRESS-M{w}", 'patientName': "Stress Patient", 'doctorName': "Dr. Stress",
+                            'appointmentDateTime': f"{day} {12 + w // 2:02d}:{30 * (w % 2):02d}:00"})
+    applied, conflicts, slot_winners, errors = [], [], [], []
+    start_line = threading.Barrier(writers)
+    
+    def writer(w):
+        try:
+            start_line.wait()
+            for i in range(edits_per_writer):
+                current = db.get_appointment_by_id("STRESS-A0")
+                ok, message = db.update_appointment(
+                    "STRESS-A0", {**current, 'patientName': f"Writer {w} edit {i}"}, current['version'])
+                (applied if ok else conflicts).append(w)
+                if not ok and message != VERSION_CONFLICT:
+                    errors.append(message)
+                if i == edits_per_writer // 2:
+                    moved = db.get_appointment_by_id(f"STRESS-M{w}")
+                    ok, message = db.update_appointment(
+                        moved['id'], {**moved, 'appointmentDateTime': f"{day} 10:00:00"}, moved['version'])
+                    if ok:
+                        slot_winners.append(w)
+        except Exception as e:
+            errors.append(repr(e))
+    
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    final = db.get_appointment_by_id("STRESS-A0")
+    result = {
+        'writers': writers,
+        'edits': writers * edits_per_writer,
+        'applied': len(applied),
+        'conflicts': len(conflicts),
+        'lost_updates': 1 + len(applied) - final['version'],
+        'slot_winners': len(slot_winners),
+        'errors': errors[:5],
+        'total_ms': elapsed * 1000,
+        'edits_per_s': writers * edits_per_writer / elapsed,
+    }
+    result['passed'] = not result['lost_updates'] and result['slot_winners'] == 1 and not errors
+    for w in range(writers):
+        db.delete_appointment(f"STRESS-M{w}")
+    db.delete_appointment("STRESS-A0")
+    db.delete_doctor("STRESS-D0")
+    return result
+
+
+def _coherence_writer(path, doctor, writes, pause, results):
+    db = HospitalDatabase(path, cache_max_staleness=None)
+    log = []
+    for n in range(1, writes + 1):
+        db.update_doctor(doctor['id'], {**doctor, 'experience': n})
+        # Taken after the commit returns, so every read that starts later must see n
+        log.append((time.time(), n))
+        time.sleep(pause)
+    results.put(('writer', log))
+
+
+def _coherence_reader(path, doctor_id, max_staleness, until, results):
+    db = HospitalDatabase(path, cache_max_staleness=max_staleness)
+    log = []
+    while time.time() < until:
+        start = time.time()
+        doctor = next(d for d in db.get_all_doctors() if d['id'] == doctor_id)
+        log.append((start, doctor['experience']))
+    results.put(('reader', log, db.table_cache.hits, db.table_cache.misses))
+
+
+def availability_coherence(db):
+    """Working hours changed through one instance must bind bookings checked by another.
+    
+    Two HospitalDatabase instances on one file stand in for two processes;
+    the second compiles the doctor's hours before every change the first makes.
+    """
+    other = HospitalDatabase(db.db_name)
+    doctor = {'id': "COHERENCE-D1", 'name': "Dr. Coherence Hours", 'specialization': "Benchmarking",
+              'experience': 0}
+    db.add_doctor(doctor)
+    early, leave = "03-03-2031 04:00:00", "04-03-2031 10:00:00"
+    steps = [("unrestricted", lambda: None, {early: True, leave: True}),
+             ("weekday hours", lambda: db.set_doctor_availability(
+                 doctor['id'], {day: [("09:00", "12:00")] for day in range(5)}), {early: False, leave: True}),
+             ("leave day", lambda: db.add_availability_exception(doctor['id'], "04-03-2031"),
+              {early: False, leave: False}),
+             ("hours cleared", lambda: db.clear_doctor_availability(doctor['id']), {early: True, leave: True})]
+    failures = []
+    for name, change, expected in steps:
+        change()
+        for when, allowed in expected.items():
+            if other.check_availability(doctor['name'], when)[0] != allowed:
+                failures.append(f"{name}: {when} {'refused' if allowed else 'allowed'}")
+    db.delete_doctor(doctor['id'])
+    return {'checks': sum(len(expected) for _, _, expected in steps), 'failures': failures, 'passed': not failures}
+
+
+def cache_coherence_stress(db, readers=3, max_staleness=0.05, writes=100, pause=0.01):
+    """A writer process updates a doctor while reader processes read it through their table caches.
+    
+    A read that starts after the write of value n was committed may only
+    return an older value if it started less than ``max_staleness`` seconds
+    after that commit; 'max_stale_ms' is the worst gap observed.
+    """
+    doctor = {'id': "COHERENCE-D0", 'name': "Dr. Coherence", 'specialization': "Benchmarking", 'experience': 0}
+    db.add_doctor(doctor)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    until = time.time() + 2 + writes * pause
+    processes = [context.Process(target=_coherence_reader, args=(db.db_name, doctor['id'], max_staleness,
+                                                                until, results)) for _ in range(readers)]
+    for process in processes:
+        process.start()
+    # Readers are warm (cache filled) before the first write
+    time.sleep(1)
+    writer = context.Process(target=_coherence_writer, args=(db.db_name, doctor, writes, pause, results))
+    writer.start()
+    logs = [results.get() for _ in range(readers + 1)]
+    for process in processes + [writer]:
+        process.join()
+    
+    committed = next(log[1] for log in logs if log[0] == 'writer')
+    reads = [read for log in logs if log[0] == 'reader' for read in log[1]]
+    max_stale = 0.0
+    for started, seen in reads:
+        # Oldest write this read missed, if it was already committed when the read started
+        if seen < writes and committed[seen][0] < started:
+            max_stale = max(max_stale, started - committed[seen][0])
+    result = {
+        'readers': readers,
+        'writes': writes,
+        'reads': len(reads),
+        'max_staleness_ms': max_staleness * 1000,
+        'max_stale_ms': max_stale * 1000,
+        'cache_hits': sum(log[2] for log in logs if log[0] == 'reader'),
+        'cache_misses': sum(log[3] for log in logs if log[0] == 'reader'),
+    }
+    db.delete_doctor(doctor['id'])
+    result['availability'] = availability_coherence(db)
+    result['passed'] = max_stale <= max_staleness and result['availability']['passed']
+    return result
+
+
+def schedule_requests(count, seed, first_day=datetime(2031, 3, 3)):
+    """Requests for a clinic week: a specialization, a two-hour preferred window
+    and the rest of that day as a fallback, random priorities."""
+    rng = random.Random(f"schedule-{seed}")
+    specializations = list(SPECIALIZATION_WEIGHTS)
+    weights = list(SPECIALIZATION_WEIGHTS.values())
+    for i in range(count):
+        day = (first_day + timedelta(days=rng.randrange(5))).strftime("%d-%m-%Y")
+        hour = rng.choice((9, 11, 13, 15))
+        yield {
+            'patientName': f"Planned Patient {i}",
+            'specialization': rng.choices(specializations, weights)[0],
+            'priority': rng.randrange(5),
+            'windows': [(f"{day} {hour:02d}:00:00", f"{day} {hour + 2:02d}:00:00"),
+                        (f"{day} 09:00:00", f"{day} 17:00:00")],
+        }
+
+
+def schedule_batch(db, count, seed):
+    """Plan and book ``count`` requests with ClinicDayPlanner in one transaction."""
+    requests = list(schedule_requests(count, seed))
+    result = ClinicDayPlanner(db).schedule(requests)
+    return {
+        'runs': 1,
+        'requests': count,
+        'placed': len(result['placed']),
+        'unplaced': len(result['unplaced']),
+        'plan_ms': result['plan_ms'],
+        'book_ms': result['book_ms'],
+        'median_ms': result['plan_ms'] + result['book_ms'],
+    }
+
+
+def page_cases(db, scale, seed):
+    """Yield the data work each app.py page does on a rerun (no rendering)."""
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    sample = _sample_appointment(scale, seed)
+    filter_date = datetime.strptime(sample['appointmentDateTime'], DATETIME_FORMAT).date()
+
+    def dashboard(i):
+        patients = db.get_all_patients()
+        doctors = db.get_all_doctors()
+        appointments = db.get_all_appointments()
+        return patients + doctors + appointments
+
+    def patients_view_all(i):
+        patients = db.get_all_patients()
+        if pd is not None:
+            pd.DataFrame(patients)
+        return patients
+
+    def patients_search(i):
+        patients = db.get_all_patients()
+        return [db.get_patient_by_id(patients[len(patients) // 2]['id'])]
+
+    def appointments_view_all(i):
+        filtered = db.get_appointments_in_range(filter_date, filter_date)
+        if pd is not None and filtered:
+            pd.DataFrame(filtered)
+        return filtered
+
+    yield "page:dashboard", dashboard, 3
+    yield "page:patients_view_all", patients_view_all, 3
+    yield "page:patients_search", patients_search, 3
+    yield "page:appointments_view_all", appointments_view_all, 3
+
+
+# Modules whose cold import time is tracked; app runs its dashboard in bare mode
+STARTUP_MODULES = ("database", "main", "scheduler", "app")
+
+
+def import_time(module, repeat=5, cwd=None):
+    """Cumulative import time of ``module`` in fresh interpreters, from ``python -X importtime``."""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, 'PYTHONPATH': repo_dir, 'HOSPITAL_PURGE_INTERVAL': "0",
+           'HOSPITAL_DB_URL': os.path.join(cwd or repo_dir, "startup_bench.db")}
+    timings = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=cwd, env=env, capture_output=True, text=True, check=True)
+        for line in proc.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            parts = line.split("|")
+            if line.startswith("import time:") and len(parts) == 3 and parts[2].strip() == module:
+                timings.append(int(parts[1]) / 1e6)
+    return _summary(timings)
+
+
+def startup_cases(workdir, run_path):
+    """(name, result) for cold imports and for opening an up-to-date database."""
+    for module in STARTUP_MODULES:
+        yield f"startup:import_{module}", import_time(module, cwd=workdir)
+    if run_path:
+        yield "startup:open_database", _measure(lambda i: HospitalDatabase(run_path), 20)
+
+
+def report_cases(db, workdir, days=5):
+    """(name, result) for the day sheets of the busiest ``days`` days, one doctor
+    at a time through get_doctor_schedule and with reports.py on 1 and on
+    REPORT_WORKERS processes."""
+    conn = db.get_connection()
+    busiest = [datetime.strptime(day, "%Y-%m-%d").date() for (day,) in conn.execute('''
+        SELECT substr(appointment_ts, 1, 10) AS day FROM appointments WHERE deleted_at IS NULL
+        GROUP BY day ORDER BY COUNT(*) DESC LIMIT ?
+    ''', (days,)).fetchall()]
+    conn.close()
+    doctor_names = [doctor['name'] for doctor in db.get_all_doctors()]
+    sheets = len(busiest) * len(doctor_names)
+    
+    def schedule_loop(i):
+        for day in busiest:
+            for name in doctor_names:
+                db.get_doctor_schedule(name, day.strftime("%d-%m-%Y"))
+    
+    result = _measure(schedule_loop, 1)
+    yield "reports:get_doctor_schedule_loop", {**result, 'sheets': sheets}
+    out_dir = os.path.join(workdir, "bench_reports")
+    for workers in sorted({1, REPORT_WORKERS}):
+        def render(i):
+            return [generate_reports(db, day, os.path.join(out_dir, str(day)), "html", workers) for day in busiest]
+        result = _measure(render, 1)
+        yield f"reports:day_sheets_{workers}_workers", {**result, 'sheets': sheets,
+                                                        'sheets_per_s': sheets / (result['median_ms'] / 1000)}
+    for day in busiest:
+        for name in os.listdir(os.path.join(out_dir, str(day))):
+            os.remove(os.path.join(out_dir, str(day), name))
+        os.rmdir(os.path.join(out_dir, str(day)))
+    os.rmdir(out_dir)
+
+
+def _open_run_database(workdir, scale, seed, db_url):
+    if db_url:
+        db = open_database(db_url)
+        print(f"[{scale}] reseeding {db_url} ...", flush=True)
+        db.reset_all_data()
+        seed_database(db, *SCALES[scale], seed)
+        return db, None
+    path = _prepare_database(workdir, scale, seed)
+    # Benchmarks write, so work on a copy and keep the seeded file pristine
+    run_path = path + ".run"
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(run_path)
+    source.backup(target)
+    source.close()
+    target.close()
+    return HospitalDatabase(run_path), run_path
+
+
+def run_scale(workdir, scale, seed, max_full_scan_rows, only=None, db_url=None, stress_writers=8,
+              schedule_count=10_000):
+    db, run_path = _open_run_database(workdir, scale, seed, db_url)
+    results = {}
+    full_scan = SCALES[scale][0] <= max_full_scan_rows
+    cases = list(database_cases(db, scale, seed)) + list(page_cases(db, scale, seed))
+    for name, func, repeat in cases:
+        if only and not any(part in name for part in only):
+            continue
+        if not full_scan and ("get_all" in name or name.startswith("page:")):
+            results[name] = {'skipped': f"more than {max_full_scan_rows} rows"}
+            continue
+        results[name] = _measure(func, repeat)
+        print(f"[{scale}] {name:<32} median {results[name]['median_ms']:10.3f} ms", flush=True)
+
+    if not only or any("startup" in part for part in only):
+        for name, result in startup_cases(workdir, run_path):
+            results[name] = result
+            print(f"[{scale}] {name:<32} median {result['median_ms']:10.3f} ms", flush=True)
+    
+    if not only or any(part in "stress:concurrent_edits" for part in only):
+        stress = results["stress:concurrent_edits"] = concurrent_edit_stress(db, stress_writers)
+        print(f"[{scale}] {'stress:concurrent_edits':<32} {stress['applied']} applied, {stress['conflicts']} "
+              f"conflicts, {stress['lost_updates']} lost, {stress['slot_winners']} slot winner(s) "
+              f"in {stress['total_ms']:.0f} ms", flush=True)
+        if not stress['passed']:
+            print(f"[{scale}] stress:concurrent_edits FAILED {stress['errors']}", flush=True)
+    
+    if run_path and (not only or any(part in "stress:cache_coherence" for part in only)):
+        coherence = results["stress:cache_coherence"] = cache_coherence_stress(db)
+        print(f"[{scale}] {'stress:cache_coherence':<32} {coherence['reads']} reads, worst staleness "
+              f"{coherence['max_stale_ms']:.1f} ms (bound {coherence['max_staleness_ms']:.0f} ms), "
+              f"{coherence['cache_hits']} cache hits, {coherence['availability']['checks']} working-hours "
+              f"checks across instances", flush=True)
+        for failure in coherence['availability']['failures']:
+            print(f"[{scale}] stress:cache_coherence stale working hours: {failure}", flush=True)
+        if not coherence['passed']:
+            print(f"[{scale}] stress:cache_coherence FAILED", flush=True)
+    
+    if schedule_count and (not only or any(part in "schedule_batch" for part in only)):
+        schedule = results["schedule_batch"] = schedule_batch(db, schedule_count, seed)
+        print(f"[{scale}] {'schedule_batch':<32} {schedule['placed']} of {schedule['requests']} placed, "
+              f"plan {schedule['plan_ms']:.0f} ms, book {schedule['book_ms']:.0f} ms", flush=True)
+    
+    if isinstance(db, HospitalDatabase) and (not only or any("reports" in part for part in only)):
+        for name, result in report_cases(db, workdir):
+            results[name] = result
+            print(f"[{scale}] {name:<32} {result['sheets']} sheets in {result['median_ms']:.0f} ms", flush=True)
+    
+    if isinstance(db, HospitalDatabase) and (not only or any("backup" in part for part in only)):
+        backup_path = run_path + ".backup"
+        results["backup_database"] = _measure(lambda i: backup_database(db, backup_path), 1)
+        results["backup_database"]['mb'] = os.path.getsize(backup_path) / 1e6
+        results["backup_database"]['mb_per_s'] = (results["backup_database"]['mb']
+                                                  / (results["backup_database"]['median_ms'] / 1000))
+        results["restore_database"] = _measure(lambda i: restore_database(db, backup_path), 1)
+        os.remove(backup_path)
+        for name in ("backup_database", "restore_database"):
+            print(f"[{scale}] {name:<32} median {results[name]['median_ms']:10.3f} ms")
+
+    if not only or any("reset_all_data" in part for part in only):
+        results["reset_all_data"] = _measure(lambda i: db.reset_all_data(), 1)
+        print(f"[{scale}] {'reset_all_data':<32} median {results['reset_all_data']['median_ms']:10.3f} ms")
+    if run_path:
+        os.remove(run_path)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path, threshold):
+    """Print a per-case comparison and return the number of regressions."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = 0
+    print(f"\nComparison against {baseline_path} (commit {baseline['meta'].get('commit')})")
+    for scale, cases in current['results'].items():
+        for name, result in cases.items():
+            before = baseline['results'].get(scale, {}).get(name)
+            if not before or 'median_ms' not in before or 'median_ms' not in result:
+                continue
+            ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif ratio < 1 - threshold:
+                flag = "  improved"
+            print(f"[{scale}] {name:<32} {before['median_ms']:10.3f} -> {result['median_ms']:10.3f} ms"
+                  f" ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HospitalDatabase at several data scales")
+    parser.add_argument("--scales", default="10k", help=f"comma separated, from {', '.join(SCALES)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=".bench", help="where seeded databases are kept")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--only", help="comma separated substrings of case names to run")
+    parser.add_argument("--max-full-scan-rows", type=int, default=1_000_000,
+                        help="skip get_all_* and page cases above this many appointments")
+    parser.add_argument("--db-url", help="benchmark this database URL (e.g. postgresql://...) instead "
+                        "of seeded SQLite files; its data is replaced")
+    parser.add_argument("--stress-writers", type=int, default=8,
+                        help="threads racing to edit the same appointment in stress:concurrent_edits")
+    parser.add_argument("--schedule-requests", type=int, default=10_000,
+                        help="requests planned and booked in schedule_batch (0 skips it)")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    only = [s.strip() for s in args.only.split(",")] if args.only else None
+    os.makedirs(args.workdir, exist_ok=True)
+
+    output = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(timespec="seconds"),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'backend': args.db_url.split(":", 1)[0] if args.db_url else 'sqlite',
+        },
+        'results': {},
+    }
+    for scale in scales:
+        output['results'][scale] = run_scale(args.workdir, scale, args.seed,
+                                             args.max_full_scan_rows, only, args.db_url, args.stress_writers,
+                                             args.schedule_requests)
+
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    stress_failed = any(not cases.get(name, {}).get('passed', True)
+                        for cases in output['results'].values()
+                        for name in ("stress:concurrent_edits", "stress:cache_coherence"))
+    if stress_failed or (args.compare and compare(output, args.compare, args.threshold)):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# calendar_feed.py
+"""iCalendar feeds of each doctor's appointments.
+
+A feed is rendered straight off an indexed cursor, one VEVENT at a time, so
+a doctor's whole history is never built up as a list.  Triggers stamp
+every appointment write in ``doctor_schedule_versions`` per doctor, and the
+feed's ETag is made of that version, the doctor row's version and the date
+range: a calendar app polling with If-None-Match gets 304 Not Modified
+after two primary-key lookups, and any other request for an unchanged feed
+is served from the rendered bytes kept in memory.
+
+    python calendar_feed.py --db hospital.db export D1 > d1.ics
+    python calendar_feed.py --db hospital.db serve --port 8025
+    # then subscribe to http://localhost:8025/doctors/D1.ics?from=01-01-2026&to=31-12-2026
+"""
+import argparse
+import re
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import parse_qs
+
+from database import DATETIME_FORMAT, HospitalDatabase
+
+# Range of a feed requested without one, around today
+FEED_PAST_DAYS = 30
+FEED_FUTURE_DAYS = 365
+# Rendered feeds kept in memory; a single feed larger than a quarter of
+# this is streamed every time instead
+FEED_CACHE_BYTES = 32 * 1024 * 1024
+# VEVENTs per chunk written to the client
+EVENTS_PER_CHUNK = 200
+
+FEED_PATH = re.compile(r"/doctors/([^/]+)\.ics")
+
+
+def escape_text(value):
+    """Escape a TEXT property value (RFC 5545 3.3.11)."""
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def fold(line):
+    """Fold a content line at 75 octets, continuation lines starting with a space."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    # Continuation lines lose one octet to the leading space
+    limit = 75
+    while len(data) > limit:
+        cut = limit
+        # Never split a UTF-8 sequence
+        while (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+        limit = 74
+    parts.append(data.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ical_time(value):
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+class FeedCache:
+    """Rendered feeds by request, least recently used dropped first."""
+
+    def __init__(self, max_bytes=FEED_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._feeds.get(key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._feeds.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, etag, body):
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._feeds.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._feeds[key] = (etag, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, dropped) = self._feeds.popitem(last=False)
+                self.size -= len(dropped)
+
+
+class DoctorFeeds:
+    """Feeds of one database; thread-safe, meant to be shared by all requests."""
+
+    def __init__(self, db, cache=None):
+        self.db = db
+        self.cache = cache if cache is not None else FeedCache()
+
+    @staticmethod
+    def default_range(today=None):
+        today = today or date.today()
+        return today - timedelta(days=FEED_PAST_DAYS), today + timedelta(days=FEED_FUTURE_DAYS)
+
+    def render(self, doctor_name, start, end, version):
+        """Yield the feed in UTF-8 chunks of EVENTS_PER_CHUNK events."""
+        # DTSTAMP comes from the schedule version, so an unchanged schedule
+        # renders to the same bytes
+        stamp = _ical_time(datetime.fromtimestamp(version / 1000, timezone.utc)) + "Z"
+        slot = timedelta(minutes=self.db.slots.slot_minutes(doctor_name))
+        lines = [
+            "BEGIN:VCALENDAR\r\n",
+            "VERSION:2.0\r\n",
+            "PRODID:-//Hospital Appointment Manager//Doctor schedule//EN\r\n",
+            "CALSCALE:GREGORIAN\r\n",
+            "METHOD:PUBLISH\r\n",
+            fold(f"X-WR-CALNAME:{escape_text(doctor_name)}"),
+        ]
+        events = 0
+        for appointment_id, patient_name, appointment_datetime in self.db.iter_doctor_appointments(
+                doctor_name, start, end):
+            starts = datetime.strptime(appointment_datetime, DATETIME_FORMAT)
+            lines += [
+                "BEGIN:VEVENT\r\n",
+                fold(f"UID:{escape_text(appointment_id)}@hospital-appointment-manager"),
+                f"DTSTAMP:{stamp}\r\n",
+                f"DTSTART:{_ical_time(starts)}\r\n",
+                f"DTEND:{_ical_time(starts + slot)}\r\n",
+                fold(f"SUMMARY:{escape_text(patient_name)}"),
+                fold(f"DESCRIPTION:Appointment {escape_text(appointment_id)}"),
+                "END:VEVENT\r\n",
+            ]
+            events += 1
+            if events % EVENTS_PER_CHUNK == 0:
+                yield "".join(lines).encode("utf-8")
+                lines = []
+        lines.append("END:VCALENDAR\r\n")
+        yield "".join(lines).encode("utf-8")
+
+    def _render_and_cache(self, key, etag, doctor_name, start, end, version):
+        chunks = []
+        for chunk in self.render(doctor_name, start, end, version):
+            chunks.append(chunk)
+            yield chunk
+        # Only a feed sent in full is kept
+        self.cache.put(key, etag, b"".join(chunks))
+
+    def respond(self, doctor_id, start=None, end=None, if_none_match=None):
+        """-> (HTTP status, headers, iterable of body chunks) for one feed request.
+
+        ``start`` and ``end`` are dates (default: FEED_PAST_DAYS back to
+        FEED_FUTURE_DAYS ahead); ``if_none_match`` is the request header.
+        """
+        default_start, default_end = self.default_range()
+        start, end = start or default_start, end or default_end
+        state = self.db.get_doctor_feed_state(doctor_id)
+        if state is None:
+            return "404 Not Found", [("Content-Type", "text/plain")], [b"Unknown doctor\n"]
+        doctor_name, doctor_version, schedule_version = state
+        etag = f'"{doctor_version}-{schedule_version}-{start:%Y%m%d}-{end:%Y%m%d}"'
+        headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+        if if_none_match and (if_none_match.strip() == "*" or etag in
+                              (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))):
+            return "304 Not Modified", headers, []
+
+        headers.append(("Content-Type", "text/calendar; charset=utf-8"))
+        key = (doctor_id, start, end)
+        body = self.cache.get(key, etag)
+        if body is not None:
+            return "200 OK", headers + [("Content-Length", str(len(body)))], [body]
+        return "200 OK", headers, self._render_and_cache(key, etag, doctor_name, start, end, schedule_version)
+
+    def wsgi_app(self, environ, start_response):
+        """WSGI application serving GET /doctors/<doctor id>.ics?from=dd-mm-YYYY&to=dd-mm-YYYY"""
+        match = FEED_PATH.fullmatch(environ.get("PATH_INFO", ""))
+        if match is None:
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"Not found\n"]
+        if environ["REQUEST_METHOD"] not in ("GET", "HEAD"):
+            start_response("405 Method Not Allowed", [("Allow", "GET, HEAD")])
+            return []
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        try:
+            start, end = (datetime.strptime(query[name][0], "%d-%m-%Y").date() if name in query else None
+                          for name in ("from", "to"))
+        except ValueError:
+            start_response("400 Bad Request", [("Content-Type", "text/plain")])
+            return [b"Dates are dd-mm-YYYY\n"]
+        status, headers, body = self.respond(match.group(1), start, end, environ.get("HTTP_IF_NONE_MATCH"))
+        start_response(status, headers)
+        if environ["REQUEST_METHOD"] == "HEAD":
+            return []
+        return body
+
+
+def serve(feeds, host, port):
+    # Imported here: only the server needs them
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = make_server(host, port, feeds.wsgi_app, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    print(f"Serving doctor calendars on http://{host}:{port}/doctors/<doctor id>.ics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="iCalendar feeds of doctors' appointments")
+    parser.add_argument("--db", default="hospital.db", help="SQLite database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="write one doctor's feed to stdout")
+    export_cmd.add_argument("doctor_id")
+    export_cmd.add_argument("--from", dest="start", help="first day, dd-mm-YYYY")
+    export_cmd.add_argument("--to", dest="end", help="last day, dd-mm-YYYY")
+    serve_cmd = commands.add_parser("serve", help="serve every doctor's feed over HTTP")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    feeds = DoctorFeeds(HospitalDatabase(args.db))
+    if args.command == "serve":
+        serve(feeds, args.host, args.port)
+        return
+    start, end = (datetime.strptime(value, "%d-%m-%Y").date() if value else None for value in (args.start, args.end))
+    status, _, body = feeds.respond(args.doctor_id, start, end)
+    if not status.startswith("200"):
+        print(f"No doctor with ID {args.doctor_id}", file=sys.stderr)
+        sys.exit(1)
+    for chunk in body:
+        sys.stdout.buffer.write(chunk)
+
+
+if __name__ == '__main__':
+    main()
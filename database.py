@@ -1,18 +1,297 @@
 # database.py
+import json
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 
-class HospitalDatabase:
-    def __init__(self, db_name="hospital.db"):
+from availability import SlotCalendar, format_hhmm, normalize_weekly, parse_hhmm, shift_end, slot_starts, to_date
+from dedup import DUPLICATE_THRESHOLD, blocking_keys, score
+from instrumentation import instrumented
+from repository import VERSION_CONFLICT, HospitalRepository
+from table_cache import TableCache
+from triage import DURATION_HISTORY, SEVERITY_LEVELS, TriageQueue
+from waitlist import WaitlistQueue
+
+DATETIME_FORMAT = "%d-%m-%Y %H:%M:%S"
+SORTABLE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Appointments older than this are moved to the archive by archive_appointments()
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+
+# Soft-deleted rows are removed by purge_deleted() in batches this size
+PURGE_BATCH_SIZE = 500
+PURGE_PAUSE_SECONDS = 0.05
+
+# Maintenance (see maintenance.py): free pages returned to the file system per
+# incremental vacuum step, the pause between steps, and the rows per index
+# ANALYZE samples, which keeps it cheap however large the tables grow
+VACUUM_STEP_PAGES = 256
+VACUUM_PAUSE_SECONDS = 0.05
+ANALYSIS_LIMIT = 1000
+# maintenance_log entries kept per task
+MAINTENANCE_LOG_KEEP = 50
+
+TABLES = ('patients', 'doctors', 'appointments')
+# Writes to these change which bookings a doctor's working hours allow
+AVAILABILITY_TABLES = ('doctors', 'doctor_availability', 'doctor_availability_exceptions')
+
+SLOT_TAKEN = "This time slot is already booked for the selected doctor"
+
+# Latest end of a waitlist window that has none
+WAITLIST_OPEN_END = "9999-12-31 23:59:59"
+
+# Milliseconds since the epoch; table versions start from and track this, so
+# they keep growing across a reset or a restore from backup
+NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# SQL equivalent of to_sortable() for backfilling existing rows
+SORTABLE_SQL = "substr({0}, 7, 4) || '-' || substr({0}, 4, 2) || '-' || substr({0}, 1, 2) || substr({0}, 11)"
+
+def to_sortable(value):
+    """'dd-mm-YYYY HH:MM:SS' (or a date/datetime) -> 'YYYY-mm-dd HH:MM:SS'"""
+    if isinstance(value, datetime):
+        return value.strftime(SORTABLE_FORMAT)
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d 00:00:00")
+    return f"{value[6:10]}-{value[3:5]}-{value[0:2]}{value[10:]}"
+
+class _BatchConnection(sqlite3.Connection):
+    """Shared by every call inside HospitalDatabase.batch(); the block commits and closes it."""
+    
+    def commit(self):
+        pass
+    
+    def close(self):
+        pass
+
+class _TimedCursor(sqlite3.Cursor):
+    """Reports the time spent stepping statements to ``connection.stats``."""
+    
+    def _timed(self, step, *args):
+        start = time.perf_counter()
+        try:
+            return step(*args)
+        finally:
+            self.connection.stats.record_sql(time.perf_counter() - start)
+    
+    def execute(self, *args):
+        return self._timed(super().execute, *args)
+    
+    def executemany(self, *args):
+        return self._timed(super().executemany, *args)
+    
+    def executescript(self, *args):
+        return self._timed(super().executescript, *args)
+    
+    def fetchone(self):
+        return self._timed(super().fetchone)
+    
+    def fetchmany(self, *args):
+        return self._timed(super().fetchmany, *args)
+    
+    def fetchall(self):
+        return self._timed(super().fetchall)
+    
+    def __next__(self):
+        return self._timed(super().__next__)
+
+class _TimedConnection(sqlite3.Connection):
+    """Handed out by get_connection while instrumentation is on, so SQL time
+    is told apart from row mapping"""
+    
+    stats = None
+    
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+    
+    # Connection.execute() and friends would bypass cursor() from C
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+    
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+    
+    def executescript(self, *args):
+        return self.cursor().executescript(*args)
+    
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            self.stats.record_sql(time.perf_counter() - start)
+
+class _TimedBatchConnection(_BatchConnection, _TimedConnection):
+    """batch() connection while instrumentation is on"""
+
+class HospitalDatabase(HospitalRepository):
+    def __init__(self, db_name="hospital.db", instrument=False, slow_query_ms=None,
+                 archive_db=None, archive_after_days=ARCHIVE_AFTER_DAYS, cache_max_staleness=0.0):
         self.db_name = db_name
+        # Archived appointments live in this SQLite file when given, otherwise
+        # in the appointments_archive table of the main database
+        self.archive_db = archive_db
+        self.archive_table = "archive.appointments_archive" if archive_db else "appointments_archive"
+        self.archive_after_days = archive_after_days
+        self.stats = None
+        self._local = threading.local()
+        # get_all_* results, dropped when any process writes their table;
+        # None turns caching off
+        self.table_cache = None
+        if cache_max_staleness is not None:
+            self.table_cache = TableCache(
+                lambda: sqlite3.connect(self.db_name, check_same_thread=False), cache_max_staleness)
+        # Table versions as this process last saw them; without a cache
+        # one is kept only to watch the versions
+        self._table_versions = self.table_cache if self.table_cache is not None else TableCache(
+            lambda: sqlite3.connect(self.db_name, check_same_thread=False))
+        # Compiled doctor working hours, filled on first booking per doctor/day
+        # and dropped when any process changes working hours
+        self.slots = SlotCalendar(self._load_availability, self._availability_version)
+        # Waiting requests per doctor/specialization, loaded on the first cancellation
+        self.waitlist = WaitlistQueue(self._load_waitlist)
+        # Walk-ins per specialization, updated in place by this process's writes
+        self.triage = TriageQueue(self._load_triage)
+        if instrument:
+            self.enable_instrumentation(slow_query_ms)
         self.init_database()
     
     def get_connection(self):
-        return sqlite3.connect(self.db_name)
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            return batch
+        if self.stats is None:
+            return self._connect()
+        start = time.perf_counter()
+        conn = self._connect(factory=_TimedConnection)
+        conn.stats = self.stats
+        self.stats.record_connect(time.perf_counter() - start)
+        return conn
+    
+    def _connect(self, factory=sqlite3.Connection):
+        conn = sqlite3.connect(self.db_name, factory=factory)
+        if self.archive_db:
+            conn.execute("ATTACH DATABASE ? AS archive", (self.archive_db,))
+        return conn
+    
+    def _begin_immediate(self, conn):
+        # Take the write lock before reading, so a check and the write that
+        # depends on it cannot interleave with another writer
+        if not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+    
+    def _versioned_update(self, cursor, table, assignments, values, row_id, expected_version=None):
+        """UPDATE a live row and bump its version; None on success, else why not.
+        
+        With ``expected_version`` the row is only written if its version still
+        matches, i.e. nobody else changed it since the caller read it.
+        """
+        query = f'UPDATE {table} SET {assignments}, version = version + 1 WHERE id = ? AND deleted_at IS NULL'
+        params = [*values, row_id]
+        if expected_version is not None:
+            query += ' AND version = ?'
+            params.append(expected_version)
+        cursor.execute(query, params)
+        if cursor.rowcount:
+            return None
+        cursor.execute(f'SELECT 1 FROM {table} WHERE id = ? AND deleted_at IS NULL', (row_id,))
+        if cursor.fetchone():
+            return VERSION_CONFLICT
+        return f"{table[:-1].capitalize()} not found"
+    
+    @contextmanager
+    def batch(self):
+        """Run every add/update/delete in the block (on this thread) as one transaction.
+        
+        Saves a commit, and with it an fsync, per call; commits at the end of
+        the block and rolls everything back if it raises. Not for methods that
+        manage their own transactions (purge, archive, reminders, reset).
+        """
+        if getattr(self._local, 'batch', None) is not None:
+            yield
+            return
+        if self.stats is None:
+            conn = self._connect(factory=_BatchConnection)
+        else:
+            conn = self._connect(factory=_TimedBatchConnection)
+            conn.stats = self.stats
+        self._local.batch = conn
+        try:
+            yield
+            sqlite3.Connection.commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.batch = None
+            sqlite3.Connection.close(conn)
     
+    @instrumented
     def init_database(self):
+        """Bring the schema up to date.
+        
+        The version reached is stored in ``schema_version``, so opening a
+        database that is already current costs a single query; otherwise the
+        pending migrations run in one write transaction.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
+        latest = self.MIGRATIONS[-1][0]
+        if self._schema_version(cursor) < latest:
+            # auto_vacuum only takes on a file that has no tables yet, so it
+            # is set before WAL writes the header; older files keep theirs
+            # until rebuilt with `python maintenance.py vacuum --full`
+            for schema in self._schemas():
+                cursor.execute(f'PRAGMA {schema}.auto_vacuum=INCREMENTAL')
+            # WAL lets readers (including online backups) run alongside
+            # writers; the mode is kept in the file and cannot change inside
+            # a transaction
+            cursor.execute('PRAGMA journal_mode=WAL')
+            if self.archive_db:
+                cursor.execute('PRAGMA archive.journal_mode=WAL')
+            self._begin_immediate(conn)
+            # Another process may have migrated while this one waited for the lock
+            self._migrate(cursor, self._schema_version(cursor))
+            conn.commit()
+        conn.close()
+        self.slots.invalidate()
+        self.waitlist.invalidate()
+        self.triage.invalidate()
+        # The cached get_all_* results too, when caching is on
+        self._table_versions.invalidate()
+    
+    def _migrate(self, cursor, version):
+        # Inside the caller's write transaction
+        for target, migration in self.MIGRATIONS:
+            if target > version:
+                migration(self, cursor)
+        cursor.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)')
+        cursor.execute('DELETE FROM schema_version')
+        cursor.execute('INSERT INTO schema_version (version) VALUES (?)', (self.MIGRATIONS[-1][0],))
+    
+    def _schema_version(self, cursor):
+        try:
+            row = cursor.execute('SELECT version FROM schema_version').fetchone()
+        except sqlite3.OperationalError:
+            # Created before schema versioning; the migrations are idempotent
+            # and bring it up to date
+            return 0
+        if self.archive_db and not cursor.execute('''
+            SELECT 1 FROM archive.sqlite_master WHERE name = 'appointments_archive'
+        ''').fetchone():
+            # A new archive file gets its table from the baseline migration
+            return 0
+        return row[0] if row else 0
+    
+    def _schemas(self):
+        return ('main', 'archive') if self.archive_db else ('main',)
+    
+    def _create_baseline_schema(self, cursor):
+        # Every table and index up to schema versioning. Written to run on a
+        # database at any earlier state, hence IF NOT EXISTS and the column checks
         
         # Create patients table
         cursor.execute('''
@@ -24,7 +303,9 @@ class HospitalDatabase:
                 address TEXT,
                 disease TEXT NOT NULL,
                 referred_by TEXT,
-                admission_datetime TEXT NOT NULL
+                admission_datetime TEXT NOT NULL,
+                deleted_at TEXT,
+                version INTEGER NOT NULL DEFAULT 1
             )
         ''')
         
@@ -34,7 +315,9 @@ class HospitalDatabase:
                 id TEXT PRIMARY KEY,
                 name TEXT NOT NULL,
                 specialization TEXT NOT NULL,
-                experience INTEGER NOT NULL
+                experience INTEGER NOT NULL,
+                deleted_at TEXT,
+                version INTEGER NOT NULL DEFAULT 1
             )
         ''')
         
@@ -44,17 +327,385 @@ class HospitalDatabase:
                 id TEXT PRIMARY KEY,
                 patient_name TEXT NOT NULL,
                 doctor_name TEXT NOT NULL,
-                appointment_datetime TEXT NOT NULL
+                appointment_datetime TEXT NOT NULL,
+                appointment_ts TEXT,
+                deleted_at TEXT,
+                version INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+        
+        # appointment_datetime is dd-mm-YYYY and does not sort as text, so a
+        # YYYY-mm-dd copy backs every range query and the indexes below
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(appointments)')]
+        if 'appointment_ts' not in columns:
+            cursor.execute('ALTER TABLE appointments ADD COLUMN appointment_ts TEXT')
+        
+        # Deletes only set deleted_at; purge_deleted() removes rows later
+        for table in TABLES:
+            columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+            if 'deleted_at' not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN deleted_at TEXT')
+            # Bumped by every update; edits made against an older version are refused
+            if 'version' not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+            cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_{table}_deleted
+                ON {table} (deleted_at) WHERE deleted_at IS NOT NULL
+            ''')
+        
+        # Partial indexes cover live rows only, so tombstones cost reads nothing
+        cursor.execute('DROP INDEX IF EXISTS idx_appointments_doctor_ts')
+        cursor.execute('DROP INDEX IF EXISTS idx_appointments_ts')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_appointments_live_doctor_ts
+            ON appointments (doctor_name, appointment_ts) WHERE deleted_at IS NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_appointments_live_ts
+            ON appointments (appointment_ts) WHERE deleted_at IS NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_doctors_live_specialization
+            ON doctors (specialization COLLATE NOCASE) WHERE deleted_at IS NULL
+        ''')
+        # Rows written by older versions or other tools (index lookup on NULL)
+        cursor.execute(f'''
+            UPDATE appointments SET appointment_ts = {SORTABLE_SQL.format('appointment_datetime')}
+            WHERE appointment_ts IS NULL
+        ''')
+        
+        # Create archive table for historical appointments
+        schema = "archive." if self.archive_db else ""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}appointments_archive (
+                id TEXT PRIMARY KEY,
+                patient_name TEXT NOT NULL,
+                doctor_name TEXT NOT NULL,
+                appointment_datetime TEXT NOT NULL,
+                appointment_ts TEXT NOT NULL,
+                archived_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS {schema}idx_appointments_archive_doctor_ts
+            ON appointments_archive (doctor_name, appointment_ts)
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS {schema}idx_appointments_archive_ts
+            ON appointments_archive (appointment_ts)
+        ''')
+        
+        # Append-only change feed for downstream consumers (see changes_since)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                changed_at TEXT NOT NULL,
+                data TEXT
+            )
+        ''')
+        
+        # Reminder outbox filled by enqueue_reminders() and drained by reminders.py
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reminder_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                appointment_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                patient_name TEXT NOT NULL,
+                doctor_name TEXT NOT NULL,
+                appointment_datetime TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TEXT NOT NULL,
+                claimed_at TEXT,
+                sent_at TEXT,
+                last_error TEXT,
+                UNIQUE (appointment_id, kind)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_reminder_outbox_due
+            ON reminder_outbox (status, next_attempt_at)
+        ''')
+        
+        # Doctor working hours: weekly template (JSON) plus dated exceptions
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS doctor_availability (
+                doctor_id TEXT PRIMARY KEY,
+                slot_minutes INTEGER NOT NULL,
+                weekly TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS doctor_availability_exceptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doctor_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                start_minute INTEGER NOT NULL,
+                end_minute INTEGER NOT NULL,
+                available INTEGER NOT NULL DEFAULT 0,
+                reason TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_doctor_availability_exceptions_doctor_day
+            ON doctor_availability_exceptions (doctor_id, day)
+        ''')
+        
+        # Patients waiting for a freed slot with a doctor or any doctor of a
+        # specialization; cancellations offer the slot via self.waitlist
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS waitlist (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                patient_name TEXT NOT NULL,
+                doctor_name TEXT,
+                specialization TEXT,
+                earliest_ts TEXT NOT NULL,
+                latest_ts TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'waiting',
+                appointment_id TEXT,
+                created_at TEXT NOT NULL,
+                offered_at TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_waitlist_waiting
+            ON waitlist (id) WHERE status = 'waiting'
+        ''')
+        
+        # Blocking keys of every patient (see dedup.py): a new registration is
+        # only compared with the patients that share one of its keys
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS patient_blocking_keys (
+                key TEXT NOT NULL,
+                patient_id TEXT NOT NULL,
+                PRIMARY KEY (key, patient_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_patient_blocking_keys_patient
+            ON patient_blocking_keys (patient_id)
+        ''')
+        # Databases created before the key table
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM patient_blocking_keys)')
+        if not cursor.fetchone()[0]:
+            cursor.execute('SELECT id, name, age, address FROM patients')
+            self._store_blocking_keys(cursor, cursor.fetchall())
+    
+    def _add_table_versions(self, cursor):
+        # One row per table, stamped by triggers on every insert, update and
+        # delete whichever process or tool makes it (see table_cache.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS table_versions (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        ''')
+        for table in TABLES:
+            self._add_version_triggers(cursor, table)
+    
+    @staticmethod
+    def _add_version_triggers(cursor, table):
+        cursor.execute(f'INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, {NOW_MS_SQL})',
+                       (table,))
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_version
+                AFTER {operation} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = MAX(version + 1, {NOW_MS_SQL})
+                    WHERE table_name = '{table}';
+                END
+            ''')
+    
+    def _add_patient_timeline_indexes(self, cursor):
+        # get_patient_timeline reads a patient's newest appointments straight off these
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_appointments_live_patient_ts
+            ON appointments (patient_name, appointment_ts) WHERE deleted_at IS NULL
+        ''')
+        schema = "archive." if self.archive_db else ""
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS {schema}idx_appointments_archive_patient_ts
+            ON appointments_archive (patient_name, appointment_ts)
+        ''')
+    
+    def _add_triage_queue(self, cursor):
+        # Walk-in patients per specialization (see triage.py); rows stay once
+        # seen or gone, and finished ones feed the consultation length estimate
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS triage_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                patient_name TEXT NOT NULL,
+                specialization TEXT NOT NULL COLLATE NOCASE,
+                severity INTEGER NOT NULL,
+                arrived_ts TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'waiting',
+                doctor_name TEXT,
+                started_ts TEXT,
+                finished_ts TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_triage_queue_active
+            ON triage_queue (status) WHERE status IN ('waiting', 'in_consultation')
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_triage_queue_finished
+            ON triage_queue (specialization, finished_ts) WHERE status = 'done'
+        ''')
+        # The version tells this process's queue when another one wrote
+        self._add_version_triggers(cursor, 'triage_queue')
+    
+    def _add_doctor_schedule_versions(self, cursor):
+        # Stamped per doctor on every appointment write, so a calendar feed
+        # (see calendar_feed.py) knows it changed without reading the schedule
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS doctor_schedule_versions (
+                doctor_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO doctor_schedule_versions (doctor_name, version)
+            SELECT DISTINCT doctor_name, {NOW_MS_SQL} FROM appointments
+        ''')
+        for operation, rows in (('INSERT', ('NEW',)), ('UPDATE', ('OLD', 'NEW')), ('DELETE', ('OLD',))):
+            bumps = "".join(f'''
+                    INSERT INTO doctor_schedule_versions (doctor_name, version)
+                    VALUES ({row}.doctor_name, {NOW_MS_SQL})
+                    ON CONFLICT (doctor_name) DO UPDATE SET version = MAX(version + 1, excluded.version);'''
+                for row in rows)
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_appointments_{operation.lower()}_doctor_version
+                AFTER {operation} ON appointments
+                BEGIN{bumps}
+                END
+            ''')
+    
+    def _add_availability_versions(self, cursor):
+        # Lets every process's SlotCalendar see working hours changed elsewhere
+        for table in AVAILABILITY_TABLES[1:]:
+            self._add_version_triggers(cursor, table)
+    
+    def _add_maintenance_log(self, cursor):
+        # One row per maintenance run, from any process; maintenance.py reads
+        # the latest per task to decide what is due
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS maintenance_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT NOT NULL,
+                started_ts TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                result TEXT
             )
         ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log (task, started_ts)
+        ''')
+    
+    # (version, migration) in order; a schema change adds an entry here
+    # instead of editing an earlier migration
+    MIGRATIONS = (
+        (1, _create_baseline_schema),
+        (2, _add_table_versions),
+        (3, _add_patient_timeline_indexes),
+        (4, _add_triage_queue),
+        (5, _add_doctor_schedule_versions),
+        (6, _add_maintenance_log),
+        (7, _add_availability_versions),
+    )
+    
+    def _log_change(self, cursor, table, row_id, operation, data=None):
+        # Runs inside the caller's transaction, so the entry commits with the write
+        cursor.execute('''
+            INSERT INTO change_log (table_name, row_id, operation, changed_at, data)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (
+            table,
+            row_id,
+            operation,
+            datetime.now().strftime(DATETIME_FORMAT),
+            json.dumps(data, default=str) if data is not None else None
+        ))
+    
+    def _cached_read(self, key, tables, load):
+        # Inside batch() this thread may have uncommitted writes the cache cannot see
+        if self.table_cache is None or getattr(self._local, 'batch', None) is not None:
+            return load()
+        return self.table_cache.read(key, tables, load)
+    
+    def _store_blocking_keys(self, cursor, rows):
+        # rows are (id, name, age, address); keys already stored are kept
+        cursor.executemany('INSERT OR IGNORE INTO patient_blocking_keys (key, patient_id) VALUES (?, ?)', [
+            (key, row[0])
+            for row in rows
+            for key in blocking_keys({'name': row[1], 'age': row[2], 'address': row[3]})
+        ])
+    
+    @instrumented
+    def changes_since(self, seq=0, limit=1000):
+        """Change log entries after ``seq``, oldest first.
         
+        Consumers keep the last ``seq`` they processed and pass it back; each
+        call reads only the new entries through the primary key. A 'reset'
+        entry means every table was emptied.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT seq, table_name, row_id, operation, changed_at, data
+            FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?
+        ''', (seq, limit))
+        changes = cursor.fetchall()
+        conn.close()
+        
+        return [{
+            'seq': row[0],
+            'table': row[1],
+            'id': row[2],
+            'operation': row[3],
+            'changedAt': row[4],
+            'data': json.loads(row[5]) if row[5] is not None else None
+        } for row in changes]
+    
+    @instrumented
+    def prune_change_log(self, before_seq):
+        """Drop change log entries every consumer has already processed"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM change_log WHERE seq < ?', (before_seq,))
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return removed
+    
+    @instrumented
+    def bulk_insert(self, table, columns, rows):
+        """Insert many rows in one transaction, skipping IDs that already exist"""
+        conn = self.get_connection()
+        conn.executemany(f'''
+            INSERT OR IGNORE INTO {table} ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+        ''', rows)
+        if table == 'patients':
+            picks = [columns.index(column) for column in ('id', 'name', 'age', 'address')]
+            self._store_blocking_keys(conn.cursor(), [[row[i] for i in picks] for row in rows])
         conn.commit()
         conn.close()
     
     # Patient methods
+    @instrumented
     def add_patient(self, patient_data):
         conn = self.get_connection()
         cursor = conn.cursor()
+        # A tombstone awaiting purge must not block reusing its ID
+        if cursor.execute('DELETE FROM patients WHERE id = ? AND deleted_at IS NOT NULL',
+                          (patient_data['id'],)).rowcount:
+            cursor.execute('DELETE FROM patient_blocking_keys WHERE patient_id = ?', (patient_data['id'],))
         cursor.execute('''
             INSERT INTO patients (id, name, age, gender, address, disease, referred_by, admission_datetime)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
@@ -68,13 +719,20 @@ class HospitalDatabase:
             patient_data['REFERRED_BY'],
             patient_data['admissionDateTime']
         ))
+        self._store_blocking_keys(cursor, [(patient_data['id'], patient_data['name'], patient_data['age'],
+                                            patient_data['address'])])
+        self._log_change(cursor, 'patients', patient_data['id'], 'insert', patient_data)
         conn.commit()
         conn.close()
     
+    @instrumented
     def get_all_patients(self):
+        return self._cached_read('patients', ('patients',), self._read_all_patients)
+    
+    def _read_all_patients(self):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM patients')
+        cursor.execute('SELECT * FROM patients WHERE deleted_at IS NULL')
         patients = cursor.fetchall()
         conn.close()
         
@@ -89,10 +747,11 @@ class HospitalDatabase:
             'admissionDateTime': row[7]
         } for row in patients]
     
+    @instrumented
     def get_patient_by_id(self, patient_id):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM patients WHERE id = ?', (patient_id,))
+        cursor.execute('SELECT * FROM patients WHERE id = ? AND deleted_at IS NULL', (patient_id,))
         row = cursor.fetchone()
         conn.close()
         
@@ -105,41 +764,161 @@ class HospitalDatabase:
                 'address': row[4],
                 'disease': row[5],
                 'REFERRED_BY': row[6],
-                'admissionDateTime': row[7]
+                'admissionDateTime': row[7],
+                'version': row[9]
             }
         return None
     
-    def update_patient(self, patient_id, updated_data):
+    @instrumented
+    def update_patient(self, patient_id, updated_data, expected_version=None):
+        """Returns (ok, message); see _versioned_update for expected_version"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE patients 
-            SET name = ?, age = ?, gender = ?, address = ?, disease = ?, referred_by = ?, admission_datetime = ?
-            WHERE id = ?
-        ''', (
-            updated_data['name'],
-            updated_data['age'],
-            updated_data['gender'],
-            updated_data['address'],
-            updated_data['disease'],
-            updated_data['REFERRED_BY'],
-            updated_data['admissionDateTime'],
-            patient_id
-        ))
+        failure = self._versioned_update(
+            cursor, 'patients',
+            'name = ?, age = ?, gender = ?, address = ?, disease = ?, referred_by = ?, admission_datetime = ?',
+            (
+                updated_data['name'],
+                updated_data['age'],
+                updated_data['gender'],
+                updated_data['address'],
+                updated_data['disease'],
+                updated_data['REFERRED_BY'],
+                updated_data['admissionDateTime']
+            ),
+            patient_id, expected_version
+        )
+        if failure is None:
+            cursor.execute('DELETE FROM patient_blocking_keys WHERE patient_id = ?', (patient_id,))
+            self._store_blocking_keys(cursor, [(patient_id, updated_data['name'], updated_data['age'],
+                                                updated_data['address'])])
+            self._log_change(cursor, 'patients', patient_id, 'update', updated_data)
         conn.commit()
         conn.close()
+        return failure is None, failure or "Patient updated successfully"
     
+    @instrumented
     def delete_patient(self, patient_id):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM patients WHERE id = ?', (patient_id,))
+        cursor.execute('''
+            UPDATE patients SET deleted_at = ? WHERE id = ? AND deleted_at IS NULL
+        ''', (datetime.now().strftime(SORTABLE_FORMAT), patient_id))
+        if cursor.rowcount:
+            self._log_change(cursor, 'patients', patient_id, 'delete')
         conn.commit()
         conn.close()
     
+    @instrumented
+    def find_duplicate_patients(self, patient_data, threshold=DUPLICATE_THRESHOLD, limit=5):
+        """Live patients that are probably ``patient_data`` under another ID, best first.
+    
+        Only patients sharing a blocking key are read and scored, so the check
+        costs a few index lookups however many patients there are. Each result
+        is a patient dict with a 'score'.
+        """
+        keys = sorted(blocking_keys(patient_data))
+        if not keys:
+            return []
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT * FROM patients WHERE deleted_at IS NULL AND id IS NOT ? AND id IN (
+                SELECT patient_id FROM patient_blocking_keys WHERE key IN ({', '.join('?' * len(keys))})
+            )
+        ''', (patient_data.get('id'), *keys))
+        rows = cursor.fetchall()
+        conn.close()
+    
+        matches = []
+        for row in rows:
+            candidate = {
+                'id': row[0],
+                'name': row[1],
+                'age': row[2],
+                'gender': row[3],
+                'address': row[4],
+                'disease': row[5],
+                'REFERRED_BY': row[6],
+                'admissionDateTime': row[7]
+            }
+            candidate['score'] = score(patient_data, candidate)
+            if candidate['score'] >= threshold:
+                matches.append(candidate)
+        matches.sort(key=lambda candidate: -candidate['score'])
+        return matches[:limit]
+    
+    @instrumented
+    def merge_patients(self, keep_id, duplicate_id):
+        """Fold ``duplicate_id`` into ``keep_id`` -> (ok, message)
+    
+        Appointments (live and archived) and open waitlist requests refer to
+        patients by name, so those under the duplicate's name are renamed to
+        the kept patient, then the duplicate is soft-deleted. Refused when
+        another live patient has the duplicate's name, as their bookings could
+        not be told apart.
+        """
+        if keep_id == duplicate_id:
+            return False, "Cannot merge a patient into itself"
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self._begin_immediate(conn)
+        names = dict(cursor.execute('''
+            SELECT id, name FROM patients WHERE id IN (?, ?) AND deleted_at IS NULL
+        ''', (keep_id, duplicate_id)).fetchall())
+        failure = next((f"Patient {patient_id} not found" for patient_id in (keep_id, duplicate_id)
+                        if patient_id not in names), None)
+        if failure is None and names[keep_id] != names[duplicate_id]:
+            cursor.execute('''
+                SELECT COUNT(*) FROM patients WHERE name = ? AND id != ? AND deleted_at IS NULL
+            ''', (names[duplicate_id], duplicate_id))
+            if cursor.fetchone()[0]:
+                failure = f"Another patient is also named '{names[duplicate_id]}'; relink their appointments by hand"
+        if failure is not None:
+            conn.commit()
+            conn.close()
+            return False, failure
+    
+        keep_name, duplicate_name = names[keep_id], names[duplicate_id]
+        relinked = []
+        if keep_name != duplicate_name:
+            cursor.execute('''
+                SELECT id FROM appointments WHERE patient_name = ? AND deleted_at IS NULL
+            ''', (duplicate_name,))
+            relinked = [row[0] for row in cursor.fetchall()]
+            cursor.execute('''
+                UPDATE appointments SET patient_name = ?, version = version + 1
+                WHERE patient_name = ? AND deleted_at IS NULL
+            ''', (keep_name, duplicate_name))
+            for appointment_id in relinked:
+                self._log_change(cursor, 'appointments', appointment_id, 'update',
+                                 {'patientName': keep_name, 'mergedFrom': duplicate_id})
+            cursor.execute(f'UPDATE {self.archive_table} SET patient_name = ? WHERE patient_name = ?',
+                           (keep_name, duplicate_name))
+            cursor.execute('''
+                UPDATE waitlist SET patient_name = ?
+                WHERE patient_name = ? AND status IN ('waiting', 'offered')
+            ''', (keep_name, duplicate_name))
+            cursor.execute('''
+                UPDATE triage_queue SET patient_name = ?
+                WHERE patient_name = ? AND status IN ('waiting', 'in_consultation')
+            ''', (keep_name, duplicate_name))
+        cursor.execute('UPDATE patients SET deleted_at = ? WHERE id = ?',
+                       (datetime.now().strftime(SORTABLE_FORMAT), duplicate_id))
+        cursor.execute('DELETE FROM patient_blocking_keys WHERE patient_id = ?', (duplicate_id,))
+        self._log_change(cursor, 'patients', duplicate_id, 'delete', {'mergedInto': keep_id})
+        conn.commit()
+        conn.close()
+        # Queued waitlist entries carry the old name
+        self.waitlist.invalidate()
+        return True, f"Merged {duplicate_id} into {keep_id}; {len(relinked)} appointments relinked"
+    
     # Doctor methods
+    @instrumented
     def add_doctor(self, doctor_data):
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.execute('DELETE FROM doctors WHERE id = ? AND deleted_at IS NOT NULL', (doctor_data['id'],))
         cursor.execute('''
             INSERT INTO doctors (id, name, specialization, experience)
             VALUES (?, ?, ?, ?)
@@ -149,13 +928,19 @@ class HospitalDatabase:
             doctor_data['specialization'],
             doctor_data['experience']
         ))
+        self._log_change(cursor, 'doctors', doctor_data['id'], 'insert', doctor_data)
         conn.commit()
         conn.close()
+        self.slots.invalidate()
     
+    @instrumented
     def get_all_doctors(self):
+        return self._cached_read('doctors', ('doctors',), self._read_all_doctors)
+    
+    def _read_all_doctors(self):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM doctors')
+        cursor.execute('SELECT * FROM doctors WHERE deleted_at IS NULL')
         doctors = cursor.fetchall()
         conn.close()
         
@@ -166,10 +951,11 @@ class HospitalDatabase:
             'experience': row[3]
         } for row in doctors]
     
+    @instrumented
     def get_doctor_by_id(self, doctor_id):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM doctors WHERE id = ?', (doctor_id,))
+        cursor.execute('SELECT * FROM doctors WHERE id = ? AND deleted_at IS NULL', (doctor_id,))
         row = cursor.fetchone()
         conn.close()
         
@@ -178,95 +964,294 @@ class HospitalDatabase:
                 'id': row[0],
                 'name': row[1],
                 'specialization': row[2],
-                'experience': row[3]
+                'experience': row[3],
+                'version': row[5]
             }
         return None
     
-    def update_doctor(self, doctor_id, updated_data):
+    @instrumented
+    def search_doctors_by_specialization(self, specialization):
+        """Live doctors with this specialization (case-insensitive), most experienced first"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            UPDATE doctors 
-            SET name = ?, specialization = ?, experience = ?
-            WHERE id = ?
-        ''', (
-            updated_data['name'],
-            updated_data['specialization'],
-            updated_data['experience'],
-            doctor_id
-        ))
+            SELECT id, name, specialization, experience FROM doctors
+            WHERE specialization = ? COLLATE NOCASE AND deleted_at IS NULL
+            ORDER BY experience DESC
+        ''', (specialization,))
+        doctors = cursor.fetchall()
+        conn.close()
+        
+        return [{
+            'id': row[0],
+            'name': row[1],
+            'specialization': row[2],
+            'experience': row[3]
+        } for row in doctors]
+    
+    @instrumented
+    def update_doctor(self, doctor_id, updated_data, expected_version=None):
+        """Returns (ok, message); see _versioned_update for expected_version"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        failure = self._versioned_update(
+            cursor, 'doctors',
+            'name = ?, specialization = ?, experience = ?',
+            (
+                updated_data['name'],
+                updated_data['specialization'],
+                updated_data['experience']
+            ),
+            doctor_id, expected_version
+        )
+        if failure is None:
+            self._log_change(cursor, 'doctors', doctor_id, 'update', updated_data)
         conn.commit()
         conn.close()
+        self.slots.invalidate()
+        return failure is None, failure or "Doctor updated successfully"
     
+    @instrumented
     def delete_doctor(self, doctor_id):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM doctors WHERE id = ?', (doctor_id,))
+        cursor.execute('''
+            UPDATE doctors SET deleted_at = ? WHERE id = ? AND deleted_at IS NULL
+        ''', (datetime.now().strftime(SORTABLE_FORMAT), doctor_id))
+        if cursor.rowcount:
+            self._log_change(cursor, 'doctors', doctor_id, 'delete')
         conn.commit()
         conn.close()
+        self.slots.invalidate()
+    
+    # Doctor availability
+    def _availability_version(self):
+        """SlotCalendar version: the table versions of doctors and working hours"""
+        try:
+            versions = self._table_versions.versions()
+        except sqlite3.OperationalError:
+            # Locked or mid-migration: compile afresh
+            return None
+        return tuple(versions.get(table) for table in AVAILABILITY_TABLES)
+    
+    def _load_availability(self, doctor_name):
+        """SlotCalendar loader: the working hours of the live doctor with this name"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT a.doctor_id, a.slot_minutes, a.weekly
+            FROM doctors d JOIN doctor_availability a ON a.doctor_id = d.id
+            WHERE d.name = ? AND d.deleted_at IS NULL
+            LIMIT 1
+        ''', (doctor_name,))
+        row = cursor.fetchone()
+        if row is None:
+            conn.close()
+            return None
+        cursor.execute('''
+            SELECT day, start_minute, end_minute, available FROM doctor_availability_exceptions
+            WHERE doctor_id = ?
+        ''', (row[0],))
+        exceptions = {}
+        for day, start, end, available in cursor.fetchall():
+            exceptions.setdefault(date.fromisoformat(day), []).append((start, end, bool(available)))
+        conn.close()
+        return {
+            'slot_minutes': row[1],
+            'weekly': {int(k): [tuple(shift) for shift in v] for k, v in json.loads(row[2]).items()},
+            'exceptions': exceptions,
+        }
+    
+    @instrumented
+    def set_doctor_availability(self, doctor_id, weekly, slot_minutes=30):
+        """Weekly working hours, e.g. {0: [("09:00", "13:00"), ("14:00", "17:00")], ...} (0 = Monday)"""
+        template = normalize_weekly(weekly, slot_minutes)
+        conn = self.get_connection()
+        conn.execute('''
+            INSERT OR REPLACE INTO doctor_availability (doctor_id, slot_minutes, weekly) VALUES (?, ?, ?)
+        ''', (doctor_id, slot_minutes, json.dumps(template)))
+        conn.commit()
+        conn.close()
+        self.slots.invalidate()
+    
+    @instrumented
+    def clear_doctor_availability(self, doctor_id):
+        """Remove the doctor's template and exceptions; bookings are unrestricted again"""
+        conn = self.get_connection()
+        conn.execute('DELETE FROM doctor_availability WHERE doctor_id = ?', (doctor_id,))
+        conn.execute('DELETE FROM doctor_availability_exceptions WHERE doctor_id = ?', (doctor_id,))
+        conn.commit()
+        conn.close()
+        self.slots.invalidate()
+    
+    @instrumented
+    def get_doctor_availability(self, doctor_id):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT slot_minutes, weekly FROM doctor_availability WHERE doctor_id = ?
+        ''', (doctor_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            return {
+                'slotMinutes': row[0],
+                'weekly': {
+                    int(weekday): [(format_hhmm(start), format_hhmm(end)) for start, end in shifts]
+                    for weekday, shifts in json.loads(row[1]).items()
+                }
+            }
+        return None
+    
+    @instrumented
+    def add_availability_exception(self, doctor_id, day, start="00:00", end="24:00", available=False, reason=""):
+        """Block time on a day (leave) or, with available=True, add extra hours"""
+        start_minute, end_minute = parse_hhmm(start), parse_hhmm(end)
+        if end_minute <= start_minute:
+            raise ValueError("The end time must be after the start time")
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO doctor_availability_exceptions (doctor_id, day, start_minute, end_minute, available, reason)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (doctor_id, to_date(day).isoformat(), start_minute, end_minute, int(available), reason))
+        exception_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        self.slots.invalidate()
+        return exception_id
+    
+    @instrumented
+    def get_availability_exceptions(self, doctor_id):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, day, start_minute, end_minute, available, reason
+            FROM doctor_availability_exceptions WHERE doctor_id = ? ORDER BY day, start_minute
+        ''', (doctor_id,))
+        exceptions = cursor.fetchall()
+        conn.close()
+        
+        return [{
+            'id': row[0],
+            'day': date.fromisoformat(row[1]).strftime("%d-%m-%Y"),
+            'start': format_hhmm(row[2]),
+            'end': format_hhmm(row[3]),
+            'available': bool(row[4]),
+            'reason': row[5]
+        } for row in exceptions]
+    
+    @instrumented
+    def delete_availability_exception(self, exception_id):
+        conn = self.get_connection()
+        conn.execute('DELETE FROM doctor_availability_exceptions WHERE id = ?', (exception_id,))
+        conn.commit()
+        conn.close()
+        self.slots.invalidate()
+    
+    def check_availability(self, doctor_name, appointment_datetime):
+        """(ok, message): is this a slot start within the doctor's working hours?"""
+        return self.slots.check(doctor_name, datetime.strptime(appointment_datetime, DATETIME_FORMAT))
+    
+    @instrumented
+    def get_free_slots(self, doctor_name, day):
+        """'HH:MM' slot starts on ``day`` that are in working hours and not booked, or
+        None when the doctor has no working hours set"""
+        day = to_date(day)
+        mask = self.slots.day_mask(doctor_name, day)
+        if mask is None:
+            return None
+        booked = {entry['time'] for entry in self.get_doctor_schedule(doctor_name, day.strftime("%d-%m-%Y"))}
+        return [format_hhmm(minute) for minute in slot_starts(mask) if format_hhmm(minute) not in booked]
     
     # Appointment methods
+    @instrumented
     def add_appointment(self, appointment_data):
-        # Check for overlapping appointments
-        if self.has_overlapping_appointments(
+        available, message = self.check_availability(
             appointment_data['doctorName'],
             appointment_data['appointmentDateTime']
-        ):
-            return False, "This time slot is already booked for the selected doctor"
-            
+        )
+        if not available:
+            return False, message
+        
         conn = self.get_connection()
         cursor = conn.cursor()
+        # Check for overlapping appointments under the write lock
+        self._begin_immediate(conn)
+        if self._overlap_query(cursor, appointment_data['doctorName'], appointment_data['appointmentDateTime']):
+            conn.commit()
+            conn.close()
+            return False, SLOT_TAKEN
+        cursor.execute('DELETE FROM appointments WHERE id = ? AND deleted_at IS NOT NULL', (appointment_data['id'],))
         cursor.execute('''
-            INSERT INTO appointments (id, patient_name, doctor_name, appointment_datetime)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO appointments (id, patient_name, doctor_name, appointment_datetime, appointment_ts)
+            VALUES (?, ?, ?, ?, ?)
         ''', (
             appointment_data['id'],
             appointment_data['patientName'],
             appointment_data['doctorName'],
-            appointment_data['appointmentDateTime']
+            appointment_data['appointmentDateTime'],
+            to_sortable(appointment_data['appointmentDateTime'])
         ))
+        self._log_change(cursor, 'appointments', appointment_data['id'], 'insert', appointment_data)
         conn.commit()
         conn.close()
         return True, "Appointment scheduled successfully"
     
+    @instrumented
     def has_overlapping_appointments(self, doctor_name, new_appointment_time):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
+        conflict = self._overlap_query(conn.cursor(), doctor_name, new_appointment_time)
+        conn.close()
+        return conflict
+    
+    def _overlap_query(self, cursor, doctor_name, new_appointment_time, exclude_id=None):
         # Convert string to datetime for comparison
-        new_time = datetime.strptime(new_appointment_time, "%d-%m-%Y %H:%M:%S")
+        new_time = datetime.strptime(new_appointment_time, DATETIME_FORMAT)
         
-        # Get all appointments for the doctor on the same day
-        day_start = new_time.replace(hour=0, minute=0, second=0).strftime("%d-%m-%Y %H:%M:%S")
-        day_end = new_time.replace(hour=23, minute=59, second=59).strftime("%d-%m-%Y %H:%M:%S")
+        # Any appointment less than one slot (30 minutes unless the doctor's
+        # working hours say otherwise) either side is a conflict; the
+        # (doctor_name, appointment_ts) index turns this into a short range scan
+        slot = timedelta(minutes=self.slots.slot_minutes(doctor_name))
+        window_start = (new_time - slot).strftime(SORTABLE_FORMAT)
+        window_end = (new_time + slot).strftime(SORTABLE_FORMAT)
         
         cursor.execute('''
-            SELECT appointment_datetime 
+            SELECT 1 
             FROM appointments 
             WHERE doctor_name = ? 
-            AND appointment_datetime BETWEEN ? AND ?
-        ''', (doctor_name, day_start, day_end))
-        
-        existing_appointments = cursor.fetchall()
-        conn.close()
-        
-        # Check for 30-minute slot conflicts
-        for (existing_time,) in existing_appointments:
-            existing_dt = datetime.strptime(existing_time, "%d-%m-%Y %H:%M:%S")
-            time_difference = abs((new_time - existing_dt).total_seconds() / 60)
-            if time_difference < 30:  # Less than 30 minutes apart
-                return True
-        
-        return False
+            AND appointment_ts > ? AND appointment_ts < ?
+            AND deleted_at IS NULL AND id IS NOT ?
+            LIMIT 1
+        ''', (doctor_name, window_start, window_end, exclude_id))
+        return cursor.fetchone() is not None
+    
+    @instrumented
+    def get_all_appointments(self, include_archive=False):
+        if include_archive:
+            # The archive may live in another file, which has no table versions
+            return self._read_all_appointments(include_archive)
+        return self._cached_read('appointments', ('appointments',), self._read_all_appointments)
     
-    def get_all_appointments(self):
+    def _read_all_appointments(self, include_archive=False):
         conn = self.get_connection()
         cursor = conn.cursor()
+        # A table scan plus sort beats walking the appointment_ts index when
+        # every row is read anyway
         cursor.execute('''
-            SELECT * FROM appointments 
-            ORDER BY appointment_datetime ASC
+            SELECT id, patient_name, doctor_name, appointment_datetime FROM appointments NOT INDEXED
+            WHERE deleted_at IS NULL
+            ORDER BY appointment_ts ASC
         ''')
         appointments = cursor.fetchall()
+        if include_archive:
+            cursor.execute(f'''
+                SELECT id, patient_name, doctor_name, appointment_datetime FROM {self.archive_table} NOT INDEXED
+                ORDER BY appointment_ts ASC
+            ''')
+            # Archived rows are all older than the hot table
+            appointments = cursor.fetchall() + appointments
         conn.close()
         
         return [{
@@ -276,11 +1261,22 @@ class HospitalDatabase:
             'appointmentDateTime': row[3]
         } for row in appointments]
     
+    @instrumented
     def get_appointment_by_id(self, appointment_id):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM appointments WHERE id = ?', (appointment_id,))
+        cursor.execute('''
+            SELECT id, patient_name, doctor_name, appointment_datetime, version FROM appointments
+            WHERE id = ? AND deleted_at IS NULL
+        ''', (appointment_id,))
         row = cursor.fetchone()
+        if row is None:
+            # Archived appointments are read-only and carry no version
+            cursor.execute(f'''
+                SELECT id, patient_name, doctor_name, appointment_datetime, NULL FROM {self.archive_table}
+                WHERE id = ?
+            ''', (appointment_id,))
+            row = cursor.fetchone()
         conn.close()
         
         if row:
@@ -288,25 +1284,28 @@ class HospitalDatabase:
                 'id': row[0],
                 'patientName': row[1],
                 'doctorName': row[2],
-                'appointmentDateTime': row[3]
+                'appointmentDateTime': row[3],
+                'version': row[4]
             }
         return None
         
+    @instrumented
     def get_doctor_schedule(self, doctor_name, date):
         """Get all appointments for a doctor on a specific date"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         # Convert date to datetime range for the whole day
-        day_start = f"{date} 00:00:00"
-        day_end = f"{date} 23:59:59"
+        day_start = to_sortable(f"{date} 00:00:00")
+        day_end = to_sortable(f"{date} 23:59:59")
         
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT appointment_datetime, patient_name 
-            FROM appointments 
+            FROM {self._appointment_source(cursor, day_start)} 
             WHERE doctor_name = ? 
-            AND appointment_datetime BETWEEN ? AND ?
-            ORDER BY appointment_datetime ASC
+            AND appointment_ts BETWEEN ? AND ?
+            AND deleted_at IS NULL
+            ORDER BY appointment_ts ASC
         ''', (doctor_name, day_start, day_end))
         
         schedule = cursor.fetchall()
@@ -317,35 +1316,1001 @@ class HospitalDatabase:
             'patient': row[1]
         } for row in schedule]
     
-    def update_appointment(self, appointment_id, updated_data):
+    def _appointment_source(self, cursor, range_start):
+        # Queries starting at or before the newest archived appointment read
+        # hot and archived rows together; everything else stays on the hot table
+        cursor.execute(f'SELECT MAX(appointment_ts) FROM {self.archive_table}')
+        newest_archived = cursor.fetchone()[0]
+        if newest_archived is None or range_start > newest_archived:
+            return 'appointments'
+        return f'''(
+            SELECT id, patient_name, doctor_name, appointment_datetime, appointment_ts, deleted_at
+            FROM appointments
+            UNION ALL
+            SELECT id, patient_name, doctor_name, appointment_datetime, appointment_ts, NULL
+            FROM {self.archive_table}
+        )'''
+    
+    @instrumented
+    def get_appointments_in_range(self, start, end, doctor_name=None):
+        """Appointments between start and end (dates, datetimes or dd-mm-YYYY HH:MM:SS strings)"""
+        if isinstance(end, date) and not isinstance(end, datetime):
+            end = datetime.combine(end, datetime.max.time().replace(microsecond=0))
+        range_start, range_end = to_sortable(start), to_sortable(end)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        query = f'''
+            SELECT id, patient_name, doctor_name, appointment_datetime
+            FROM {self._appointment_source(cursor, range_start)}
+            WHERE appointment_ts BETWEEN ? AND ?
+            AND deleted_at IS NULL
+        '''
+        params = [range_start, range_end]
+        if doctor_name is not None:
+            query += ' AND doctor_name = ?'
+            params.append(doctor_name)
+        cursor.execute(query + ' ORDER BY appointment_ts ASC', params)
+        appointments = cursor.fetchall()
+        conn.close()
+        
+        return [{
+            'id': row[0],
+            'patientName': row[1],
+            'doctorName': row[2],
+            'appointmentDateTime': row[3]
+        } for row in appointments]
+    
+    @instrumented
+    def get_doctor_feed_state(self, doctor_id):
+        """(name, doctor version, schedule version) of a live doctor, or None.
+        
+        The schedule version changes whenever one of the doctor's
+        appointments is written. Calendar apps poll this, so it goes through
+        the table cache: until a doctor or appointment is written it costs
+        one PRAGMA instead of a connection and two lookups.
+        """
+        def load():
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT d.name, d.version, COALESCE(v.version, 0)
+                FROM doctors d LEFT JOIN doctor_schedule_versions v ON v.doctor_name = d.name
+                WHERE d.id = ? AND d.deleted_at IS NULL
+            ''', (doctor_id,))
+            row = cursor.fetchone()
+            conn.close()
+            return [{'name': row[0], 'version': row[1], 'scheduleVersion': row[2]}] if row else []
+        
+        state = self._cached_read(('doctor_feed_state', doctor_id), ('doctors', 'appointments'), load)
+        return (state[0]['name'], state[0]['version'], state[0]['scheduleVersion']) if state else None
+    
+    def iter_doctor_appointments(self, doctor_name, start, end, batch_size=500):
+        """Yield (id, patient name, appointment datetime) of ``doctor_name`` between
+        ``start`` and ``end`` in time order, archived ones included.
+        
+        Rows are fetched ``batch_size`` at a time off the (doctor_name,
+        appointment_ts) indexes, so a long range is never held in memory; the
+        connection stays open until the generator is exhausted or closed.
+        """
+        if isinstance(end, date) and not isinstance(end, datetime):
+            end = datetime.combine(end, datetime.max.time().replace(microsecond=0))
+        range_start, range_end = to_sortable(start), to_sortable(end)
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, patient_name, appointment_datetime
+                FROM {self._appointment_source(cursor, range_start)}
+                WHERE doctor_name = ? AND appointment_ts BETWEEN ? AND ? AND deleted_at IS NULL
+                ORDER BY appointment_ts ASC
+            ''', (doctor_name, range_start, range_end))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    @instrumented
+    def get_patient_timeline(self, patient_id, start=None, end=None, limit=50):
+        """A patient's admission and appointments (archived ones included), newest first.
+        
+        ``start`` and ``end`` bound the range as in get_appointments_in_range
+        and default to open. Appointments are matched on the patient's name
+        and read newest first off the (patient_name, appointment_ts) indexes,
+        so the cost depends on ``limit``, not on the number of appointments.
+        Returns None for an unknown patient, otherwise events with 'kind'
+        ('admission' or 'appointment'), 'dateTime', 'id', 'doctorName' and 'note'.
+        """
+        if isinstance(end, date) and not isinstance(end, datetime):
+            end = datetime.combine(end, datetime.max.time().replace(microsecond=0))
+        range_start = to_sortable(start) if start is not None else ""
+        range_end = to_sortable(end) if end is not None else WAITLIST_OPEN_END
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            UPDATE appointments 
-            SET patient_name = ?, doctor_name = ?, appointment_datetime = ?
+            SELECT name, disease, admission_datetime FROM patients WHERE id = ? AND deleted_at IS NULL
+        ''', (patient_id,))
+        patient = cursor.fetchone()
+        if patient is None:
+            conn.close()
+            return None
+        name, disease, admitted = patient
+        
+        events = []
+        admitted_ts = to_sortable(admitted)
+        if range_start <= admitted_ts <= range_end:
+            events.append((admitted_ts, 'admission', patient_id, None, disease))
+        for table, note in (('appointments', None), (self.archive_table, 'archived')):
+            live = ' AND deleted_at IS NULL' if table == 'appointments' else ''
+            cursor.execute(f'''
+                SELECT appointment_ts, id, doctor_name FROM {table}
+                WHERE patient_name = ? AND appointment_ts BETWEEN ? AND ?{live}
+                ORDER BY appointment_ts DESC LIMIT ?
+            ''', (name, range_start, range_end, limit))
+            events.extend((ts, 'appointment', appointment_id, doctor_name, note)
+                          for ts, appointment_id, doctor_name in cursor.fetchall())
+        conn.close()
+        
+        events.sort(key=lambda event: event[0], reverse=True)
+        return [{
+            'kind': kind,
+            'dateTime': datetime.strptime(ts, SORTABLE_FORMAT).strftime(DATETIME_FORMAT),
+            'id': event_id,
+            'doctorName': doctor_name,
+            'note': note
+        } for ts, kind, event_id, doctor_name, note in events[:limit]]
+    
+    @instrumented
+    def archive_appointments(self, older_than_days=None, batch_size=ARCHIVE_BATCH_SIZE, now=None):
+        """Move appointments older than the horizon to the archive in small batches.
+        
+        Each batch is its own transaction so bookings are never blocked for
+        long. Returns the number of appointments moved.
+        """
+        if older_than_days is None:
+            older_than_days = self.archive_after_days
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=older_than_days)).strftime(SORTABLE_FORMAT)
+        archived_at = now.strftime(DATETIME_FORMAT)
+        moved = 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        while True:
+            cursor.execute('''
+                SELECT id FROM appointments
+                WHERE appointment_ts < ? AND deleted_at IS NULL
+                ORDER BY appointment_ts
+                LIMIT ?
+            ''', (cutoff, batch_size))
+            ids = [(row[0],) for row in cursor.fetchall()]
+            if not ids:
+                break
+            cursor.executemany(f'''
+                INSERT OR REPLACE INTO {self.archive_table}
+                    (id, patient_name, doctor_name, appointment_datetime, appointment_ts, archived_at)
+                SELECT id, patient_name, doctor_name, appointment_datetime, appointment_ts, ?
+                FROM appointments WHERE id = ?
+            ''', [(archived_at, row_id) for (row_id,) in ids])
+            cursor.executemany('DELETE FROM appointments WHERE id = ?', ids)
+            conn.commit()
+            moved += len(ids)
+        conn.close()
+        return moved
+    
+    @instrumented
+    def get_archive_summary(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT COUNT(*), MIN(appointment_ts), MAX(appointment_ts) FROM {self.archive_table}
+        ''')
+        count, oldest, newest = cursor.fetchone()
+        cursor.execute('SELECT COUNT(*) FROM appointments WHERE deleted_at IS NULL')
+        hot = cursor.fetchone()[0]
+        conn.close()
+        return {'archived': count, 'hot': hot, 'oldest': oldest, 'newest': newest}
+    
+    # Reminder outbox methods
+    @instrumented
+    def enqueue_reminders(self, start, end, kind='reminder'):
+        """Queue one reminder per live appointment between start and end.
+        
+        Uses the appointment time index; appointments already queued for
+        ``kind`` are skipped, so repeated runs are safe. Returns rows queued.
+        """
+        if isinstance(end, date) and not isinstance(end, datetime):
+            end = datetime.combine(end, datetime.max.time().replace(microsecond=0))
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO reminder_outbox
+                (appointment_id, kind, patient_name, doctor_name, appointment_datetime, next_attempt_at)
+            SELECT id, ?, patient_name, doctor_name, appointment_datetime, ?
+            FROM appointments
+            WHERE appointment_ts BETWEEN ? AND ? AND deleted_at IS NULL
+        ''', (kind, datetime.now().strftime(SORTABLE_FORMAT), to_sortable(start), to_sortable(end)))
+        queued = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return queued
+    
+    @instrumented
+    def claim_reminders(self, limit, stale_after_seconds=300):
+        """Atomically take up to ``limit`` due reminders for sending.
+        
+        Reminders claimed by a dispatcher that died are handed out again
+        after ``stale_after_seconds``.
+        """
+        now = datetime.now()
+        stale = (now - timedelta(seconds=stale_after_seconds)).strftime(SORTABLE_FORMAT)
+        now = now.strftime(SORTABLE_FORMAT)
+        conn = self.get_connection()
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            SELECT id, appointment_id, kind, patient_name, doctor_name, appointment_datetime, attempts
+            FROM reminder_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= ?)
+            OR (status = 'sending' AND claimed_at < ?)
+            ORDER BY next_attempt_at
+            LIMIT ?
+        ''', (now, stale, limit))
+        rows = cursor.fetchall()
+        cursor.executemany(
+            "UPDATE reminder_outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+            [(now, row[0]) for row in rows]
+        )
+        cursor.execute('COMMIT')
+        conn.close()
+        
+        return [{
+            'id': row[0],
+            'appointmentId': row[1],
+            'kind': row[2],
+            'patientName': row[3],
+            'doctorName': row[4],
+            'appointmentDateTime': row[5],
+            'attempts': row[6]
+        } for row in rows]
+    
+    @instrumented
+    def complete_reminders(self, sent_ids, failures=(), max_attempts=5, retry_base_seconds=30):
+        """Mark reminders sent, or schedule a retry with exponential backoff.
+        
+        ``failures`` is a list of (id, attempts_so_far, error) tuples; a
+        reminder that has failed ``max_attempts`` times is marked 'failed'.
+        """
+        now = datetime.now()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            UPDATE reminder_outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1
             WHERE id = ?
-        ''', (
-            updated_data['patientName'],
+        ''', [(now.strftime(SORTABLE_FORMAT), reminder_id) for reminder_id in sent_ids])
+        cursor.executemany('''
+            UPDATE reminder_outbox
+            SET status = ?, attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+            WHERE id = ?
+        ''', [(
+            'failed' if attempts + 1 >= max_attempts else 'pending',
+            (now + timedelta(seconds=retry_base_seconds * 2 ** attempts)).strftime(SORTABLE_FORMAT),
+            str(error)[:500],
+            reminder_id
+        ) for reminder_id, attempts, error in failures])
+        conn.commit()
+        conn.close()
+    
+    @instrumented
+    def get_reminder_summary(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) FROM reminder_outbox GROUP BY status')
+        summary = dict(cursor.fetchall())
+        conn.close()
+        return summary
+    
+    @instrumented
+    def update_appointment(self, appointment_id, updated_data, expected_version=None):
+        """Returns (ok, message) like add_appointment.
+        
+        The slot check and the write run in one transaction holding the write
+        lock, so two edits cannot move bookings into the same slot; the
+        appointment's own current slot does not count as a clash.
+        """
+        available, message = self.check_availability(
             updated_data['doctorName'],
-            updated_data['appointmentDateTime'],
-            appointment_id
-        ))
+            updated_data['appointmentDateTime']
+        )
+        if not available:
+            return False, message
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self._begin_immediate(conn)
+        if self._overlap_query(cursor, updated_data['doctorName'], updated_data['appointmentDateTime'],
+                               exclude_id=appointment_id):
+            failure = SLOT_TAKEN
+        else:
+            failure = self._versioned_update(
+                cursor, 'appointments',
+                'patient_name = ?, doctor_name = ?, appointment_datetime = ?, appointment_ts = ?',
+                (
+                    updated_data['patientName'],
+                    updated_data['doctorName'],
+                    updated_data['appointmentDateTime'],
+                    to_sortable(updated_data['appointmentDateTime'])
+                ),
+                appointment_id, expected_version
+            )
+        if failure is None:
+            self._log_change(cursor, 'appointments', appointment_id, 'update', updated_data)
         conn.commit()
         conn.close()
+        return failure is None, failure or "Appointment updated successfully"
     
+    @instrumented
     def delete_appointment(self, appointment_id):
+        """Cancel an appointment and offer its slot to the waitlist in the same transaction.
+        
+        Returns the waitlist entry the slot was offered to, or None.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self._begin_immediate(conn)
+        try:
+            offer = self._cancel_appointment(cursor, appointment_id)
+            conn.commit()
+        except BaseException:
+            # The queue already dropped the entry it proposed
+            self.waitlist.invalidate()
+            raise
+        finally:
+            conn.close()
+        return offer
+    
+    def _cancel_appointment(self, cursor, appointment_id):
+        cursor.execute('''
+            SELECT doctor_name, appointment_datetime FROM appointments WHERE id = ? AND deleted_at IS NULL
+        ''', (appointment_id,))
+        freed = cursor.fetchone()
+        if freed is None:
+            return None
+        cursor.execute('''
+            UPDATE appointments SET deleted_at = ? WHERE id = ? AND deleted_at IS NULL
+        ''', (datetime.now().strftime(SORTABLE_FORMAT), appointment_id))
+        self._log_change(cursor, 'appointments', appointment_id, 'delete')
+        return self._offer_slot(cursor, *freed)
+    
+    # Waitlist
+    def _load_waitlist(self):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM appointments WHERE id = ?', (appointment_id,))
+        max_id = cursor.execute('SELECT MAX(id) FROM waitlist').fetchone()[0]
+        cursor.execute('''
+            SELECT id, patient_name, doctor_name, specialization, earliest_ts, latest_ts, priority
+            FROM waitlist WHERE status = 'waiting'
+        ''')
+        entries = [self._waitlist_entry(row) for row in cursor.fetchall()]
+        conn.close()
+        return max_id, entries
+    
+    @staticmethod
+    def _waitlist_entry(row):
+        return {
+            'id': row[0],
+            'patientName': row[1],
+            'doctorName': row[2],
+            'specialization': row[3],
+            'earliestTs': row[4],
+            'latestTs': row[5],
+            'priority': row[6]
+        }
+    
+    def _offer_slot(self, cursor, doctor_name, appointment_datetime):
+        """Book a freed slot for the best waiting patient; runs in the caller's transaction"""
+        slot_ts = to_sortable(appointment_datetime)
+        if slot_ts <= datetime.now().strftime(SORTABLE_FORMAT):
+            return None
+        # The same checks as add_appointment: a slot freed on leave or outside
+        # working hours is not offered, and the entries stay waiting
+        if not self.check_availability(doctor_name, appointment_datetime)[0]:
+            return None
+        cursor.execute('''
+            SELECT specialization FROM doctors WHERE name = ? AND deleted_at IS NULL LIMIT 1
+        ''', (doctor_name,))
+        row = cursor.fetchone()
+        specialization = row[0] if row else None
+        # Requests added by other processes since the queue was loaded
+        self.waitlist.ensure_loaded(cursor.execute('SELECT MAX(id) FROM waitlist').fetchone()[0])
+        if self._overlap_query(cursor, doctor_name, appointment_datetime):
+            return None
+        
+        while True:
+            entry = self.waitlist.take(doctor_name, specialization, slot_ts)
+            if entry is None:
+                return None
+            appointment_id = f"WL-{entry['id']}"
+            cursor.execute('''
+                UPDATE waitlist SET status = 'offered', appointment_id = ?, offered_at = ?
+                WHERE id = ? AND status = 'waiting'
+            ''', (appointment_id, datetime.now().strftime(DATETIME_FORMAT), entry['id']))
+            if cursor.rowcount:
+                break
+            # Cancelled or offered elsewhere since the queue was loaded
+        
+        appointment = {
+            'id': appointment_id,
+            'patientName': entry['patientName'],
+            'doctorName': doctor_name,
+            'appointmentDateTime': appointment_datetime,
+        }
+        cursor.execute('DELETE FROM appointments WHERE id = ? AND deleted_at IS NOT NULL', (appointment_id,))
+        cursor.execute('''
+            INSERT INTO appointments (id, patient_name, doctor_name, appointment_datetime, appointment_ts)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (appointment_id, entry['patientName'], doctor_name, appointment_datetime, slot_ts))
+        self._log_change(cursor, 'appointments', appointment_id, 'insert', appointment)
+        return {**entry, 'appointmentId': appointment_id, 'appointmentDateTime': appointment_datetime,
+                'offeredDoctor': doctor_name}
+    
+    @instrumented
+    def add_to_waitlist(self, patient_name, doctor_name=None, specialization=None,
+                        earliest=None, latest=None, priority=0):
+        """Wait for a freed slot between ``earliest`` and ``latest`` ('dd-mm-YYYY HH:MM:SS',
+        default: from now on) with this doctor, or with any doctor of ``specialization``.
+        Higher ``priority`` is offered first. Returns the waitlist entry ID.
+        """
+        if not (doctor_name or specialization):
+            raise ValueError("A waitlist request needs a doctor or a specialization")
+        earliest_ts = to_sortable(earliest) if earliest else datetime.now().strftime(SORTABLE_FORMAT)
+        latest_ts = to_sortable(latest) if latest else WAITLIST_OPEN_END
+        if latest_ts < earliest_ts:
+            raise ValueError("The waitlist window ends before it starts")
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO waitlist (patient_name, doctor_name, specialization, earliest_ts, latest_ts, priority, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (patient_name, doctor_name or None, specialization or None, earliest_ts, latest_ts, priority,
+              datetime.now().strftime(DATETIME_FORMAT)))
+        entry_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        self.waitlist.add(self._waitlist_entry(
+            (entry_id, patient_name, doctor_name or None, specialization or None, earliest_ts, latest_ts, priority)))
+        return entry_id
+    
+    @instrumented
+    def get_waitlist(self, status=None):
+        """Waitlist entries (optionally with one status), best first"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        query = '''
+            SELECT id, patient_name, doctor_name, specialization, earliest_ts, latest_ts, priority,
+                   status, appointment_id, created_at, offered_at
+            FROM waitlist
+        '''
+        params = ()
+        if status:
+            query += ' WHERE status = ?'
+            params = (status,)
+        cursor.execute(query + ' ORDER BY priority DESC, id ASC', params)
+        entries = cursor.fetchall()
+        conn.close()
+        
+        def display(ts):
+            return None if ts == WAITLIST_OPEN_END else datetime.strptime(ts, SORTABLE_FORMAT).strftime(DATETIME_FORMAT)
+        
+        return [{
+            'id': row[0],
+            'patientName': row[1],
+            'doctorName': row[2],
+            'specialization': row[3],
+            'earliest': display(row[4]),
+            'latest': display(row[5]),
+            'priority': row[6],
+            'status': row[7],
+            'appointmentId': row[8],
+            'createdAt': row[9],
+            'offeredAt': row[10]
+        } for row in entries]
+    
+    @instrumented
+    def accept_waitlist_offer(self, entry_id):
+        """Keep the offered appointment; False if there is no open offer"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE waitlist SET status = 'booked' WHERE id = ? AND status = 'offered'
+        ''', (entry_id,))
+        accepted = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return accepted
+    
+    @instrumented
+    def decline_waitlist_offer(self, entry_id):
+        """Release the offered slot, which is then offered to the next patient in line.
+        
+        Returns that next offer, or None.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self._begin_immediate(conn)
+        try:
+            cursor.execute('''
+                SELECT appointment_id FROM waitlist WHERE id = ? AND status = 'offered'
+            ''', (entry_id,))
+            row = cursor.fetchone()
+            offer = None
+            if row is not None:
+                cursor.execute("UPDATE waitlist SET status = 'declined' WHERE id = ?", (entry_id,))
+                offer = self._cancel_appointment(cursor, row[0])
+            conn.commit()
+        except BaseException:
+            self.waitlist.invalidate()
+            raise
+        finally:
+            conn.close()
+        return offer
+    
+    @instrumented
+    def cancel_waitlist_entry(self, entry_id):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE waitlist SET status = 'cancelled' WHERE id = ? AND status = 'waiting'
+        ''', (entry_id,))
+        cancelled = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        if cancelled:
+            self.waitlist.discard(entry_id)
+        return cancelled
+    
+    # Walk-in triage
+    @staticmethod
+    def _triage_version(cursor):
+        return cursor.execute("SELECT version FROM table_versions WHERE table_name = 'triage_queue'").fetchone()[0]
+    
+    def _load_triage(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        version = self._triage_version(cursor)
+        cursor.execute('''
+            SELECT id, patient_name, specialization, severity, arrived_ts, status, doctor_name, started_ts
+            FROM triage_queue WHERE status IN ('waiting', 'in_consultation')
+        ''')
+        entries = [self._triage_entry(row) for row in cursor.fetchall()]
+        durations = {}
+        cursor.execute('SELECT DISTINCT specialization FROM doctors WHERE deleted_at IS NULL')
+        for (specialization,) in cursor.fetchall():
+            cursor.execute('''
+                SELECT started_ts, finished_ts FROM triage_queue
+                WHERE status = 'done' AND specialization = ?
+                ORDER BY finished_ts DESC LIMIT ?
+            ''', (specialization, DURATION_HISTORY))
+            durations[specialization] = [
+                (datetime.strptime(finished, SORTABLE_FORMAT) - datetime.strptime(started, SORTABLE_FORMAT))
+                .total_seconds() / 60
+                for started, finished in reversed(cursor.fetchall())
+            ]
+        conn.close()
+        return version, entries, durations
+    
+    @staticmethod
+    def _triage_entry(row):
+        return {
+            'id': row[0],
+            'patientName': row[1],
+            'specialization': row[2],
+            'severity': row[3],
+            'arrivedAt': datetime.strptime(row[4], SORTABLE_FORMAT),
+            'status': row[5],
+            'doctorName': row[6],
+            'startedAt': datetime.strptime(row[7], SORTABLE_FORMAT) if row[7] else None
+        }
+    
+    def _triage_write(self, query, params):
+        """Run one triage_queue write -> (rowcount, lastrowid, version before, version after)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self._begin_immediate(conn)
+        try:
+            before = self._triage_version(cursor)
+            cursor.execute(query, params)
+            result = (cursor.rowcount, cursor.lastrowid, before, self._triage_version(cursor))
+            conn.commit()
+        finally:
+            conn.close()
+        return result
+    
+    @instrumented
+    def add_walk_in(self, patient_name, specialization, severity=3, arrived=None):
+        """Queue a walk-in for the next free doctor of ``specialization``.
+    
+        ``severity`` runs from 1 (most urgent) to 5; ``arrived`` defaults to
+        now. Returns the queue entry ID.
+        """
+        if severity not in SEVERITY_LEVELS:
+            raise ValueError(f"Severity must be one of {', '.join(map(str, SEVERITY_LEVELS))}")
+        if not specialization:
+            raise ValueError("A walk-in needs a specialization")
+        arrived_ts = to_sortable(arrived or datetime.now())
+        _, entry_id, before, after = self._triage_write('''
+            INSERT INTO triage_queue (patient_name, specialization, severity, arrived_ts) VALUES (?, ?, ?, ?)
+        ''', (patient_name, specialization, severity, arrived_ts))
+        self.triage.add(self._triage_entry(
+            (entry_id, patient_name, specialization, severity, arrived_ts, 'waiting', None, None)), before, after)
+        return entry_id
+    
+    @instrumented
+    def call_next_walk_in(self, specialization, doctor_name):
+        """Start ``doctor_name``'s consultation with the most urgent walk-in waiting
+        for ``specialization``; returns that entry, or None if nobody is waiting.
+        """
+        if not doctor_name:
+            raise ValueError("A consultation needs a doctor")
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self._begin_immediate(conn)
+        try:
+            cursor.execute('''
+                SELECT patient_name FROM triage_queue WHERE status = 'in_consultation' AND doctor_name = ?
+            ''', (doctor_name,))
+            seeing = cursor.fetchone()
+            if seeing is not None:
+                raise ValueError(f"{doctor_name} is still seeing {seeing[0]}")
+            # The write lock is held, so the queue cannot go stale before the UPDATE
+            before = self._triage_version(cursor)
+            self.triage.ensure_current(before)
+            entry = self.triage.next_waiting(specialization)
+            if entry is None:
+                return None
+            started_at = datetime.now().replace(microsecond=0)
+            cursor.execute('''
+                UPDATE triage_queue SET status = 'in_consultation', doctor_name = ?, started_ts = ?
+                WHERE id = ? AND status = 'waiting'
+            ''', (doctor_name, started_at.strftime(SORTABLE_FORMAT), entry['id']))
+            after = self._triage_version(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+        self.triage.started(entry['id'], doctor_name, started_at, before, after)
+        return {**entry, 'status': 'in_consultation', 'doctorName': doctor_name, 'startedAt': started_at}
+    
+    @instrumented
+    def finish_consultation(self, entry_id):
+        """False unless the walk-in was in consultation"""
+        finished_at = datetime.now().replace(microsecond=0)
+        finished, _, before, after = self._triage_write('''
+            UPDATE triage_queue SET status = 'done', finished_ts = ? WHERE id = ? AND status = 'in_consultation'
+        ''', (finished_at.strftime(SORTABLE_FORMAT), entry_id))
+        if finished:
+            self.triage.finished(entry_id, finished_at, before, after)
+        return finished > 0
+    
+    @instrumented
+    def remove_walk_in(self, entry_id):
+        """The walk-in left before being seen; False unless they were waiting"""
+        removed, _, before, after = self._triage_write('''
+            UPDATE triage_queue SET status = 'left' WHERE id = ? AND status = 'waiting'
+        ''', (entry_id,))
+        if removed:
+            self.triage.left(entry_id, before, after)
+        return removed > 0
+    
+    def _doctors_on_duty(self, cursor, specialization, now):
+        """{doctor: (end of shift, booked (start, end) still ahead)} for ``specialization`` at ``now``"""
+        cursor.execute('''
+            SELECT name FROM doctors WHERE specialization = ? COLLATE NOCASE AND deleted_at IS NULL
+        ''', (specialization,))
+        midnight = datetime.combine(now.date(), datetime.min.time())
+        minute = now.hour * 60 + now.minute
+        doctors = {}
+        for (name,) in cursor.fetchall():
+            mask = self.slots.day_mask(name, now.date())
+            if mask is None:
+                # No working hours set: available all day, as for bookings
+                doctors[name] = (midnight + timedelta(days=1), [])
+                continue
+            end = shift_end(mask, minute, self.slots.slot_minutes(name))
+            if end is not None:
+                doctors[name] = (midnight + timedelta(minutes=end), [])
+        if not doctors:
+            return doctors
+        # Today's bookings through the (doctor_name, appointment_ts) index
+        cursor.execute(f'''
+            SELECT doctor_name, appointment_ts FROM appointments
+            WHERE doctor_name IN ({', '.join('?' * len(doctors))}) AND appointment_ts BETWEEN ? AND ?
+              AND deleted_at IS NULL
+            ORDER BY appointment_ts
+        ''', (*doctors, midnight.strftime(SORTABLE_FORMAT), now.strftime("%Y-%m-%d 23:59:59")))
+        for name, ts in cursor.fetchall():
+            start = datetime.strptime(ts, SORTABLE_FORMAT)
+            end = start + timedelta(minutes=self.slots.slot_minutes(name))
+            if end > now:
+                doctors[name][1].append((start, end))
+        return doctors
+    
+    @instrumented
+    def get_triage_board(self, now=None):
+        """Walk-ins per specialization with estimated waits (see TriageQueue.board).
+    
+        Reads one version row, the doctors of each specialization on the
+        board and their bookings for today; the queue itself comes from
+        memory unless another process changed it.
+        """
+        now = now or datetime.now().replace(microsecond=0)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self.triage.ensure_current(self._triage_version(cursor))
+        boards = [self.triage.board(specialization, self._doctors_on_duty(cursor, specialization, now), now)
+                  for specialization in self.triage.specializations()]
+        conn.close()
+        return boards
+    
+    @instrumented
+    def purge_deleted(self, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE_SECONDS,
+                      older_than_seconds=0, max_batches=None):
+        """Physically remove soft-deleted rows a small batch at a time.
+        
+        The write lock is released and ``pause`` seconds pass between batches
+        so bookings interleave with the purge. Returns rows removed per table.
+        """
+        cutoff = (datetime.now() - timedelta(seconds=older_than_seconds)).strftime(SORTABLE_FORMAT)
+        purged = dict.fromkeys(TABLES, 0)
+        batches = 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        for table in TABLES:
+            while max_batches is None or batches < max_batches:
+                cursor.execute(f'''
+                    DELETE FROM {table} WHERE rowid IN (
+                        SELECT rowid FROM {table}
+                        WHERE deleted_at IS NOT NULL AND deleted_at <= ?
+                        LIMIT ?
+                    )
+                ''', (cutoff, batch_size))
+                conn.commit()
+                batches += 1
+                purged[table] += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+                time.sleep(pause)
+        if purged['patients']:
+            cursor.execute('''
+                DELETE FROM patient_blocking_keys WHERE patient_id NOT IN (SELECT id FROM patients)
+            ''')
+            conn.commit()
+        conn.close()
+        return purged
+    
+    @instrumented
+    def count_deleted(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        counts = {
+            table: cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE deleted_at IS NOT NULL').fetchone()[0]
+            for table in TABLES
+        }
+        conn.close()
+        return counts
+    
+    # Maintenance methods; maintenance.py schedules them
+    def _record_maintenance(self, cursor, task, started, result):
+        cursor.execute('''
+            INSERT INTO maintenance_log (task, started_ts, seconds, result) VALUES (?, ?, ?, ?)
+        ''', (task, started.strftime(SORTABLE_FORMAT), (datetime.now() - started).total_seconds(),
+              json.dumps(result)))
+        cursor.execute('''
+            DELETE FROM maintenance_log WHERE task = ? AND id NOT IN (
+                SELECT id FROM maintenance_log WHERE task = ? ORDER BY id DESC LIMIT ?
+            )
+        ''', (task, task, MAINTENANCE_LOG_KEEP))
+    
+    @instrumented
+    def get_storage_stats(self, tables=True):
+        """Page counts and free space per database file, and the largest tables.
+        
+        ``fill`` is the share of a table's pages holding data; free pages are
+        whole pages a vacuum can hand back to the file system. The per-table
+        figures read every page, so ``tables=False`` skips them.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        files = {}
+        table_stats = []
+        for schema in self._schemas():
+            page_size, pages, free_pages, auto_vacuum = (
+                cursor.execute(f'PRAGMA {schema}.{pragma}').fetchone()[0]
+                for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum')
+            )
+            files[schema] = {
+                'pages': pages,
+                'free_pages': free_pages,
+                'bytes': pages * page_size,
+                'free_bytes': free_pages * page_size,
+                'auto_vacuum': ('none', 'full', 'incremental')[auto_vacuum],
+            }
+            if not tables:
+                continue
+            try:
+                cursor.execute('SELECT name, pageno, pgsize, unused FROM dbstat(?, 1)', (schema,))
+            except sqlite3.OperationalError:
+                # SQLite built without the dbstat table
+                continue
+            table_stats += [{'schema': schema, 'name': name, 'pages': table_pages,
+                             'fill': 1 - unused / size if size else 1.0}
+                            for name, table_pages, size, unused in cursor.fetchall()]
+        conn.close()
+        table_stats.sort(key=lambda table: table['pages'], reverse=True)
+        return {'files': files, 'tables': table_stats}
+    
+    @instrumented
+    def optimize(self, analysis_limit=ANALYSIS_LIMIT):
+        """Refresh the query planner's statistics (sqlite_stat1).
+        
+        ANALYZE reads at most ``analysis_limit`` rows per index. SQLite 3.46+
+        runs PRAGMA optimize, which skips tables whose statistics are still
+        good; older versions only consider tables queried on the same
+        connection, which with a connection per call means none.
+        """
+        started = datetime.now()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'PRAGMA analysis_limit={int(analysis_limit)}')
+        if sqlite3.sqlite_version_info >= (3, 46, 0):
+            cursor.execute('PRAGMA optimize=0x10002')
+        else:
+            cursor.execute('ANALYZE')
+        result = {'tables': cursor.execute('SELECT COUNT(DISTINCT tbl) FROM sqlite_stat1').fetchone()[0]}
+        self._record_maintenance(cursor, 'optimize', started, result)
         conn.commit()
         conn.close()
+        return result
+    
+    @instrumented
+    def incremental_vacuum(self, max_pages=None, step_pages=VACUUM_STEP_PAGES, pause=VACUUM_PAUSE_SECONDS):
+        """Hand free pages back to the file system, ``step_pages`` per transaction.
+        
+        The write lock is released and ``pause`` seconds pass between steps,
+        so bookings interleave with the vacuum. Returns pages freed per file;
+        nothing is freed until the file uses incremental auto-vacuum.
+        """
+        started = datetime.now()
+        freed = {}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        for schema in self._schemas():
+            freed[schema] = 0
+            while max_pages is None or freed[schema] < max_pages:
+                free_pages = cursor.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+                if not free_pages or cursor.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] != 2:
+                    break
+                budget = free_pages if max_pages is None else min(free_pages, max_pages - freed[schema])
+                # execute() would step the pragma once, freeing a single page;
+                # executescript runs it to the end
+                conn.executescript(f'PRAGMA {schema}.incremental_vacuum({min(step_pages, budget)})')
+                step = free_pages - cursor.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+                if step <= 0:
+                    break
+                freed[schema] += step
+                time.sleep(pause)
+        self._record_maintenance(cursor, 'vacuum', started, freed)
+        conn.commit()
+        conn.close()
+        return freed
+    
+    @instrumented
+    def vacuum_full(self):
+        """Rebuild every file with VACUUM, switching it to incremental auto-vacuum.
+        
+        Rewrites the whole file, needing as much free disk space again, and
+        holds the write lock while it does, so bookings wait. Files created
+        before incremental auto-vacuum need this once before
+        ``incremental_vacuum`` frees anything. Returns the schemas converted.
+        """
+        started = datetime.now()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        converted = []
+        for schema in self._schemas():
+            if cursor.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] != 2:
+                cursor.execute(f'PRAGMA {schema}.auto_vacuum=INCREMENTAL')
+                converted.append(schema)
+            # Cannot run inside a transaction
+            cursor.execute(f'VACUUM {schema}')
+        self._record_maintenance(cursor, 'vacuum_full', started, converted)
+        conn.commit()
+        conn.close()
+        return converted
+    
+    @instrumented
+    def check_integrity(self, quick=True, max_errors=100):
+        """PRAGMA quick_check (or the slower integrity_check) of every file.
+        
+        Only reads, so in WAL mode bookings carry on. Returns {'ok', 'errors'}.
+        """
+        started = datetime.now()
+        pragma = 'quick_check' if quick else 'integrity_check'
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        errors = [f"{schema}: {row[0]}"
+                  for schema in self._schemas()
+                  for row in cursor.execute(f'PRAGMA {schema}.{pragma}({int(max_errors)})').fetchall()
+                  if row[0] != 'ok']
+        result = {'ok': not errors, 'errors': errors}
+        self._record_maintenance(cursor, pragma, started, result)
+        conn.commit()
+        conn.close()
+        return result
+    
+    @instrumented
+    def get_maintenance_log(self, limit=20):
+        """Latest maintenance runs, newest first."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT task, started_ts, seconds, result FROM maintenance_log ORDER BY id DESC LIMIT ?
+        ''', (limit,))
+        runs = [{
+            'task': task,
+            'started': datetime.strptime(started, SORTABLE_FORMAT).strftime(DATETIME_FORMAT),
+            'seconds': seconds,
+            'result': json.loads(result) if result else None
+        } for task, started, seconds, result in cursor.fetchall()]
+        conn.close()
+        return runs
+    
+    @instrumented
+    def last_maintenance(self):
+        """{task: datetime of its latest run} over every process"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT task, MAX(started_ts) FROM maintenance_log GROUP BY task')
+        last = {task: datetime.strptime(started, SORTABLE_FORMAT) for task, started in cursor.fetchall()}
+        conn.close()
+        return last
     
     # Reset all data
+    @instrumented
     def reset_all_data(self):
+        # Drop every table and rebuild the schema in one write transaction.
+        # Other connections see the old data or an empty database, never a
+        # mix across files, and no change can commit between reading the last
+        # change_log seq and the reset entry that follows it. Dropping frees
+        # whole pages instead of deleting row by row (the maintenance worker
+        # hands them back to the file system later)
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM patients')
-        cursor.execute('DELETE FROM doctors')
-        cursor.execute('DELETE FROM appointments')
+        self._begin_immediate(conn)
+        last_seq = cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+        for schema in self._schemas():
+            cursor.execute(f'''
+                SELECT name FROM {schema}.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+            ''')
+            for (table,) in cursor.fetchall():
+                cursor.execute(f'DROP TABLE {schema}.{table}')
+            # AUTOINCREMENT counters and planner statistics of the dropped tables
+            for internal in ('sqlite_sequence', 'sqlite_stat1'):
+                if cursor.execute(f'SELECT 1 FROM {schema}.sqlite_master WHERE name = ?', (internal,)).fetchone():
+                    cursor.execute(f'DELETE FROM {schema}.{internal}')
+        self._migrate(cursor, 0)
+        # Keep sequence numbers monotonic so consumers resume after the reset
+        # instead of missing it
+        cursor.execute('''
+            INSERT INTO change_log (seq, table_name, row_id, operation, changed_at)
+            VALUES (?, '*', '*', 'reset', ?)
+        ''', (last_seq + 1, datetime.now().strftime(DATETIME_FORMAT)))
         conn.commit()
-        conn.close()
\ No newline at end of file
+        conn.close()
+        self.slots.invalidate()
+        self.waitlist.invalidate()
+        self.triage.invalidate()
\ No newline at end of file
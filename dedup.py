@@ -0,0 +1,201 @@
+# dedup.py
+"""Duplicate patient detection.
+
+Comparing every patient with every other is O(n²), so patients are first
+grouped by blocking keys built from the Soundex codes of their name, their
+age band and their house number.
+Only patients sharing a key are scored, on name similarity (order and
+spelling tolerant), age, gender and address overlap.
+
+``HospitalDatabase.find_duplicate_patients`` uses the stored keys to check
+one new patient in a few milliseconds; ``scan`` checks the whole table,
+scoring blocks on a process pool, and ``HospitalDatabase.merge_patients``
+folds a duplicate into the record that is kept.
+
+    python dedup.py --db hospital.db scan --workers 4
+    python dedup.py --db hospital.db merge P00000012 P00004711
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from difflib import SequenceMatcher
+
+# Pairs scoring at least this are reported as likely duplicates
+DUPLICATE_THRESHOLD = 0.85
+# Blocks larger than this (very common keys) are skipped by the batch scan
+MAX_BLOCK_SIZE = 1000
+AGE_BAND_YEARS = 5
+SCAN_WORKERS = os.cpu_count() or 1
+SCAN_CHUNK_SIZE = 2000
+
+_SOUNDEX = {c: str(d) for d, letters in enumerate(("aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"))
+            for c in letters}
+_TOKEN = re.compile(r"[a-z0-9]+")
+ADDRESS_STOPWORDS = {"street", "road", "lane", "avenue", "nagar", "colony", "near", "flat", "house", "apt",
+                     "the", "and", "block", "sector", "floor", "opp", "main", "cross"}
+
+
+def soundex(word):
+    """Four-character Soundex code ('Robert' and 'Rupert' -> 'r163')."""
+    word = "".join(c for c in word.lower() if c.isalpha())
+    if not word:
+        return ""
+    code = word[0]
+    previous = _SOUNDEX.get(word[0], "")
+    for c in word[1:]:
+        digit = _SOUNDEX.get(c, "")
+        if digit not in ("0", previous):
+            code += digit
+        if c not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def name_tokens(name):
+    return _TOKEN.findall((name or "").lower())
+
+
+def address_tokens(address):
+    return {t for t in _TOKEN.findall((address or "").lower()) if len(t) > 2 and t not in ADDRESS_STOPWORDS}
+
+
+def blocking_keys(patient):
+    """Keys under which ``patient`` is compared; duplicates share at least one.
+
+    Keys are narrow on purpose (a city or a common surname alone would put
+    thousands of patients in one block): the phonetic name with the age
+    band, and the house number with the first name's code or with the
+    surname's code, so a typo in one part still meets the other.
+    """
+    codes = [soundex(t) for t in name_tokens(patient.get('name')) if not t.isdigit()]
+    if not codes:
+        return set()
+    try:
+        band = int(patient.get('age') or 0) // AGE_BAND_YEARS
+    except (TypeError, ValueError):
+        band = -1
+    keys = {f"n:{''.join(sorted(codes))}:{band}"}
+    numbers = [t for t in _TOKEN.findall((patient.get('address') or "").lower()) if t.isdigit()]
+    if numbers:
+        keys.add(f"f:{codes[0]}:{numbers[0]}")
+        keys.add(f"l:{codes[-1]}:{numbers[0]}")
+    return keys
+
+
+def _features(patient):
+    try:
+        age = int(patient.get('age') or 0)
+    except (TypeError, ValueError):
+        age = None
+    return (patient['id'], " ".join(sorted(name_tokens(patient.get('name')))), age,
+            (patient.get('gender') or "").lower(), address_tokens(patient.get('address')))
+
+
+def _similarity(a, b, minimum=0.0):
+    # a and b are _features() tuples; returns 0.0 as soon as ``minimum`` is out of reach
+    _, name_a, age_a, gender_a, address_a = a
+    _, name_b, age_b, gender_b, address_b = b
+    age_gap = abs(age_a - age_b) if age_a is not None and age_b is not None else None
+    rest = 0.15 * (1.0 if age_gap == 0 else 0.6 if age_gap is not None and age_gap <= 2 else 0.0)
+    rest += 0.1 * (gender_a == gender_b)
+    if address_a and address_b:
+        rest += 0.2 * len(address_a & address_b) / len(address_a | address_b)
+    else:
+        rest += 0.1
+    # Sorted tokens make "Sharma Asha" match "Asha Sharma"
+    matcher = SequenceMatcher(None, name_a, name_b)
+    if rest + 0.55 * matcher.real_quick_ratio() < minimum or rest + 0.55 * matcher.quick_ratio() < minimum:
+        return 0.0
+    return rest + 0.55 * matcher.ratio()
+
+
+def score(a, b):
+    """Similarity of two patient records in [0, 1]: name 55%, age 15%, gender 10%, address 20%."""
+    return _similarity(_features(a), _features(b))
+
+
+def _score_blocks(blocks, threshold):
+    # Runs in a worker process; blocks hold _features() tuples
+    pairs = {}
+    for block in blocks:
+        for i, a in enumerate(block):
+            for b in block[i + 1:]:
+                pair = (a[0], b[0]) if a[0] < b[0] else (b[0], a[0])
+                if pair in pairs:
+                    continue
+                similarity = _similarity(a, b, threshold)
+                if similarity >= threshold:
+                    pairs[pair] = similarity
+    return pairs
+
+
+def scan(patients, threshold=DUPLICATE_THRESHOLD, workers=SCAN_WORKERS, max_block_size=MAX_BLOCK_SIZE):
+    """Likely duplicate pairs among ``patients`` -> [(score, id_a, id_b)], best first."""
+    blocks = {}
+    for patient in patients:
+        features = _features(patient)
+        for key in blocking_keys(patient):
+            blocks.setdefault(key, []).append(features)
+    work = [block for block in blocks.values() if 1 < len(block) <= max_block_size]
+    # Chunks of roughly equal pair counts, so one huge block does not hold up a worker
+    chunks, chunk, pairs_in_chunk = [], [], 0
+    for block in sorted(work, key=len, reverse=True):
+        chunk.append(block)
+        pairs_in_chunk += len(block) * (len(block) - 1) // 2
+        if pairs_in_chunk >= SCAN_CHUNK_SIZE * 10:
+            chunks.append(chunk)
+            chunk, pairs_in_chunk = [], 0
+    if chunk:
+        chunks.append(chunk)
+
+    found = {}
+    if workers > 1 and len(chunks) > 1:
+        # Imported here: multiprocessing would add to the import time of database.py
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for pairs in executor.map(_score_blocks, chunks, [threshold] * len(chunks)):
+                found.update(pairs)
+    else:
+        for chunk in chunks:
+            found.update(_score_blocks(chunk, threshold))
+    return sorted(((s, a, b) for (a, b), s in found.items()), reverse=True)
+
+
+def main():
+    from database import HospitalDatabase
+    from repository import open_database
+
+    parser = argparse.ArgumentParser(description="Find and merge duplicate patients")
+    parser.add_argument("--db", help="database path (default: HOSPITAL_DB_URL or hospital.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan_cmd = commands.add_parser("scan", help="list likely duplicate pairs")
+    scan_cmd.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    scan_cmd.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    scan_cmd.add_argument("--limit", type=int, default=50, help="pairs to print")
+    merge_cmd = commands.add_parser("merge", help="fold a duplicate into the record to keep")
+    merge_cmd.add_argument("keep_id")
+    merge_cmd.add_argument("duplicate_id")
+    args = parser.parse_args()
+
+    db = open_database(args.db)
+    if args.command == "scan":
+        start = time.perf_counter()
+        patients = db.get_all_patients()
+        by_id = {p['id']: p for p in patients}
+        pairs = scan(patients, args.threshold, args.workers)
+        for similarity, a, b in pairs[:args.limit]:
+            print(f"{similarity:.2f}  {a:<12} {by_id[a]['name']:<30} {b:<12} {by_id[b]['name']}")
+        print(f"{len(pairs)} likely duplicate pairs among {len(patients)} patients "
+              f"in {time.perf_counter() - start:.1f}s")
+    elif not isinstance(db, HospitalDatabase):
+        parser.error("merge needs a SQLite database")
+    else:
+        ok, message = db.merge_patients(args.keep_id, args.duplicate_id)
+        print(message)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
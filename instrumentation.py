@@ -0,0 +1,191 @@
+# instrumentation.py
+"""Per-method statistics for HospitalDatabase.
+
+Nothing here runs unless a ``QueryStats`` is attached to the database
+(``db.enable_instrumentation()``); the ``instrumented`` wrapper then costs a
+single attribute check per call.
+
+Each method's time is split into connection setup (``connect_ms``), SQL
+(``sql_ms``: executing statements and fetching rows, timed by the backend's
+cursors) and the rest (``mapping_ms``: turning rows into dicts and other
+Python work).  Nested calls count towards their callers as well.
+"""
+import functools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+
+def redact(value):
+    """Describe a call argument without exposing its content (PHI)."""
+    if isinstance(value, dict):
+        return "{" + ", ".join(sorted(str(k) for k in value)) + "}"
+    if isinstance(value, (list, tuple)):
+        return f"<{type(value).__name__}[{len(value)}]>"
+    if value is None or isinstance(value, bool):
+        return repr(value)
+    return f"<{type(value).__name__}>"
+
+
+class MethodStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.connect_ms = 0.0
+        self.sql_ms = 0.0
+        self.histogram = [0] * len(HISTOGRAM_BUCKETS_MS)
+
+    def add(self, elapsed_ms, rows, failed, connect_ms=0.0, sql_ms=0.0):
+        self.calls += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.connect_ms += connect_ms
+        self.sql_ms += sql_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[i] += 1
+                break
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'connect_ms': round(self.connect_ms, 3),
+            'sql_ms': round(self.sql_ms, 3),
+            'mapping_ms': round(max(0.0, self.total_ms - self.connect_ms - self.sql_ms), 3),
+            'rows': self.rows,
+            'histogram': {
+                (f"<={bound:g}ms" if bound != float('inf') else f">{HISTOGRAM_BUCKETS_MS[-2]:g}ms"): count
+                for bound, count in zip(HISTOGRAM_BUCKETS_MS, self.histogram)
+            },
+        }
+
+
+class QueryStats:
+    def __init__(self, slow_query_ms=None, slow_log_size=200):
+        self.slow_query_ms = slow_query_ms
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.started_at = datetime.now()
+        self._methods = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        """[name, connect seconds, SQL seconds] of every method running on this thread"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _add_thread_totals(self, elapsed, connect, sql):
+        totals = getattr(self._local, 'totals', None)
+        if totals is None:
+            totals = self._local.totals = [0.0, 0.0, 0.0]
+        totals[0] += elapsed
+        totals[1] += connect
+        totals[2] += sql
+
+    def take_thread_totals(self):
+        """Database time on this thread since the last call, in ms:
+        {'db_ms', 'connect_ms', 'sql_ms', 'mapping_ms'}"""
+        elapsed, connect, sql = getattr(self._local, 'totals', None) or (0.0, 0.0, 0.0)
+        self._local.totals = None
+        return {
+            'db_ms': round(elapsed * 1000, 3),
+            'connect_ms': round(connect * 1000, 3),
+            'sql_ms': round(sql * 1000, 3),
+            'mapping_ms': round(max(0.0, elapsed - connect - sql) * 1000, 3),
+        }
+
+    def enter(self, name):
+        self._stack().append([name, 0.0, 0.0])
+
+    def exit(self, name, elapsed, rows, args, failed=False):
+        stack = self._stack()
+        _, connect, sql = stack.pop()
+        if stack:
+            # Inclusive, like the caller's own elapsed time
+            stack[-1][1] += connect
+            stack[-1][2] += sql
+        else:
+            self._add_thread_totals(elapsed, connect, sql)
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            self._methods.setdefault(name, MethodStats()).add(elapsed_ms, rows, failed, connect * 1000, sql * 1000)
+            if self.slow_query_ms is not None and elapsed_ms >= self.slow_query_ms:
+                self.slow_queries.append({
+                    'at': datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
+                    'method': name,
+                    'duration_ms': round(elapsed_ms, 3),
+                    'params': [redact(a) for a in args],
+                })
+
+    def record_connect(self, elapsed):
+        """Attribute connection setup time to the method currently running."""
+        stack = self._stack()
+        if stack:
+            stack[-1][1] += elapsed
+            return
+        with self._lock:
+            self._methods.setdefault('get_connection', MethodStats()).connect_ms += elapsed * 1000
+        self._add_thread_totals(elapsed, elapsed, 0.0)
+
+    def record_sql(self, elapsed):
+        """Attribute time spent executing SQL and fetching rows to the method currently running."""
+        stack = self._stack()
+        if stack:
+            stack[-1][2] += elapsed
+        else:
+            self._add_thread_totals(elapsed, 0.0, elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self._methods.items())}
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self.slow_queries.clear()
+            self.started_at = datetime.now()
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    return 0
+
+
+def instrumented(method):
+    """Record calls of a HospitalDatabase method in ``self.stats`` when set."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = self.stats
+        if stats is None:
+            return method(self, *args, **kwargs)
+        stats.enter(name)
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception:
+            stats.exit(name, time.perf_counter() - start, 0, args, failed=True)
+            raise
+        stats.exit(name, time.perf_counter() - start, _row_count(result), args)
+        return result
+
+    return wrapper
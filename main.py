@@ -1,19 +1,63 @@
 #!/usr/bin/env python3
+"""Command-line hospital manager.
+
+    python main.py                          # in memory, nothing is kept
+    python main.py --snapshot cli.json      # in memory, saved to cli.json after each change
+    python main.py --db hospital.db         # the web app's database (or a postgresql:// URL)
+
+Scripted use, against any of the stores above:
+
+    python main.py --db hospital.db add patient P1 name=Asha age=34 gender=Female disease=Fever
+    python main.py --db hospital.db edit appointment A7 appointmentDateTime="02-01-2025 10:30"
+    python main.py --db hospital.db delete doctor D3
+    python main.py --db hospital.db show patient P1
+    python main.py --db hospital.db list doctor
+    python main.py --db hospital.db batch operations.jsonl --batch-size 500
+
+A batch file holds one JSON object per line, e.g.
+{"op": "add", "entity": "doctor", "id": "D9", "name": "Dr. Rao", "specialization": "Neurology"}
+{"op": "edit", "entity": "patient", "id": "P1", "disease": "Migraine"}
+{"op": "delete", "entity": "appointment", "id": "A7"}
+
+An edit may carry the "version" it was prepared against; it then fails
+instead of overwriting a change someone else made in the meantime.
+"""
+from collections import Counter
 from datetime import datetime
+import argparse
+import json
+import sqlite3
 import sys
+import time
 
-patients = []  # list of dicts
-doctors = []
-appointments = []
+from memory_store import MemoryStore
+
+# Replaced in main() according to --db / --snapshot
+store = MemoryStore()
 
 
 def get_current_datetime():
     return datetime.now().strftime("%d-%m-%Y %H:%M:%S")
 
 
+def format_patient(p):
+    return f"ID: {p['id']} | Name: {p['name']} | Age: {p['age']} | Gender: {p['gender']} | Address: {p['address']} | Disease: {p['disease']} | REFERRED_BY: {p['REFERRED_BY']} | Admission DateTime: {p['admissionDateTime']}"
+
+
+def format_doctor(d):
+    return f"ID: {d['id']} | Name: {d['name']} | Specialization: {d['specialization']} | Experience: {d['experience']} years"
+
+
+def format_appointment(a):
+    return f"ID: {a['id']} | Patient Name: {a['patientName']} | Doctor Name: {a['doctorName']} | Appointment DateTime: {a['appointmentDateTime']}"
+
+
 # Patients
 def add_patient():
     pid = input("Enter Patient ID: ").strip()
+    if store.get_patient_by_id(pid) is not None:
+        print("Patient ID already exists!")
+        return
     name = input("Enter Patient Name: ").strip()
     try:
         age = int(input("Enter Patient Age: ").strip())
@@ -25,7 +69,7 @@ def add_patient():
     disease = input("Enter Patient Disease: ").strip()
     referred_by = input("Enter Referred By: ").strip()
     admission = get_current_datetime()
-    patients.append({
+    store.add_patient({
         "id": pid,
         "name": name,
         "age": age,
@@ -39,27 +83,20 @@ def add_patient():
 
 
 def view_patients():
+    patients = store.get_all_patients()
     if not patients:
         print("No patients found.")
         return
     for p in patients:
-        print(f"ID: {p['id']} | Name: {p['name']} | Age: {p['age']} | Gender: {p['gender']} | Address: {p['address']} | Disease: {p['disease']} | REFERRED_BY: {p['REFERRED_BY']} | Admission DateTime: {p['admissionDateTime']}")
-
-
-def find_patient_index_by_id(pid):
-    for i, p in enumerate(patients):
-        if p['id'] == pid:
-            return i
-    return -1
+        print(format_patient(p))
 
 
 def edit_patient():
     pid = input("Enter Patient ID to edit: ").strip()
-    idx = find_patient_index_by_id(pid)
-    if idx == -1:
+    p = store.get_patient_by_id(pid)
+    if p is None:
         print("Patient not found!")
         return
-    p = patients[idx]
     print("What do you want to edit?")
     print("1. Name\n2. Age\n3. Gender\n4. Address\n5. Disease\n6. Referred By")
     choice = input("Enter your choice: ").strip()
@@ -82,26 +119,25 @@ def edit_patient():
         print("Invalid choice!")
         return
     p['admissionDateTime'] = get_current_datetime()
-    print("Patient record updated successfully!")
+    ok, message = store.update_patient(pid, p, expected_version=p['version'])
+    print("Patient record updated successfully!" if ok else message)
 
 
 def view_patient_by_id():
     pid = input("Enter Patient ID to view: ").strip()
-    idx = find_patient_index_by_id(pid)
-    if idx == -1:
+    p = store.get_patient_by_id(pid)
+    if p is None:
         print("Patient not found!")
         return
-    p = patients[idx]
-    print(f"ID: {p['id']} | Name: {p['name']} | Age: {p['age']} | Gender: {p['gender']} | Address: {p['address']} | Disease: {p['disease']} | REFERRED_BY: {p['REFERRED_BY']} | Admission DateTime: {p['admissionDateTime']}")
+    print(format_patient(p))
 
 
 def delete_patient_by_id():
     pid = input("Enter Patient ID to delete: ").strip()
-    idx = find_patient_index_by_id(pid)
-    if idx == -1:
+    if store.get_patient_by_id(pid) is None:
         print("Patient not found!")
         return
-    patients.pop(idx)
+    store.delete_patient(pid)
     print("Patient record deleted successfully!")
 
 
@@ -109,6 +145,9 @@ def delete_patient_by_id():
 
 def add_doctor():
     did = input("Enter Doctor ID: ").strip()
+    if store.get_doctor_by_id(did) is not None:
+        print("Doctor ID already exists!")
+        return
     name = input("Enter Doctor Name: ").strip()
     specialization = input("Enter Doctor Specialization: ").strip()
     try:
@@ -116,7 +155,7 @@ def add_doctor():
     except ValueError:
         print("Invalid experience, setting to 0")
         experience = 0
-    doctors.append({
+    store.add_doctor({
         "id": did,
         "name": name,
         "specialization": specialization,
@@ -126,27 +165,20 @@ def add_doctor():
 
 
 def view_doctors():
+    doctors = store.get_all_doctors()
     if not doctors:
         print("No doctors found.")
         return
     for d in doctors:
-        print(f"ID: {d['id']} | Name: {d['name']} | Specialization: {d['specialization']} | Experience: {d['experience']} years")
-
-
-def find_doctor_index_by_id(did):
-    for i, d in enumerate(doctors):
-        if d['id'] == did:
-            return i
-    return -1
+        print(format_doctor(d))
 
 
 def edit_doctor():
     did = input("Enter Doctor ID to edit: ").strip()
-    idx = find_doctor_index_by_id(did)
-    if idx == -1:
+    d = store.get_doctor_by_id(did)
+    if d is None:
         print("Doctor not found!")
         return
-    d = doctors[idx]
     print("What do you want to edit?\n1. Name\n2. Specialization\n3. Experience")
     choice = input("Enter your choice: ").strip()
     if choice == '1':
@@ -161,26 +193,25 @@ def edit_doctor():
     else:
         print("Invalid choice!")
         return
-    print("Doctor record updated successfully!")
+    ok, message = store.update_doctor(did, d, expected_version=d['version'])
+    print("Doctor record updated successfully!" if ok else message)
 
 
 def view_doctor_by_id():
     did = input("Enter Doctor ID to view: ").strip()
-    idx = find_doctor_index_by_id(did)
-    if idx == -1:
+    d = store.get_doctor_by_id(did)
+    if d is None:
         print("Doctor not found!")
         return
-    d = doctors[idx]
-    print(f"ID: {d['id']} | Name: {d['name']} | Specialization: {d['specialization']} | Experience: {d['experience']} years")
+    print(format_doctor(d))
 
 
 def delete_doctor_by_id():
     did = input("Enter Doctor ID to delete: ").strip()
-    idx = find_doctor_index_by_id(did)
-    if idx == -1:
+    if store.get_doctor_by_id(did) is None:
         print("Doctor not found!")
         return
-    doctors.pop(idx)
+    store.delete_doctor(did)
     print("Doctor record deleted successfully!")
 
 
@@ -188,77 +219,85 @@ def delete_doctor_by_id():
 
 def add_appointment():
     aid = input("Enter Appointment ID: ").strip()
+    if store.get_appointment_by_id(aid) is not None:
+        print("Appointment ID already exists!")
+        return
     patient_name = input("Enter Patient Name: ").strip()
     doctor_name = input("Enter Doctor Name: ").strip()
-    appointment_time = get_current_datetime()
-    appointments.append({
+    when = input("Enter Appointment Date & Time (dd-mm-YYYY HH:MM, blank for now): ").strip()
+    if when:
+        try:
+            appointment_time = datetime.strptime(when, "%d-%m-%Y %H:%M").strftime("%d-%m-%Y %H:%M:%S")
+        except ValueError:
+            print("Invalid date/time, expected dd-mm-YYYY HH:MM")
+            return
+    else:
+        appointment_time = get_current_datetime()
+    success, message = store.add_appointment({
         "id": aid,
         "patientName": patient_name,
         "doctorName": doctor_name,
         "appointmentDateTime": appointment_time,
     })
-    print("Appointment added successfully!\n")
+    print(("Appointment added successfully!" if success else message) + "\n")
 
 
 def view_appointments():
+    appointments = store.get_all_appointments()
     if not appointments:
         print("No appointments found.")
         return
     for a in appointments:
-        print(f"ID: {a['id']} | Patient Name: {a['patientName']} | Doctor Name: {a['doctorName']} | Appointment DateTime: {a['appointmentDateTime']}")
-
-
-def find_appointment_index_by_id(aid):
-    for i, a in enumerate(appointments):
-        if a['id'] == aid:
-            return i
-    return -1
+        print(format_appointment(a))
 
 
 def edit_appointment():
     aid = input("Enter Appointment ID to edit: ").strip()
-    idx = find_appointment_index_by_id(aid)
-    if idx == -1:
+    a = store.get_appointment_by_id(aid)
+    if a is None:
         print("Appointment not found!")
         return
-    a = appointments[idx]
-    print("What do you want to edit?\n1. Patient Name\n2. Doctor Name")
+    print("What do you want to edit?\n1. Patient Name\n2. Doctor Name\n3. Appointment Date & Time")
     choice = input("Enter your choice: ").strip()
     if choice == '1':
         a['patientName'] = input("Enter new Patient Name: ").strip()
     elif choice == '2':
         a['doctorName'] = input("Enter new Doctor Name: ").strip()
+    elif choice == '3':
+        when = input("Enter new Appointment Date & Time (dd-mm-YYYY HH:MM): ").strip()
+        try:
+            a['appointmentDateTime'] = datetime.strptime(when, "%d-%m-%Y %H:%M").strftime("%d-%m-%Y %H:%M:%S")
+        except ValueError:
+            print("Invalid date/time, expected dd-mm-YYYY HH:MM")
+            return
     else:
         print("Invalid choice!")
         return
-    a['appointmentDateTime'] = get_current_datetime()
-    print("Appointment record updated successfully!")
+    # The slot is kept unless it was edited, as with `edit appointment ... field=value`
+    ok, message = store.update_appointment(aid, a, expected_version=a['version'])
+    print("Appointment record updated successfully!" if ok else message)
 
 
 def view_appointment_by_id():
     aid = input("Enter Appointment ID to view: ").strip()
-    idx = find_appointment_index_by_id(aid)
-    if idx == -1:
+    a = store.get_appointment_by_id(aid)
+    if a is None:
         print("Appointment not found!")
         return
-    a = appointments[idx]
-    print(f"ID: {a['id']} | Patient Name: {a['patientName']} | Doctor Name: {a['doctorName']} | Appointment DateTime: {a['appointmentDateTime']}")
+    print(format_appointment(a))
 
 
 def delete_appointment_by_id():
     aid = input("Enter Appointment ID to delete: ").strip()
-    idx = find_appointment_index_by_id(aid)
-    if idx == -1:
+    if store.get_appointment_by_id(aid) is None:
         print("Appointment not found!")
         return
-    appointments.pop(idx)
+    store.delete_appointment(aid)
     print("Appointment record deleted successfully!")
 
 
 def reset_all_data():
-    patients.clear()
-    doctors.clear()
-    appointments.clear()
+    store.reset_all_data()
     print("All data reset successfully!")
 
 
@@ -320,7 +359,233 @@ def appointments_menu():
         print("Invalid choice!")
 
 
+# Scripted operations (subcommands and batch files)
+BATCH_COMMIT_SIZE = 500
+MAX_REPORTED_FAILURES = 20
+# Per-record problems; anything else (disk, locks) stops the run
+RECORD_ERRORS = (ValueError, sqlite3.IntegrityError)
+try:
+    import psycopg2
+except ImportError:  # optional dependency, only needed for postgresql:// URLs
+    pass
+else:
+    RECORD_ERRORS += (psycopg2.IntegrityError,)
+
+
+def parse_datetime(value):
+    for fmt in ("%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%d-%m-%Y %H:%M:%S")
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date/time '{value}', expected dd-mm-YYYY HH:MM[:SS]")
+
+
+ENTITIES = {
+    'patient': {
+        'methods': ('get_patient_by_id', 'add_patient', 'update_patient', 'delete_patient', 'get_all_patients'),
+        'fields': {'name': str, 'age': int, 'gender': str, 'address': str, 'disease': str,
+                   'REFERRED_BY': str, 'admissionDateTime': parse_datetime},
+        'defaults': lambda: {'address': "", 'REFERRED_BY': "", 'admissionDateTime': get_current_datetime()},
+        'format': format_patient,
+    },
+    'doctor': {
+        'methods': ('get_doctor_by_id', 'add_doctor', 'update_doctor', 'delete_doctor', 'get_all_doctors'),
+        'fields': {'name': str, 'specialization': str, 'experience': int},
+        'defaults': lambda: {'experience': 0},
+        'format': format_doctor,
+    },
+    'appointment': {
+        'methods': ('get_appointment_by_id', 'add_appointment', 'update_appointment', 'delete_appointment',
+                    'get_all_appointments'),
+        'fields': {'patientName': str, 'doctorName': str, 'appointmentDateTime': parse_datetime},
+        'defaults': lambda: {},
+        'format': format_appointment,
+    },
+}
+
+
+def _check_result(result):
+    # Updates and add_appointment report conflicts instead of raising
+    if isinstance(result, tuple) and not result[0]:
+        raise ValueError(result[1])
+
+
+def apply_operation(operation):
+    """Apply one {'op', 'entity', 'id', field: value ...} operation; raises ValueError if it cannot."""
+    if not isinstance(operation, dict):
+        raise ValueError("Expected a JSON object")
+    action, kind = operation.get('op'), operation.get('entity')
+    if kind not in ENTITIES:
+        raise ValueError(f"Unknown entity '{kind}' (use {', '.join(ENTITIES)})")
+    spec = ENTITIES[kind]
+    get, add, update, delete, _ = (getattr(store, name) for name in spec['methods'])
+    record_id = str(operation.get('id') or "").strip()
+    if not record_id:
+        raise ValueError("Missing id")
+
+    values = {}
+    for field, value in operation.items():
+        if field in ('op', 'entity', 'id', 'version'):
+            continue
+        if field not in spec['fields']:
+            raise ValueError(f"Unknown {kind} field '{field}'")
+        try:
+            values[field] = spec['fields'][field](value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {field} '{value}'") from None
+
+    current = get(record_id)
+    if action == 'add':
+        if current is not None:
+            raise ValueError(f"{kind.capitalize()} ID {record_id} already exists")
+        record = {'id': record_id, **spec['defaults'](), **values}
+        missing = [field for field in spec['fields'] if field not in record]
+        if missing:
+            raise ValueError(f"Missing {', '.join(missing)}")
+        _check_result(add(record))
+    elif action in ('edit', 'delete'):
+        if current is None:
+            raise ValueError(f"{kind.capitalize()} {record_id} not found")
+        if action == 'edit':
+            # Without a version in the operation, only guard the read above
+            expected_version = operation.get('version', current['version'])
+            _check_result(update(record_id, {**current, **values}, expected_version=expected_version))
+        else:
+            delete(record_id)
+    else:
+        raise ValueError(f"Unknown op '{action}' (use add, edit or delete)")
+
+
+def _read_operations(path):
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line_no, line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run_batch(path, batch_size=BATCH_COMMIT_SIZE):
+    """Apply a JSON-lines file of operations, committing every ``batch_size``; returns the failure count."""
+    results = Counter()
+    failures = []
+    commits = 0
+    start = time.perf_counter()
+    operations = _read_operations(path)
+    done = False
+    while not done:
+        with store.batch():
+            for _ in range(batch_size):
+                item = next(operations, None)
+                if item is None:
+                    done = True
+                    break
+                line_no, line = item
+                key = "invalid"
+                try:
+                    operation = json.loads(line)
+                    if isinstance(operation, dict):
+                        key = f"{operation.get('op')} {operation.get('entity')}"
+                    apply_operation(operation)
+                    results[(key, 'ok')] += 1
+                except RECORD_ERRORS as e:
+                    results[(key, 'failed')] += 1
+                    failures.append((line_no, str(e)))
+        save()
+        commits += 1
+    elapsed = time.perf_counter() - start
+
+    total = sum(results.values())
+    print(f"Processed {total} operations in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed else 0:.0f} ops/s, {commits} commits)")
+    for key in sorted({key for key, _ in results}):
+        print(f"  {key:<22} {results[(key, 'ok')]:>8} ok {results[(key, 'failed')]:>8} failed")
+    if failures:
+        print(f"{len(failures)} failed:")
+        for line_no, error in failures[:MAX_REPORTED_FAILURES]:
+            print(f"  line {line_no}: {error}")
+        if len(failures) > MAX_REPORTED_FAILURES:
+            print(f"  ... and {len(failures) - MAX_REPORTED_FAILURES} more")
+    return len(failures)
+
+
+def run_command(args):
+    """Run one subcommand; returns the process exit code."""
+    if args.command == "batch":
+        return 1 if run_batch(args.file, args.batch_size) else 0
+    spec = ENTITIES[args.entity]
+    if args.command == "list":
+        for record in getattr(store, spec['methods'][4])():
+            print(spec['format'](record))
+        return 0
+    if args.command == "show":
+        record = getattr(store, spec['methods'][0])(args.id)
+        if record is None:
+            print(f"{args.entity.capitalize()} not found!")
+            return 1
+        print(spec['format'](record))
+        return 0
+
+    operation = {'op': args.command, 'entity': args.entity, 'id': args.id}
+    for pair in getattr(args, 'fields', []):
+        field, sep, value = pair.partition("=")
+        if not sep:
+            print(f"Expected field=value, got '{pair}'")
+            return 2
+        operation[field] = value
+    try:
+        apply_operation(operation)
+    except RECORD_ERRORS as e:
+        print(e)
+        return 1
+    save()
+    done = {'add': "added", 'edit': "updated", 'delete': "deleted"}[args.command]
+    print(f"{args.entity.capitalize()} {args.id} {done} successfully!")
+    return 0
+
+
+def open_store(db=None, snapshot=None):
+    if db:
+        from repository import open_database
+        return open_database(db)
+    return MemoryStore(snapshot)
+
+
+def save():
+    # Database backends commit every call; the memory store writes its snapshot
+    if isinstance(store, MemoryStore):
+        store.save()
+
+
 def main():
+    global store
+    parser = argparse.ArgumentParser(description="Hospital Appointment Manager (command line)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", help="SQLite file or database URL to work on (e.g. hospital.db)")
+    source.add_argument("--snapshot", help="JSON file the in-memory store is loaded from and saved to")
+    commands = parser.add_subparsers(dest="command", title="commands (omit for the interactive menu)")
+    for name in ("add", "edit"):
+        cmd = commands.add_parser(name, help=f"{name} a record from field=value pairs")
+        cmd.add_argument("entity", choices=ENTITIES)
+        cmd.add_argument("id")
+        cmd.add_argument("fields", nargs="*", metavar="field=value")
+    for name in ("delete", "show"):
+        cmd = commands.add_parser(name, help=f"{name} a record by ID")
+        cmd.add_argument("entity", choices=ENTITIES)
+        cmd.add_argument("id")
+    commands.add_parser("list", help="print every record of one kind").add_argument("entity", choices=ENTITIES)
+    batch_cmd = commands.add_parser("batch", help="apply a JSON-lines file of operations ('-' for stdin)")
+    batch_cmd.add_argument("file")
+    batch_cmd.add_argument("--batch-size", type=int, default=BATCH_COMMIT_SIZE, help="operations per commit")
+    args = parser.parse_args()
+    store = open_store(args.db, args.snapshot)
+    if args.command:
+        sys.exit(run_command(args))
+
     while True:
         print("\n1. Patients\n2. Doctors\n3. Appointments\n4. Reset All Data\n5. Exit")
         choice = input("Enter your choice: ").strip()
@@ -337,6 +602,7 @@ def main():
             sys.exit(0)
         else:
             print("Invalid choice!")
+        save()
 
 
 if __name__ == '__main__':
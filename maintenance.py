@@ -0,0 +1,194 @@
+# maintenance.py
+"""Scheduled database upkeep: planner statistics, free space and integrity.
+
+Deletes and resets leave free pages behind, and nothing else gathers the
+statistics SQLite's query planner uses.  ``MaintenanceWorker`` wakes every
+few minutes and runs whichever task is due:
+
+- ``optimize``: refresh the planner statistics with a sampled ANALYZE
+  (``HospitalDatabase.optimize``), hourly;
+- ``vacuum``: hand free pages back to the file system a small step at a
+  time (``incremental_vacuum``), once enough have piled up;
+- ``quick_check``: ``PRAGMA quick_check`` of every file, daily.
+
+When a task last ran is read from ``maintenance_log``, which every process
+writes, so several app servers sharing a file do not repeat each other's
+work.  Steps that write hold the lock for a few milliseconds at most and
+reads run beside bookings in WAL mode, so bookings never wait for long.
+
+    python maintenance.py stats
+    python maintenance.py run                  # whatever is due now
+    python maintenance.py optimize|vacuum|check
+    python maintenance.py vacuum --full        # one-off rebuild, blocks writers
+    python maintenance.py schedule --interval 300
+
+Files created before incremental auto-vacuum keep free pages until that
+one-off rebuild has run; the app and ``stats`` say when it is still needed.
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database import VACUUM_PAUSE_SECONDS, VACUUM_STEP_PAGES, HospitalDatabase
+
+MAINTENANCE_INTERVAL_SECONDS = 300
+# How often each task runs at most
+TASK_INTERVALS = {
+    'optimize': timedelta(hours=1),
+    'vacuum': timedelta(minutes=10),
+    'quick_check': timedelta(days=1),
+}
+# A vacuum is only worth its writes once this many pages (4 KB each) are free
+VACUUM_MIN_FREE_PAGES = 256
+# Pages freed per file per run; the rest waits for the next run
+VACUUM_MAX_PAGES = 25_600
+# ``vacuum --full`` tries again this many times, this far apart, while the
+# file is busy or not yet incremental
+VACUUM_FULL_ATTEMPTS = 5
+VACUUM_FULL_RETRY_SECONDS = 30
+
+
+def due_tasks(db, now=None):
+    """Tasks whose interval has passed since their last run in any process."""
+    now = now or datetime.now()
+    last = db.last_maintenance()
+    due = [task for task, interval in TASK_INTERVALS.items()
+           if task not in last or now - last[task] >= interval]
+    if 'vacuum' in due:
+        files = db.get_storage_stats(tables=False)['files'].values()
+        if not any(f['auto_vacuum'] == 'incremental' and f['free_pages'] >= VACUUM_MIN_FREE_PAGES for f in files):
+            due.remove('vacuum')
+    return due
+
+
+def run_task(db, task):
+    if task == 'optimize':
+        return db.optimize()
+    if task == 'vacuum':
+        return db.incremental_vacuum(VACUUM_MAX_PAGES, VACUUM_STEP_PAGES, VACUUM_PAUSE_SECONDS)
+    if task == 'quick_check':
+        return db.check_integrity(quick=True)
+    raise ValueError(f"Unknown maintenance task '{task}'")
+
+
+def needs_rebuild(db):
+    """Files that still need ``vacuum --full`` before free pages can be reclaimed"""
+    return [schema for schema, f in db.get_storage_stats(tables=False)['files'].items()
+            if f['auto_vacuum'] != 'incremental']
+
+
+def vacuum_full(db, attempts=VACUUM_FULL_ATTEMPTS, retry_seconds=VACUUM_FULL_RETRY_SECONDS):
+    """``db.vacuum_full()``, tried again while it fails (busy, disk full) or a
+    file is still not incremental -> the schemas converted"""
+    converted = []
+    for attempt in range(1, attempts + 1):
+        try:
+            converted += db.vacuum_full()
+        except sqlite3.OperationalError:
+            if attempt == attempts:
+                raise
+        else:
+            if not needs_rebuild(db):
+                return converted
+        time.sleep(retry_seconds)
+    raise sqlite3.OperationalError(f"Still not incremental after {attempts} attempts: {', '.join(needs_rebuild(db))}")
+
+
+def run_due(db, now=None):
+    """Run every due task -> {task: result}"""
+    return {task: run_task(db, task) for task in due_tasks(db, now)}
+
+
+class MaintenanceWorker:
+    """Runs the due maintenance tasks every ``interval`` seconds on a daemon thread."""
+
+    def __init__(self, db, interval=MAINTENANCE_INTERVAL_SECONDS):
+        self.db = db
+        self.interval = interval
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="maintenance-worker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = run_due(self.db)
+                self.last_error = None
+            except sqlite3.Error as e:
+                self.last_error = str(e)
+
+
+def print_stats(db):
+    stats = db.get_storage_stats()
+    for schema, f in stats['files'].items():
+        share = f['free_pages'] / f['pages'] if f['pages'] else 0.0
+        print(f"{schema}: {f['bytes'] / 1e6:.1f} MB in {f['pages']} pages, {f['free_pages']} free ({share:.1%}), "
+              f"auto_vacuum={f['auto_vacuum']}")
+    for table in stats['tables'][:10]:
+        print(f"  {table['schema']}.{table['name']}: {table['pages']} pages, {table['fill']:.0%} full")
+    if needs_rebuild(db):
+        print("Free pages are not reclaimed until `python maintenance.py vacuum --full` has run once")
+    for run in db.get_maintenance_log(5):
+        print(f"last {run['task']}: {run['started']} ({run['seconds']:.2f}s) {run['result']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the hospital database")
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--archive-db", help="archive SQLite file used by the app, if any")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="page counts, free space and recent runs")
+    commands.add_parser("run", help="run the tasks that are due")
+    commands.add_parser("optimize", help="refresh the query planner statistics")
+    vacuum_cmd = commands.add_parser("vacuum", help="hand free pages back to the file system")
+    vacuum_cmd.add_argument("--full", action="store_true",
+                            help="rebuild the files with VACUUM instead; blocks writers while it runs")
+    check_cmd = commands.add_parser("check", help="quick_check every file")
+    check_cmd.add_argument("--full", action="store_true", help="run the slower integrity_check")
+    schedule_cmd = commands.add_parser("schedule", help="run due tasks periodically until interrupted")
+    schedule_cmd.add_argument("--interval", type=float, default=MAINTENANCE_INTERVAL_SECONDS,
+                              help="seconds between checks for due tasks")
+    args = parser.parse_args()
+
+    db = HospitalDatabase(args.db, archive_db=args.archive_db)
+    start = time.perf_counter()
+    if args.command == "stats":
+        print_stats(db)
+        return
+    if args.command == "schedule":
+        print(f"Checking for due maintenance every {args.interval:g}s (Ctrl+C to stop)")
+        worker = MaintenanceWorker(db, args.interval).start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.stop()
+        return
+    if args.command == "run":
+        result = run_due(db) or "nothing due"
+    elif args.command == "vacuum" and args.full:
+        result = {'converted': vacuum_full(db)}
+    elif args.command == "vacuum":
+        result = db.incremental_vacuum()
+    elif args.command == "check":
+        result = db.check_integrity(quick=not args.full)
+    else:
+        result = run_task(db, args.command)
+    print(f"{args.command}: {result} ({time.perf_counter() - start:.2f}s)")
+    if args.command == "check" and not result['ok']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
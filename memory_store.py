@@ -0,0 +1,176 @@
+# memory_store.py
+"""Dict-indexed in-memory store for the main.py CLI.
+
+Offers the subset of the ``HospitalDatabase`` API the CLI uses, so the CLI
+runs the same code on either.  Records are keyed by ID, each doctor's
+bookings are kept sorted for the overlap check, and ``save()`` writes a
+JSON snapshot that the next run loads again.
+"""
+import json
+import os
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from repository import VERSION_CONFLICT
+
+DATETIME_FORMAT = "%d-%m-%Y %H:%M:%S"
+# Same rule as HospitalDatabase.has_overlapping_appointments
+SLOT_MINUTES = 30
+
+
+class MemoryStore:
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+        self.patients = {}
+        self.doctors = {}
+        self.appointments = {}
+        # doctor name -> sorted appointment datetimes
+        self._bookings = defaultdict(list)
+        self.dirty = False
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load()
+
+    def load(self):
+        with open(self.snapshot_path) as f:
+            data = json.load(f)
+        self.reset_all_data()
+        self.patients = {p['id']: p for p in data.get('patients', [])}
+        self.doctors = {d['id']: d for d in data.get('doctors', [])}
+        for appointment in data.get('appointments', []):
+            self._insert_appointment(appointment)
+        self.dirty = False
+
+    def save(self):
+        """Write the snapshot (atomically) if anything changed since the last save."""
+        if not self.snapshot_path or not self.dirty:
+            return
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                'patients': list(self.patients.values()),
+                'doctors': list(self.doctors.values()),
+                'appointments': list(self.appointments.values()),
+            }, f)
+        os.replace(tmp_path, self.snapshot_path)
+        self.dirty = False
+
+    def batch(self):
+        # Changes are only written by save(), so there is nothing to group
+        return nullcontext()
+
+    def _add(self, table, record):
+        if record['id'] in table:
+            raise ValueError(f"ID {record['id']} already exists")
+        table[record['id']] = {**record, 'version': 1}
+        self.dirty = True
+
+    def _update(self, table, record_id, updated_data, expected_version=None, kind="Record"):
+        current = table.get(record_id)
+        if current is None:
+            return False, f"{kind} not found"
+        version = current.get('version', 1)
+        if expected_version is not None and expected_version != version:
+            return False, VERSION_CONFLICT
+        table[record_id] = {**updated_data, 'id': record_id, 'version': version + 1}
+        self.dirty = True
+        return True, f"{kind} updated successfully"
+
+    def _delete(self, table, record_id):
+        if table.pop(record_id, None) is not None:
+            self.dirty = True
+
+    # Patients
+    def add_patient(self, patient_data):
+        self._add(self.patients, patient_data)
+
+    def get_all_patients(self):
+        return [dict(p) for p in self.patients.values()]
+
+    def get_patient_by_id(self, patient_id):
+        patient = self.patients.get(patient_id)
+        return dict(patient) if patient else None
+
+    def update_patient(self, patient_id, updated_data, expected_version=None):
+        return self._update(self.patients, patient_id, updated_data, expected_version, "Patient")
+
+    def delete_patient(self, patient_id):
+        self._delete(self.patients, patient_id)
+
+    # Doctors
+    def add_doctor(self, doctor_data):
+        self._add(self.doctors, doctor_data)
+
+    def get_all_doctors(self):
+        return [dict(d) for d in self.doctors.values()]
+
+    def get_doctor_by_id(self, doctor_id):
+        doctor = self.doctors.get(doctor_id)
+        return dict(doctor) if doctor else None
+
+    def update_doctor(self, doctor_id, updated_data, expected_version=None):
+        return self._update(self.doctors, doctor_id, updated_data, expected_version, "Doctor")
+
+    def delete_doctor(self, doctor_id):
+        self._delete(self.doctors, doctor_id)
+
+    # Appointments
+    def _insert_appointment(self, appointment):
+        self.appointments[appointment['id']] = {'version': 1, **appointment}
+        insort(self._bookings[appointment['doctorName']],
+               datetime.strptime(appointment['appointmentDateTime'], DATETIME_FORMAT))
+
+    def _remove_booking(self, appointment):
+        bookings = self._bookings[appointment['doctorName']]
+        del bookings[bisect_left(bookings, datetime.strptime(appointment['appointmentDateTime'], DATETIME_FORMAT))]
+
+    def has_overlapping_appointments(self, doctor_name, new_appointment_time):
+        new_time = datetime.strptime(new_appointment_time, DATETIME_FORMAT)
+        bookings = self._bookings.get(doctor_name, [])
+        i = bisect_right(bookings, new_time - timedelta(minutes=SLOT_MINUTES))
+        return i < len(bookings) and bookings[i] < new_time + timedelta(minutes=SLOT_MINUTES)
+
+    def add_appointment(self, appointment_data):
+        if appointment_data['id'] in self.appointments:
+            raise ValueError(f"ID {appointment_data['id']} already exists")
+        if self.has_overlapping_appointments(appointment_data['doctorName'],
+                                             appointment_data['appointmentDateTime']):
+            return False, "This time slot is already booked for the selected doctor"
+        self._insert_appointment({**appointment_data, 'version': 1})
+        self.dirty = True
+        return True, "Appointment scheduled successfully"
+
+    def get_all_appointments(self, include_archive=False):
+        return [dict(a) for a in self.appointments.values()]
+
+    def get_appointment_by_id(self, appointment_id):
+        appointment = self.appointments.get(appointment_id)
+        return dict(appointment) if appointment else None
+
+    def update_appointment(self, appointment_id, updated_data, expected_version=None):
+        current = self.appointments.get(appointment_id)
+        if current is None:
+            return False, "Appointment not found"
+        if expected_version is not None and expected_version != current['version']:
+            return False, VERSION_CONFLICT
+        self._remove_booking(current)
+        if self.has_overlapping_appointments(updated_data['doctorName'], updated_data['appointmentDateTime']):
+            self._insert_appointment(current)
+            return False, "This time slot is already booked for the selected doctor"
+        self._insert_appointment({**updated_data, 'id': appointment_id, 'version': current['version'] + 1})
+        self.dirty = True
+        return True, "Appointment updated successfully"
+
+    def delete_appointment(self, appointment_id):
+        current = self.appointments.pop(appointment_id, None)
+        if current is not None:
+            self._remove_booking(current)
+            self.dirty = True
+
+    def reset_all_data(self):
+        self.patients.clear()
+        self.doctors.clear()
+        self.appointments.clear()
+        self._bookings.clear()
+        self.dirty = True
@@ -0,0 +1,178 @@
+# profiling.py
+"""Opt-in profiling of Streamlit reruns.
+
+Set ``HOSPITAL_PROFILE=1`` to record wall-clock spans for every rerun, or
+``HOSPITAL_PROFILE=cprofile`` to also run cProfile.  One ``RerunProfiler``
+is shared by all sessions of the server process, so the numbers aggregate
+across users.  ``dump()`` writes:
+
+- ``spans.folded``: collapsed stacks (``rerun;Dashboard;show_dashboard 1234``,
+  self time in microseconds) for flamegraph.pl, speedscope or inferno
+- ``profile.pstats``: merged cProfile data for snakeviz / pstats
+- ``summary.json``: per-page rerun counts and latency percentiles
+"""
+import io
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+
+class RerunProfiler:
+    def __init__(self, use_cprofile=False, max_reruns=2000):
+        self.use_cprofile = use_cprofile
+        self.reruns = deque(maxlen=max_reruns)
+        self.skipped_cprofile = 0
+        self._stack_totals = defaultdict(float)
+        self._stack_counts = defaultdict(int)
+        self._pstats = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def rerun(self, page):
+        """Profile one top-to-bottom run of the script for ``page``."""
+        profile = None
+        if self.use_cprofile:
+            import cProfile
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another session's rerun holds the interpreter-wide profiler
+                profile = None
+                with self._lock:
+                    self.skipped_cprofile += 1
+        self._local.stack = ["rerun", page or "unknown"]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                self._add_span(("rerun", page or "unknown"), elapsed)
+                self.reruns.append({'page': page, 'duration_ms': elapsed * 1000, 'at': time.time()})
+                if profile is not None:
+                    if self._pstats is None:
+                        import pstats
+                        self._pstats = pstats.Stats(profile, stream=io.StringIO())
+                    else:
+                        self._pstats.add(profile)
+            self._local.stack = None
+
+    def in_rerun(self):
+        return getattr(self._local, 'stack', None) is not None
+
+    @contextmanager
+    def span(self, name):
+        """Time a named section nested inside the current rerun."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            yield
+            return
+        stack.append(name)
+        key = tuple(stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                self._add_span(key, elapsed)
+
+    def _add_span(self, key, elapsed):
+        self._stack_totals[key] += elapsed
+        self._stack_counts[key] += 1
+
+    def folded(self):
+        """Collapsed stacks with self time in microseconds."""
+        with self._lock:
+            totals = dict(self._stack_totals)
+        self_time = dict(totals)
+        for key, total in totals.items():
+            parent = key[:-1]
+            if parent in self_time:
+                self_time[parent] -= total
+        return "\n".join(
+            f"{';'.join(key)} {max(0, round(value * 1e6))}"
+            for key, value in sorted(self_time.items())
+        ) + "\n"
+
+    def summary(self):
+        with self._lock:
+            reruns = list(self.reruns)
+            spans = {
+                ";".join(key): {
+                    'calls': self._stack_counts[key],
+                    'total_ms': round(total * 1000, 3),
+                    'mean_ms': round(total * 1000 / self._stack_counts[key], 3),
+                }
+                for key, total in sorted(self._stack_totals.items())
+            }
+        pages = defaultdict(list)
+        for entry in reruns:
+            pages[entry['page']].append(entry['duration_ms'])
+        return {
+            'pages': {
+                str(page): {
+                    'reruns': len(durations),
+                    'mean_ms': round(sum(durations) / len(durations), 3),
+                    'p50_ms': round(_percentile(durations, 0.5), 3),
+                    'p95_ms': round(_percentile(durations, 0.95), 3),
+                    'max_ms': round(max(durations), 3),
+                }
+                for page, durations in pages.items()
+            },
+            'spans': spans,
+            'cprofile_skipped_reruns': self.skipped_cprofile,
+        }
+
+    def pstats_text(self, limit=40, sort="cumulative"):
+        with self._lock:
+            if self._pstats is None:
+                return ""
+            stream = io.StringIO()
+            self._pstats.stream = stream
+            self._pstats.sort_stats(sort).print_stats(limit)
+            return stream.getvalue()
+
+    def dump(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "spans.folded"), "w") as f:
+            f.write(self.folded())
+        with open(os.path.join(directory, "summary.json"), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        with self._lock:
+            if self._pstats is not None:
+                self._pstats.dump_stats(os.path.join(directory, "profile.pstats"))
+        return directory
+
+    def reset(self):
+        with self._lock:
+            self.reruns.clear()
+            self._stack_totals.clear()
+            self._stack_counts.clear()
+            self._pstats = None
+            self.skipped_cprofile = 0
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def profiler_from_env():
+    """Build a profiler from HOSPITAL_PROFILE, or None when profiling is off."""
+    mode = os.environ.get("HOSPITAL_PROFILE", "").lower()
+    if mode in ("", "0", "off", "false"):
+        return None
+    return RerunProfiler(use_cprofile=mode == "cprofile")
+
+
+def span(profiler, name):
+    return profiler.span(name) if profiler is not None else nullcontext()
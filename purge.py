@@ -0,0 +1,71 @@
+# purge.py
+"""Background purge of soft-deleted rows.
+
+Deletes in the app only mark rows with ``deleted_at``; this worker removes
+them later in small, paced batches (``HospitalDatabase.purge_deleted``) so a
+large cleanup never holds the write lock for long.
+
+    python purge.py                       # purge everything now
+    python purge.py --batch-size 200 --pause 0.1 --older-than 3600
+"""
+import argparse
+import logging
+import threading
+
+from database import PURGE_BATCH_SIZE, PURGE_PAUSE_SECONDS, HospitalDatabase
+
+logger = logging.getLogger("purge")
+
+PURGE_INTERVAL_SECONDS = 600
+
+
+class PurgeWorker:
+    """Runs ``db.purge_deleted`` every ``interval`` seconds on a daemon thread."""
+
+    def __init__(self, db, interval=PURGE_INTERVAL_SECONDS, batch_size=PURGE_BATCH_SIZE,
+                 pause=PURGE_PAUSE_SECONDS, older_than_seconds=0):
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.older_than_seconds = older_than_seconds
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="purge-worker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = self.db.purge_deleted(self.batch_size, self.pause, self.older_than_seconds)
+                self.last_error = None
+            except Exception as e:
+                # Any backend's errors (sqlite3, psycopg2, ...): keep the thread
+                # alive and try again next interval
+                logger.exception("Purge of soft-deleted rows failed")
+                self.last_error = str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove soft-deleted rows in paced batches")
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=PURGE_PAUSE_SECONDS, help="seconds between batches")
+    parser.add_argument("--older-than", type=float, default=0, help="only rows deleted this many seconds ago")
+    args = parser.parse_args()
+
+    db = HospitalDatabase(args.db)
+    purged = db.purge_deleted(args.batch_size, args.pause, args.older_than)
+    print("Purged " + ", ".join(f"{count} {table}" for table, count in purged.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# reminders.py
+"""Appointment reminders through a batched, rate-limited outbox.
+
+``ReminderDispatcher.queue_day`` copies the day's appointments into the
+``reminder_outbox`` table with one indexed range query, and
+``dispatch_pending`` drains the outbox in batches on a thread pool, sending
+each reminder to every sink with retry and a global rate limit.  Delivery
+is at least once: a retried reminder goes to every sink again.
+
+    python reminders.py                              # tomorrow, log sink
+    python reminders.py --date 25-12-2025 --sink file:reminders.jsonl --rate 20
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from database import HospitalDatabase
+
+logger = logging.getLogger("reminders")
+
+DISPATCH_BATCH_SIZE = 100
+DISPATCH_WORKERS = 8
+# Reminders per second across all workers
+DISPATCH_RATE = 50.0
+MAX_ATTEMPTS = 5
+
+
+class LogSink:
+    """Writes reminders to the ``reminders`` logger (for testing)."""
+
+    def send(self, reminder):
+        logger.info("Reminder for %s: appointment with %s at %s",
+                    reminder['patientName'], reminder['doctorName'], reminder['appointmentDateTime'])
+
+
+class FileSink:
+    """Appends reminders as JSON lines to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, reminder):
+        line = json.dumps({**reminder, 'sentAt': datetime.now().strftime("%d-%m-%Y %H:%M:%S")})
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class RateLimiter:
+    """Token bucket shared by all dispatch workers."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ReminderDispatcher:
+    def __init__(self, db, sinks, batch_size=DISPATCH_BATCH_SIZE, workers=DISPATCH_WORKERS,
+                 rate=DISPATCH_RATE, max_attempts=MAX_ATTEMPTS):
+        self.db = db
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.limiter = RateLimiter(rate) if rate else None
+        self.max_attempts = max_attempts
+        # One entry per dispatched batch: size, sent, failed, seconds, per_second
+        self.batches = []
+
+    def queue_day(self, day, kind='day_before'):
+        return self.db.enqueue_reminders(day, day, kind)
+
+    def _send(self, reminder):
+        if self.limiter:
+            self.limiter.acquire()
+        for sink in self.sinks:
+            sink.send(reminder)
+
+    def dispatch_batch(self, executor):
+        reminders = self.db.claim_reminders(self.batch_size)
+        if not reminders:
+            return None
+        start = time.perf_counter()
+        futures = [(reminder, executor.submit(self._send, reminder)) for reminder in reminders]
+        sent, failures = [], []
+        for reminder, future in futures:
+            error = future.exception()
+            if error is None:
+                sent.append(reminder['id'])
+            else:
+                logger.warning("Reminder %s failed: %s", reminder['id'], error)
+                failures.append((reminder['id'], reminder['attempts'], error))
+        self.db.complete_reminders(sent, failures, self.max_attempts)
+        elapsed = time.perf_counter() - start
+        stats = {
+            'size': len(reminders),
+            'sent': len(sent),
+            'failed': len(failures),
+            'seconds': elapsed,
+            'per_second': len(reminders) / elapsed if elapsed else float('inf'),
+        }
+        self.batches.append(stats)
+        return stats
+
+    def dispatch_pending(self):
+        """Send every due reminder; failed ones stay queued for a later retry."""
+        totals = {'batches': 0, 'sent': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reminder") as executor:
+            while True:
+                stats = self.dispatch_batch(executor)
+                if stats is None:
+                    break
+                totals['batches'] += 1
+                totals['sent'] += stats['sent']
+                totals['failed'] += stats['failed']
+        return totals
+
+
+def make_sink(spec):
+    if spec == "log":
+        return LogSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    raise ValueError(f"Unknown sink '{spec}' (use 'log' or 'file:PATH')")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue and send appointment reminders")
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--date", help="appointment day (dd-mm-YYYY), default tomorrow")
+    parser.add_argument("--sink", action="append", default=None, help="'log' or 'file:PATH' (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=DISPATCH_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DISPATCH_WORKERS)
+    parser.add_argument("--rate", type=float, default=DISPATCH_RATE, help="reminders per second, 0 = unlimited")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    day = datetime.strptime(args.date, "%d-%m-%Y").date() if args.date else date.today() + timedelta(days=1)
+    dispatcher = ReminderDispatcher(HospitalDatabase(args.db), [make_sink(s) for s in args.sink or ["log"]],
+                                    args.batch_size, args.workers, args.rate)
+    queued = dispatcher.queue_day(day)
+    totals = dispatcher.dispatch_pending()
+    throughput = [b['per_second'] for b in dispatcher.batches]
+    print(f"Queued {queued} reminders for {day.strftime('%d-%m-%Y')}; sent {totals['sent']}, "
+          f"failed {totals['failed']} in {totals['batches']} batches"
+          + (f" ({min(throughput):.0f}-{max(throughput):.0f}/s per batch)" if throughput else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+# reports.py
+"""Printable day sheets: one schedule per doctor plus a hospital summary.
+
+Doctors are split into chunks that a process pool renders in parallel.
+Each worker opens one read-only connection when it starts (``mode=ro``,
+the archive file attached the same way) and reuses it for every chunk,
+reading each doctor's day off the (doctor_name, appointment_ts) indexes as
+``get_doctor_schedule`` does.  Workers write their files and send back only
+per-doctor totals, from which the parent writes the summary.
+
+    python reports.py --db hospital.db                  # today, HTML
+    python reports.py --db hospital.db --date 02-03-2026 --format csv --out reports --workers 4
+
+HTML sheets carry print styles (one page per sheet), so printing them from
+a browser, or "Save as PDF", gives the PDF.
+"""
+import argparse
+import csv
+import html
+import io
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import quote
+
+from database import SORTABLE_FORMAT, HospitalDatabase
+
+FORMATS = ("html", "csv")
+REPORT_WORKERS = os.cpu_count() or 1
+# Chunks per worker: enough to even out doctors with long and short days
+CHUNKS_PER_WORKER = 4
+
+PRINT_STYLE = """
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #999; padding: 0.3em 0.6em; text-align: left; }
+th { background: #eee; }
+@media print { body { margin: 0; } }
+"""
+
+# Set in each worker process by _open_worker
+_worker_conn = None
+_worker_archive_table = None
+
+
+def _read_only_uri(path):
+    return f"file:{quote(os.path.abspath(path))}?mode=ro"
+
+
+def _open_worker(db_path, archive_path):
+    global _worker_conn, _worker_archive_table
+    _worker_conn = sqlite3.connect(_read_only_uri(db_path), uri=True)
+    _worker_archive_table = "appointments_archive"
+    if archive_path:
+        _worker_conn.execute("ATTACH DATABASE ? AS archive", (_read_only_uri(archive_path),))
+        _worker_archive_table = "archive.appointments_archive"
+
+
+def _close_worker():
+    global _worker_conn
+    if _worker_conn is not None:
+        _worker_conn.close()
+        _worker_conn = None
+
+
+def _day_rows(doctor_name, day):
+    """(start, appointment id, patient) of the doctor's day, live and archived"""
+    day_start = datetime.combine(day, datetime.min.time())
+    params = (doctor_name, day_start.strftime(SORTABLE_FORMAT), day_start.strftime("%Y-%m-%d 23:59:59"))
+    rows = _worker_conn.execute(f'''
+        SELECT appointment_ts, id, patient_name FROM appointments
+        WHERE doctor_name = ? AND appointment_ts BETWEEN ? AND ? AND deleted_at IS NULL
+        UNION ALL
+        SELECT appointment_ts, id, patient_name FROM {_worker_archive_table}
+        WHERE doctor_name = ? AND appointment_ts BETWEEN ? AND ?
+        ORDER BY 1
+    ''', params + params).fetchall()
+    return [(datetime.strptime(ts, SORTABLE_FORMAT), appointment_id, patient)
+            for ts, appointment_id, patient in rows]
+
+
+def render_html(doctor, day, rows):
+    slot = timedelta(minutes=doctor['slotMinutes'])
+    body = "".join(
+        f"<tr><td>{start:%H:%M}</td><td>{start + slot:%H:%M}</td>"
+        f"<td>{html.escape(patient)}</td><td>{html.escape(appointment_id)}</td></tr>\n"
+        for start, appointment_id, patient in rows
+    ) or '<tr><td colspan="4">No appointments</td></tr>\n'
+    name = html.escape(doctor['name'])
+    return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{name} {day:%d-%m-%Y}</title>"
+            f"<style>{PRINT_STYLE}</style></head><body>\n"
+            f"<h1>{name}</h1>\n<p>{html.escape(doctor['specialization'])} &middot; {day:%A %d-%m-%Y} &middot; "
+            f"{len(rows)} appointments</p>\n"
+            f"<table><tr><th>From</th><th>To</th><th>Patient</th><th>Appointment</th></tr>\n{body}</table>\n"
+            f"</body></html>\n")
+
+
+def render_csv(doctor, day, rows):
+    slot = timedelta(minutes=doctor['slotMinutes'])
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Date", "From", "To", "Patient", "Appointment"])
+    for start, appointment_id, patient in rows:
+        writer.writerow([day.strftime("%d-%m-%Y"), f"{start:%H:%M}", f"{start + slot:%H:%M}", patient, appointment_id])
+    return out.getvalue()
+
+
+RENDERERS = {"html": render_html, "csv": render_csv}
+
+
+def _render_chunk(doctors, day, out_dir, fmt):
+    """Runs in a worker: write the sheets of ``doctors`` -> [(doctor id, appointments, first, last)]"""
+    totals = []
+    for doctor in doctors:
+        rows = _day_rows(doctor['name'], day)
+        path = os.path.join(out_dir, f"{doctor['id']}.{fmt}")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(RENDERERS[fmt](doctor, day, rows))
+        totals.append((doctor['id'], len(rows), rows[0][0] if rows else None, rows[-1][0] if rows else None))
+    return totals
+
+
+def write_summary(doctors, totals, day, out_dir, fmt):
+    """The hospital summary: appointments per doctor and per specialization"""
+    by_id = {doctor['id']: doctor for doctor in doctors}
+    lines = sorted((by_id[doctor_id]['specialization'], by_id[doctor_id]['name'], doctor_id, count, first, last)
+                   for doctor_id, count, first, last in totals)
+    per_specialization = {}
+    for specialization, _, _, count, _, _ in lines:
+        per_specialization[specialization] = per_specialization.get(specialization, 0) + count
+    path = os.path.join(out_dir, f"summary.{fmt}")
+    if fmt == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Specialization", "Doctor", "Doctor ID", "Appointments", "First", "Last"])
+            for specialization, name, doctor_id, count, first, last in lines:
+                writer.writerow([specialization, name, doctor_id, count,
+                                 f"{first:%H:%M}" if first else "", f"{last:%H:%M}" if last else ""])
+        return path
+    rows = "".join(
+        f"<tr><td>{html.escape(specialization)}</td><td>{html.escape(name)}</td><td>{count}</td>"
+        f"<td>{f'{first:%H:%M}' if first else ''}</td><td>{f'{last:%H:%M}' if last else ''}</td></tr>\n"
+        for specialization, name, _, count, first, last in lines
+    )
+    specializations = "".join(f"<tr><td>{html.escape(specialization)}</td><td>{count}</td></tr>\n"
+                              for specialization, count in sorted(per_specialization.items()))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Summary {day:%d-%m-%Y}</title>"
+                f"<style>{PRINT_STYLE}</style></head><body>\n"
+                f"<h1>Hospital day summary</h1>\n<p>{day:%A %d-%m-%Y} &middot; "
+                f"{sum(per_specialization.values())} appointments with {len(lines)} doctors</p>\n"
+                f"<table><tr><th>Specialization</th><th>Appointments</th></tr>\n{specializations}</table>\n<br>\n"
+                f"<table><tr><th>Specialization</th><th>Doctor</th><th>Appointments</th><th>First</th>"
+                f"<th>Last</th></tr>\n{rows}</table>\n</body></html>\n")
+    return path
+
+
+def generate_reports(db, day, out_dir, fmt="html", workers=REPORT_WORKERS):
+    """Write every live doctor's sheet for ``day`` and the summary into ``out_dir``.
+
+    Returns {'day', 'reports', 'appointments', 'summary', 'seconds'}.
+    """
+    if fmt not in RENDERERS:
+        raise ValueError(f"Format must be one of {', '.join(FORMATS)}")
+    day = day if isinstance(day, date) else datetime.strptime(day, "%d-%m-%Y").date()
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    # Slot lengths come from the parent's availability cache; workers only read appointments
+    doctors = [{**doctor, 'slotMinutes': db.slots.slot_minutes(doctor['name'])} for doctor in db.get_all_doctors()]
+    chunk_size = max(1, -(-len(doctors) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [doctors[i:i + chunk_size] for i in range(0, len(doctors), chunk_size)]
+
+    totals = []
+    if workers > 1 and len(chunks) > 1:
+        # Imported here, as in dedup.scan: only the pool needs it
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_open_worker,
+                                 initargs=(db.db_name, db.archive_db)) as executor:
+            for chunk_totals in executor.map(_render_chunk, chunks, [day] * len(chunks),
+                                             [out_dir] * len(chunks), [fmt] * len(chunks)):
+                totals.extend(chunk_totals)
+    else:
+        _open_worker(db.db_name, db.archive_db)
+        try:
+            for chunk in chunks:
+                totals.extend(_render_chunk(chunk, day, out_dir, fmt))
+        finally:
+            _close_worker()
+
+    summary = write_summary(doctors, totals, day, out_dir, fmt)
+    return {
+        'day': day.strftime("%d-%m-%Y"),
+        'reports': len(totals),
+        'appointments': sum(count for _, count, _, _ in totals),
+        'summary': summary,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write printable day sheets for every doctor")
+    parser.add_argument("--db", default="hospital.db", help="SQLite database path")
+    parser.add_argument("--archive-db", help="archive database file, if the archive is kept apart")
+    parser.add_argument("--date", default=date.today().strftime("%d-%m-%Y"), help="day, dd-mm-YYYY (default: today)")
+    parser.add_argument("--format", choices=FORMATS, default="html")
+    parser.add_argument("--out", default="reports", help="directory; sheets go into a subdirectory per day")
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    args = parser.parse_args()
+
+    try:
+        day = datetime.strptime(args.date, "%d-%m-%Y").date()
+    except ValueError:
+        parser.error(f"--date must be dd-mm-YYYY, got {args.date}")
+    db = HospitalDatabase(args.db, archive_db=args.archive_db)
+    out_dir = os.path.join(args.out, day.strftime("%Y-%m-%d"))
+    result = generate_reports(db, day, out_dir, args.format, args.workers)
+    print(f"{result['reports']} day sheets with {result['appointments']} appointments in {out_dir} "
+          f"({result['seconds']:.2f}s); summary: {result['summary']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+# scheduler.py
+"""Book a batch of appointment requests in one pass.
+
+Each request names a patient, a doctor or a specialization, one or more
+preferred windows and a priority.  The planner reads the doctors, their
+working hours and the bookings already in the requested days once, builds a
+time-sorted list of free slots per doctor and per specialization, and
+assigns requests greedily: highest priority first, each to the earliest free
+slot in its first window that has one.  The plan is then booked in a single
+transaction (``db.batch()``), and requests that could not be placed are
+reported with the reason.
+
+    python scheduler.py --db hospital.db requests.jsonl
+    python scheduler.py --db hospital.db requests.csv --dry-run
+
+JSON lines look like
+{"patientName": "Asha", "specialization": "Cardiology", "priority": 2,
+ "windows": [["02-03-2026 09:00:00", "02-03-2026 12:00:00"]]}
+and CSV files have the columns patientName, specialization, doctorName,
+date (dd-mm-YYYY), from, to (HH:MM) and priority.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from functools import lru_cache
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from availability import DEFAULT_SLOT_MINUTES, parse_hhmm, slot_starts
+from database import DATETIME_FORMAT, HospitalDatabase
+from repository import open_database
+
+# Bookable hours of doctors without working hours of their own
+DEFAULT_HOURS = ("09:00", "17:00")
+
+
+@lru_cache(maxsize=4096)
+def _parse_datetime(value):
+    # Requests for one clinic day share a handful of window bounds, and strptime is slow
+    return datetime.strptime(value, DATETIME_FORMAT)
+
+
+def parse_request(request):
+    """Validate one request dict -> (patient, doctor, specialization, [(start, end)], priority, id)"""
+    patient = str(request.get('patientName') or "").strip()
+    doctor = str(request.get('doctorName') or "").strip() or None
+    specialization = str(request.get('specialization') or "").strip() or None
+    if not patient:
+        raise ValueError("Missing patientName")
+    if not (doctor or specialization):
+        raise ValueError("A request needs a doctorName or a specialization")
+    windows = []
+    for window in request.get('windows') or ():
+        start, end = (_parse_datetime(value) for value in window)
+        if end <= start:
+            raise ValueError(f"Window {window[0]} - {window[1]} ends before it starts")
+        windows.append((start, end))
+    if not windows:
+        raise ValueError("A request needs at least one window")
+    return patient, doctor, specialization, windows, int(request.get('priority') or 0), request.get('id')
+
+
+class FreeSlots:
+    """Free slot starts of a set of doctors, sorted by time."""
+
+    def __init__(self, doctors):
+        self.doctors = doctors
+        self.slots = []
+
+    def take(self, window_start, window_end, taken):
+        """Remove and return the earliest free (start, doctor, minutes) that fits the window."""
+        i = bisect_left(self.slots, (window_start,))
+        while i < len(self.slots):
+            start, doctor_name, minutes = slot = self.slots[i]
+            if start + timedelta(minutes=minutes) > window_end:
+                if start >= window_end:
+                    break
+                i += 1
+                continue
+            if (doctor_name, start) in taken:
+                # Already assigned through another pool
+                del self.slots[i]
+                continue
+            del self.slots[i]
+            return slot
+        return None
+
+
+class ClinicDayPlanner:
+    """Plans requests against one database; ``plan`` reads, ``book`` writes."""
+
+    def __init__(self, db, default_hours=DEFAULT_HOURS, now=None):
+        self.db = db
+        self.default_hours = tuple(parse_hhmm(value) for value in default_hours)
+        self.now = now or datetime.now()
+
+    def _slot_minutes(self, doctor_name):
+        if isinstance(self.db, HospitalDatabase):
+            return self.db.slots.slot_minutes(doctor_name)
+        return DEFAULT_SLOT_MINUTES
+
+    def _day_starts(self, doctor_name, day, minutes):
+        """Minutes after midnight at which ``doctor_name`` may start a booking on ``day``"""
+        if isinstance(self.db, HospitalDatabase):
+            mask = self.db.slots.day_mask(doctor_name, day)
+            if mask is not None:
+                return slot_starts(mask)
+        first, last = self.default_hours
+        return range(first, last - minutes + 1, minutes)
+
+    def _doctor_slots(self, doctor_name, days, bookings):
+        minutes = self._slot_minutes(doctor_name)
+        slot = timedelta(minutes=minutes)
+        booked = bookings.get(doctor_name, [])
+        for day in days:
+            midnight = datetime.combine(day, datetime.min.time())
+            for minute in self._day_starts(doctor_name, day, minutes):
+                start = midnight + timedelta(minutes=minute)
+                if start <= self.now:
+                    continue
+                # Same rule as has_overlapping_appointments: nothing less than a slot either side
+                i = bisect_left(booked, start - slot + timedelta(microseconds=1))
+                if i < len(booked) and booked[i] < start + slot:
+                    continue
+                yield start, minutes
+
+    def plan(self, requests, id_prefix=None):
+        """-> (appointments, unplaced) with appointments as app-style dicts and
+        unplaced as (request index, reason)."""
+        id_prefix = id_prefix or f"PLAN-{self.now.strftime('%Y%m%d%H%M%S')}-"
+        parsed, unplaced = {}, []
+        for index, request in enumerate(requests):
+            try:
+                parsed[index] = parse_request(request)
+            except (TypeError, ValueError) as e:
+                unplaced.append((index, str(e)))
+        if not parsed:
+            return [], unplaced
+
+        first_day = min(start for p in parsed.values() for start, _ in p[3]).date()
+        last_day = max(end for p in parsed.values() for _, end in p[3]).date()
+        days = [first_day + timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+        bookings = defaultdict(list)
+        # From the day before: a late booking can still clash with the first slot
+        for appointment in self.db.get_appointments_in_range(first_day - timedelta(days=1), last_day):
+            bookings[appointment['doctorName']].append(
+                datetime.strptime(appointment['appointmentDateTime'], DATETIME_FORMAT))
+        for booked in bookings.values():
+            booked.sort()
+
+        doctors = self.db.get_all_doctors()
+        by_specialization = defaultdict(list)
+        for doctor in doctors:
+            by_specialization[doctor['specialization'].lower()].append(doctor['name'])
+        known_doctors = {doctor['name'] for doctor in doctors}
+
+        # One pool per doctor or specialization that a request asks for
+        pools = {}
+        for patient, doctor, specialization, windows, priority, _ in parsed.values():
+            key = ('doctor', doctor) if doctor else ('specialization', specialization.lower())
+            if key in pools:
+                continue
+            if doctor:
+                names = [doctor] if doctor in known_doctors else []
+            else:
+                names = by_specialization.get(key[1], [])
+            pool = pools[key] = FreeSlots(names)
+            for name in names:
+                pool.slots.extend((start, name, minutes)
+                                  for start, minutes in self._doctor_slots(name, days, bookings))
+            pool.slots.sort()
+
+        appointments = []
+        taken = set()
+        for index in sorted(parsed, key=lambda i: (-parsed[i][4], i)):
+            patient, doctor, specialization, windows, priority, request_id = parsed[index]
+            pool = pools[('doctor', doctor) if doctor else ('specialization', specialization.lower())]
+            slot = None
+            for window_start, window_end in windows:
+                slot = pool.take(window_start, window_end, taken)
+                if slot:
+                    break
+            if slot is None:
+                if pool.doctors:
+                    reason = "No free slot in the requested windows"
+                elif doctor:
+                    reason = f"Unknown doctor '{doctor}'"
+                else:
+                    reason = f"No doctor with specialization '{specialization}'"
+                unplaced.append((index, reason))
+                continue
+            start, doctor_name, _ = slot
+            taken.add((doctor_name, start))
+            appointments.append({
+                'id': request_id or f"{id_prefix}{index + 1}",
+                'patientName': patient,
+                'doctorName': doctor_name,
+                'appointmentDateTime': start.strftime(DATETIME_FORMAT),
+                'request': index,
+            })
+        return appointments, sorted(unplaced)
+
+    def book(self, appointments):
+        """Book a plan in one transaction -> (booked, [(request index, reason)])
+
+        Slots taken by someone else since the plan was made are reported, not
+        booked; anything raising (e.g. a duplicate ID) rolls the whole plan back.
+        """
+        booked, failed = [], []
+        with self.db.batch():
+            for appointment in appointments:
+                record = {k: v for k, v in appointment.items() if k != 'request'}
+                ok, message = self.db.add_appointment(record)
+                if ok:
+                    booked.append(appointment)
+                else:
+                    failed.append((appointment['request'], message))
+        return booked, failed
+
+    def schedule(self, requests, dry_run=False):
+        """Plan and (unless ``dry_run``) book; returns a summary dict."""
+        start = time.perf_counter()
+        appointments, unplaced = self.plan(requests)
+        planned_at = time.perf_counter()
+        if not dry_run:
+            appointments, failed = self.book(appointments)
+            unplaced = sorted(unplaced + failed)
+        return {
+            'requests': len(requests),
+            'placed': appointments,
+            'unplaced': unplaced,
+            'plan_ms': (planned_at - start) * 1000,
+            'book_ms': (time.perf_counter() - planned_at) * 1000,
+        }
+
+
+def requests_from_csv(lines):
+    """Request dicts from CSV lines (one window per row)."""
+    return [{
+        'patientName': row.get('patientName'),
+        'doctorName': row.get('doctorName'),
+        'specialization': row.get('specialization'),
+        'priority': row.get('priority') or 0,
+        'windows': [(f"{row['date']} {row['from']}:00", f"{row['date']} {row['to']}:00")],
+    } for row in csv.DictReader(lines)]
+
+
+def read_requests(path):
+    """Requests from a .csv file or JSON lines ('-' reads JSON lines from stdin)."""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            return requests_from_csv(f)
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        return [json.loads(line) for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign a batch of appointment requests to doctors and slots")
+    parser.add_argument("requests", help="JSON lines or .csv file of requests ('-' for stdin)")
+    parser.add_argument("--db", help="database path or URL (default: HOSPITAL_DB_URL or hospital.db)")
+    parser.add_argument("--dry-run", action="store_true", help="plan and report without booking")
+    args = parser.parse_args()
+
+    requests = read_requests(args.requests)
+    result = ClinicDayPlanner(open_database(args.db)).schedule(requests, dry_run=args.dry_run)
+    verb = "Planned" if args.dry_run else "Booked"
+    print(f"{verb} {len(result['placed'])} of {result['requests']} requests "
+          f"(plan {result['plan_ms']:.0f} ms, book {result['book_ms']:.0f} ms)")
+    for index, reason in result['unplaced']:
+        print(f"  request {index + 1}: {reason}")
+    sys.exit(1 if result['unplaced'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# seed_data.py
+"""Deterministic synthetic data for demos and benchmarks.
+
+The same seed always produces the same patients, doctors and appointments,
+so benchmark runs on different commits operate on identical databases.
+"""
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+from database import to_sortable
+from repository import open_database
+
+DATETIME_FORMAT = "%d-%m-%Y %H:%M:%S"
+
+# Specialization -> conditions typically referred to it
+SPECIALIZATIONS = {
+    "Cardiology": ["Hypertension", "Arrhythmia", "Coronary Artery Disease", "Heart Failure"],
+    "Dermatology": ["Eczema", "Psoriasis", "Acne", "Dermatitis"],
+    "Endocrinology": ["Diabetes", "Hypothyroidism", "Hyperthyroidism"],
+    "Gastroenterology": ["Gastritis", "IBS", "Ulcer", "Hepatitis"],
+    "General Medicine": ["Fever", "Influenza", "Viral Infection", "Fatigue"],
+    "Neurology": ["Migraine", "Epilepsy", "Neuropathy", "Vertigo"],
+    "Orthopedics": ["Fracture", "Arthritis", "Back Pain", "Sprain"],
+    "Pediatrics": ["Common Cold", "Chickenpox", "Asthma", "Ear Infection"],
+    "Psychiatry": ["Anxiety", "Depression", "Insomnia"],
+    "Pulmonology": ["Asthma", "COPD", "Bronchitis", "Pneumonia"],
+}
+
+# Relative share of doctors per specialization (general medicine dominates)
+SPECIALIZATION_WEIGHTS = {
+    "Cardiology": 8, "Dermatology": 5, "Endocrinology": 4, "Gastroenterology": 5,
+    "General Medicine": 30, "Neurology": 5, "Orthopedics": 10, "Pediatrics": 15,
+    "Psychiatry": 6, "Pulmonology": 6,
+}
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Amit", "Ananya", "Arjun", "Diya", "Emma", "Farhan", "Gita", "Hemant",
+    "Isha", "James", "Kabir", "Kavya", "Liam", "Maya", "Meera", "Neha", "Nikhil", "Olivia",
+    "Priya", "Rahul", "Riya", "Rohan", "Sana", "Sara", "Shreya", "Sofia", "Tara", "Vikram",
+]
+LAST_NAMES = [
+    "Agarwal", "Bose", "Brown", "Chopra", "Das", "Gupta", "Iyer", "Jain", "Joshi", "Kapoor",
+    "Khan", "Kumar", "Mehta", "Nair", "Patel", "Rao", "Rathore", "Reddy", "Shah", "Sharma",
+    "Singh", "Smith", "Verma", "Williams",
+]
+STREETS = ["MG Road", "Park Street", "Station Road", "Lake View", "Hill Road", "Main Street", "Civil Lines"]
+CITIES = ["Jaipur", "Delhi", "Mumbai", "Pune", "Bengaluru", "Kolkata", "Chennai"]
+GENDERS = ["Male", "Female", "Other"]
+GENDER_WEIGHTS = [48, 48, 4]
+
+# Clinic runs 09:00-17:00 in 30 minute slots; mornings are busier
+CLINIC_SLOTS = [(9 + i // 2, 30 * (i % 2)) for i in range(16)]
+SLOT_WEIGHTS = [10, 10, 9, 9, 8, 8, 5, 4, 6, 6, 6, 5, 5, 4, 3, 2]
+# Monday..Sunday
+WEEKDAY_WEIGHTS = [10, 9, 9, 9, 8, 4, 1]
+
+# Named scales used by the benchmark suite: appointments, patients, doctors
+SCALES = {
+    "10k": (10_000, 5_000, 20),
+    "100k": (100_000, 50_000, 100),
+    "1m": (1_000_000, 500_000, 500),
+    "10m": (10_000_000, 5_000_000, 2_000),
+}
+
+BATCH_SIZE = 10_000
+CALENDAR_START = date(2024, 1, 1)
+
+
+def _person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def patient_name(index, seed=42):
+    # Derived from the index alone so appointments can reference patients
+    # without holding millions of names in memory
+    h = (index * 2654435761 + seed * 40503) & 0xFFFFFFFF
+    return f"{FIRST_NAMES[h % len(FIRST_NAMES)]} {LAST_NAMES[(h >> 8) % len(LAST_NAMES)]} {index + 1}"
+
+
+def generate_doctors(count, seed=42):
+    rng = random.Random(f"doctors-{seed}")
+    specializations = list(SPECIALIZATION_WEIGHTS)
+    weights = list(SPECIALIZATION_WEIGHTS.values())
+    for i in range(count):
+        # Guarantee every specialization is staffed before sampling by weight
+        if i < len(specializations):
+            specialization = specializations[i]
+        else:
+            specialization = rng.choices(specializations, weights)[0]
+        yield {
+            'id': f"D{i + 1:06d}",
+            # Suffix keeps names unique; appointments reference doctors by name
+            'name': f"Dr. {_person_name(rng)} {i + 1}",
+            'specialization': specialization,
+            'experience': min(40, int(rng.expovariate(1 / 10))),
+        }
+
+
+def generate_patients(count, seed=42, start=None, days=365):
+    rng = random.Random(f"patients-{seed}")
+    start = start or datetime(2024, 1, 1)
+    conditions = [c for values in SPECIALIZATIONS.values() for c in values]
+    for i in range(count):
+        admitted = start + timedelta(seconds=rng.randrange(days * 86400))
+        yield {
+            'id': f"P{i + 1:08d}",
+            'name': patient_name(i, seed),
+            'age': min(100, max(0, int(rng.gauss(42, 20)))),
+            'gender': rng.choices(GENDERS, GENDER_WEIGHTS)[0],
+            'address': f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}",
+            'disease': rng.choice(conditions),
+            'REFERRED_BY': rng.choice(["", "Self", f"Dr. {rng.choice(LAST_NAMES)}"]),
+            'admissionDateTime': admitted.strftime(DATETIME_FORMAT),
+        }
+
+
+def calendar_days(count, doctor_count):
+    # Sized so the clinic is roughly one third full
+    return max(7, -(-3 * count // (doctor_count * len(CLINIC_SLOTS))))
+
+
+def generate_appointments(count, patient_count, doctor_count, seed=42, start=None):
+    """Yield appointments that never overlap for the same doctor.
+
+    Doctors get a skewed share of bookings (a few are much busier), days are
+    weighted towards weekdays and slots towards mornings.
+    """
+    rng = random.Random(f"appointments-{seed}")
+    start = start or CALENDAR_START
+    slots_per_day = len(CLINIC_SLOTS)
+    days = calendar_days(count, doctor_count)
+    doctor_names = [d['name'] for d in generate_doctors(doctor_count, seed)]
+    doctor_weights = [1 / (rank + 1) ** 0.5 for rank in range(doctor_count)]
+    day_weights = [WEEKDAY_WEIGHTS[(start + timedelta(days=d)).weekday()] for d in range(days)]
+    taken = bytearray(doctor_count * days * slots_per_day)
+
+    produced = 0
+    batch = 256
+    while produced < count:
+        doctors = rng.choices(range(doctor_count), doctor_weights, k=batch)
+        day_offsets = rng.choices(range(days), day_weights, k=batch)
+        slots = rng.choices(range(slots_per_day), SLOT_WEIGHTS, k=batch)
+        for doctor, day, slot in zip(doctors, day_offsets, slots):
+            key = (doctor * days + day) * slots_per_day + slot
+            if taken[key]:
+                continue
+            taken[key] = 1
+            hour, minute = CLINIC_SLOTS[slot]
+            when = datetime.combine(start + timedelta(days=day), datetime.min.time()).replace(
+                hour=hour, minute=minute)
+            produced += 1
+            yield {
+                'id': f"A{produced:09d}",
+                'patientName': patient_name(rng.randrange(patient_count), seed),
+                'doctorName': doctor_names[doctor],
+                'appointmentDateTime': when.strftime(DATETIME_FORMAT),
+            }
+            if produced == count:
+                return
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed_database(db, appointments, patients, doctors, seed=42):
+    """Bulk-load synthetic data into ``db`` and return the row counts.
+
+    Rows go in through ``db.bulk_insert`` in large transactions; calling
+    ``add_*`` per row would take hours at the 10M scale.
+    """
+    for chunk in _chunks(generate_doctors(doctors, seed), BATCH_SIZE):
+        db.bulk_insert('doctors', ('id', 'name', 'specialization', 'experience'),
+                       [(d['id'], d['name'], d['specialization'], d['experience']) for d in chunk])
+    for chunk in _chunks(generate_patients(patients, seed), BATCH_SIZE):
+        db.bulk_insert('patients', ('id', 'name', 'age', 'gender', 'address', 'disease', 'referred_by',
+                                    'admission_datetime'),
+                       [(p['id'], p['name'], p['age'], p['gender'], p['address'], p['disease'],
+                         p['REFERRED_BY'], p['admissionDateTime']) for p in chunk])
+    for chunk in _chunks(generate_appointments(appointments, patients, doctors, seed), BATCH_SIZE):
+        db.bulk_insert('appointments', ('id', 'patient_name', 'doctor_name', 'appointment_datetime',
+                                        'appointment_ts'),
+                       [(a['id'], a['patientName'], a['doctorName'], a['appointmentDateTime'],
+                         to_sortable(a['appointmentDateTime'])) for a in chunk])
+    return {'appointments': appointments, 'patients': patients, 'doctors': doctors}
+
+
+def seed_demo_data(db, seed=42):
+    """Small data set for the Dashboard's demo seeder."""
+    return seed_database(db, appointments=30, patients=15, doctors=10, seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Populate a hospital database with synthetic data")
+    parser.add_argument("--db", default="hospital.db", help="SQLite file or database URL to populate")
+    parser.add_argument("--scale", choices=sorted(SCALES), help="named scale (appointments/patients/doctors)")
+    parser.add_argument("--appointments", type=int, default=30)
+    parser.add_argument("--patients", type=int, default=15)
+    parser.add_argument("--doctors", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.scale:
+        args.appointments, args.patients, args.doctors = SCALES[args.scale]
+    counts = seed_database(open_database(args.db), args.appointments, args.patients,
+                           args.doctors, args.seed)
+    print(f"Seeded {args.db}: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
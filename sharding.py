@@ -0,0 +1,209 @@
+# sharding.py
+"""One SQLite file per hospital, behind a single router.
+
+Each hospital (or branch) key maps to ``<directory>/<key>.db``, so a busy
+branch only ever holds its own write lock.  Shards keep a small pool of
+open connections, and cross-hospital reads fan out on a thread pool (sqlite3
+releases the GIL while a query runs) and are merged here.
+
+    python sharding.py --dir shards seed --hospitals north,south --scale 10k
+    python sharding.py --dir shards list
+    python sharding.py --dir shards search Cardiology
+"""
+import argparse
+import glob
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database import HospitalDatabase, to_sortable
+
+SHARD_POOL_SIZE = 4
+FANOUT_WORKERS = 8
+HOSPITAL_KEY = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class _PooledConnection(sqlite3.Connection):
+    """Connection whose close() hands it back to its pool."""
+
+    pool = None
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        self.pool.release(self)
+
+
+class ConnectionPool:
+    """Up to ``size`` connections to one file, created on demand."""
+
+    def __init__(self, path, size=SHARD_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        # Used by one thread at a time, but not always the one that opened it
+        conn = sqlite3.connect(self.path, factory=_PooledConnection, check_same_thread=False)
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            sqlite3.Connection.close(conn)
+            with self._lock:
+                self._created -= 1
+
+
+class ShardDatabase(HospitalDatabase):
+    """HospitalDatabase for one hospital, reusing pooled connections."""
+
+    def __init__(self, hospital, db_name, pool_size=SHARD_POOL_SIZE, **options):
+        self.hospital = hospital
+        self.pool = ConnectionPool(db_name, pool_size)
+        super().__init__(db_name, **options)
+
+    def _connect(self, factory=None):
+        if factory is not None:
+            # batch() and instrumentation need connections of their own class
+            return super()._connect(factory)
+        return self.pool.acquire()
+
+
+class ShardRouter:
+    """Maps hospital keys to shards and merges cross-hospital queries."""
+
+    def __init__(self, directory="shards", pool_size=SHARD_POOL_SIZE, workers=FANOUT_WORKERS, **db_options):
+        self.directory = directory
+        self.pool_size = pool_size
+        self.workers = workers
+        # Passed to every shard's HospitalDatabase (instrument, slow_query_ms, ...)
+        self.db_options = db_options
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        os.makedirs(directory, exist_ok=True)
+
+    def shard_path(self, hospital):
+        if not HOSPITAL_KEY.match(hospital or ""):
+            raise ValueError(f"Invalid hospital key '{hospital}' (use letters, digits, '-' and '_')")
+        return os.path.join(self.directory, f"{hospital}.db")
+
+    def shard(self, hospital):
+        """The database for one hospital, created on first use."""
+        db = self._shards.get(hospital)
+        if db is None:
+            path = self.shard_path(hospital)
+            with self._lock:
+                db = self._shards.get(hospital)
+                if db is None:
+                    db = ShardDatabase(hospital, path, self.pool_size, **self.db_options)
+                    self._shards[hospital] = db
+        return db
+
+    def hospitals(self):
+        """Keys of every shard in the directory or opened by this router."""
+        found = {os.path.basename(p)[:-3] for p in glob.glob(os.path.join(self.directory, "*.db"))}
+        return sorted({h for h in found if HOSPITAL_KEY.match(h)} | set(self._shards))
+
+    def fan_out(self, method, *args, hospitals=None, **kwargs):
+        """Call a HospitalDatabase method on every shard in parallel -> {hospital: result}"""
+        hospitals = list(hospitals) if hospitals is not None else self.hospitals()
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shard")
+        futures = {
+            hospital: self._executor.submit(lambda h=hospital: getattr(self.shard(h), method)(*args, **kwargs))
+            for hospital in hospitals
+        }
+        return {hospital: future.result() for hospital, future in futures.items()}
+
+    def _merge(self, results):
+        merged = []
+        for hospital, rows in results.items():
+            merged.extend({**row, 'hospital': hospital} for row in rows)
+        return merged
+
+    def search_doctors_by_specialization(self, specialization, hospitals=None):
+        """Doctors with this specialization across hospitals, most experienced first"""
+        results = self.fan_out('search_doctors_by_specialization', specialization, hospitals=hospitals)
+        return sorted(self._merge(results), key=lambda d: (-d['experience'], d['name'], d['hospital']))
+
+    def get_all_doctors(self, hospitals=None):
+        return self._merge(self.fan_out('get_all_doctors', hospitals=hospitals))
+
+    def get_appointments_in_range(self, start, end, doctor_name=None, hospitals=None):
+        results = self.fan_out('get_appointments_in_range', start, end, doctor_name, hospitals=hospitals)
+        return sorted(self._merge(results), key=lambda a: to_sortable(a['appointmentDateTime']))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        with self._lock:
+            for db in self._shards.values():
+                db.pool.close_all()
+            self._shards.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-hospital SQLite shards")
+    parser.add_argument("--dir", default="shards", help="directory holding <hospital>.db files")
+    parser.add_argument("--workers", type=int, default=FANOUT_WORKERS)
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed_cmd = commands.add_parser("seed", help="seed synthetic data into one shard per hospital")
+    seed_cmd.add_argument("--hospitals", required=True, help="comma separated hospital keys")
+    seed_cmd.add_argument("--scale", default="10k")
+    seed_cmd.add_argument("--seed", type=int, default=42)
+    commands.add_parser("list", help="list shards and their sizes")
+    commands.add_parser("search", help="doctors by specialization across shards").add_argument("specialization")
+    args = parser.parse_args()
+
+    router = ShardRouter(args.dir, workers=args.workers)
+    try:
+        if args.command == "seed":
+            from seed_data import SCALES, seed_database
+            appointments, patients, doctors = SCALES[args.scale]
+            for i, hospital in enumerate(h.strip() for h in args.hospitals.split(",") if h.strip()):
+                seed_database(router.shard(hospital), appointments, patients, doctors, args.seed + i)
+                print(f"Seeded {hospital} ({args.scale})")
+        elif args.command == "list":
+            for hospital in router.hospitals():
+                print(f"{hospital:<20} {os.path.getsize(router.shard_path(hospital)) / 1e6:8.1f} MB")
+        elif args.command == "search":
+            start = time.perf_counter()
+            doctors = router.search_doctors_by_specialization(args.specialization)
+            for doctor in doctors:
+                print(f"{doctor['hospital']:<16} {doctor['id']:<12} {doctor['name']:<32} {doctor['experience']} yrs")
+            print(f"{len(doctors)} doctors across {len(router.hospitals())} hospitals "
+                  f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        router.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# table_cache.py
+"""Whole-table reads cached per process and kept coherent across processes.
+
+Several app processes can share one SQLite file, so a cached
+``get_all_patients()`` would go stale when another process writes.  Triggers
+stamp every write to a table in ``table_versions`` (see
+``HospitalDatabase._add_table_versions``), and each process keeps one
+long-lived connection that polls ``PRAGMA data_version``: that pragma only
+changes when some other connection committed, and reading it touches no
+table, so an unchanged database costs one pragma per read.  When it changed,
+the process re-reads ``table_versions`` and drops only the results built on
+tables whose version moved.
+
+With ``max_staleness`` > 0 the pragma is polled at most that often, so a
+result may be up to that many seconds old; with 0 every read checks.
+"""
+import sqlite3
+import threading
+import time
+
+
+class TableCache:
+    """``connect()`` opens a connection to the database being cached."""
+
+    def __init__(self, connect, max_staleness=0.0):
+        self.connect = connect
+        self.max_staleness = max_staleness
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._data_version = None
+        self._versions = {}
+        self._checked_at = 0.0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = {}
+            self._data_version = None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._entries = {}
+            self._data_version = None
+
+    def _refresh_versions(self):
+        # Caller holds self._lock
+        now = time.monotonic()
+        if self._data_version is not None and now - self._checked_at < self.max_staleness:
+            return
+        if self._conn is None:
+            self._conn = self.connect()
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._data_version:
+            self._versions = dict(self._conn.execute('SELECT table_name, version FROM table_versions'))
+            self._data_version = data_version
+        self._checked_at = now
+
+    def versions(self):
+        """Current {table: version}, as seen within ``max_staleness``."""
+        with self._lock:
+            self._refresh_versions()
+            return dict(self._versions)
+
+    def read(self, key, tables, load):
+        """Rows from ``load()``, reused until one of ``tables`` is written.
+
+        Returns fresh dict copies, so callers may modify what they get.
+        """
+        with self._lock:
+            try:
+                self._refresh_versions()
+            except sqlite3.OperationalError:
+                # Locked or mid-migration: read through rather than fail
+                self._data_version = None
+                return load()
+            stamp = tuple(self._versions.get(table) for table in tables)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                return [dict(row) for row in entry[1]]
+        # Loaded outside the lock; a write racing with the load at worst
+        # stores rows under the older stamp, which the next read replaces
+        rows = load()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (stamp, rows)
+        return [dict(row) for row in rows]
@@ -0,0 +1,194 @@
+# triage.py
+"""Walk-in triage queues with live wait-time estimates.
+
+Walk-ins wait per specialization, most severe first (1 = resuscitation ...
+5 = non-urgent, as in the Emergency Severity Index) and then in order of
+arrival.  The queues are kept in this process as one sorted list per
+specialization and updated in place on every arrival, call-in, finish and
+departure, so the board never re-reads the ``triage_queue`` table.  Triggers
+stamp each write to that table in ``table_versions``; a write this process
+did not make shows up as an unexpected version, and the queues are reloaded.
+
+Wait times are estimated by playing the queue forward over the doctors on
+duty: a doctor seeing a walk-in is free once that consultation should end,
+booked appointments are stepped around, nobody is started after the end of
+the doctor's shift, and each waiting patient in turn goes to whichever
+doctor can see them first.  A consultation is assumed to last the
+specialization's moving average, which each finished consultation updates.
+"""
+import heapq
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+SEVERITY_LEVELS = {1: "Resuscitation", 2: "Emergent", 3: "Urgent", 4: "Less urgent", 5: "Non-urgent"}
+# Assumed length of a consultation until a specialization has finished ones
+DEFAULT_CONSULT_MINUTES = 15
+# Weight of the latest consultation in the moving average
+DURATION_SMOOTHING = 0.2
+# Finished consultations per specialization that seed the average on load
+DURATION_HISTORY = 20
+
+
+def after_bookings(start, length, booked):
+    """Earliest time from ``start`` when ``length`` fits between the sorted (start, end) ``booked``."""
+    for booked_start, booked_end in booked:
+        if booked_end <= start:
+            continue
+        if booked_start >= start + length:
+            break
+        start = booked_end
+    return start
+
+
+def estimate_starts(count, doctors, now, length):
+    """Expected start of each of the next ``count`` walk-ins, or None past every shift.
+
+    ``doctors`` maps a doctor to (free from, end of shift, booked (start, end) sorted).
+    """
+    free = [(max(free_from, now), name) for name, (free_from, _, _) in doctors.items()]
+    heapq.heapify(free)
+    starts = []
+    while len(starts) < count and free:
+        free_from, name = heapq.heappop(free)
+        _, shift_end, booked = doctors[name]
+        start = after_bookings(free_from, length, booked)
+        if start >= shift_end:
+            continue
+        if start > free_from:
+            # Another doctor may now be free sooner
+            heapq.heappush(free, (start, name))
+            continue
+        starts.append(start)
+        heapq.heappush(free, (start + length, name))
+    return starts + [None] * (count - len(starts))
+
+
+class TriageQueue:
+    """``loader()`` returns (version, active entries, {specialization: minutes
+    of recent consultations, oldest first}).  Entries are dicts with 'id',
+    'patientName', 'specialization', 'severity', 'arrivedAt', 'status'
+    ('waiting' or 'in_consultation'), 'doctorName' and 'startedAt'.
+
+    Writers pass the table version read before and after their write; a
+    queue that had not seen ``before`` drops its state instead of applying it.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.version = None
+        self._entries = None
+        self._waiting = {}
+        self._average = {}
+
+    def invalidate(self):
+        self.version = None
+        self._entries = None
+        self._waiting = {}
+        self._average = {}
+
+    def _load(self):
+        self._entries = {}
+        self._waiting = {}
+        self._average = {}
+        self.version, entries, durations = self.loader()
+        for entry in entries:
+            self._push(entry)
+        for specialization, minutes in durations.items():
+            for value in minutes:
+                self._record(specialization, value)
+
+    def ensure_current(self, version):
+        """Load on first use, or reload when another process wrote since."""
+        if self._entries is None or version != self.version:
+            self._load()
+
+    def _advance(self, before, after):
+        if self._entries is None or self.version != before:
+            self.invalidate()
+            return False
+        self.version = after
+        return True
+
+    @staticmethod
+    def _key(entry):
+        return (entry['severity'], entry['arrivedAt'], entry['id'])
+
+    def _push(self, entry):
+        self._entries[entry['id']] = entry
+        if entry['status'] == 'waiting':
+            insort(self._waiting.setdefault(entry['specialization'].lower(), []), self._key(entry))
+
+    def _unqueue(self, entry):
+        waiting = self._waiting.get(entry['specialization'].lower(), [])
+        i = bisect_left(waiting, self._key(entry))
+        if i < len(waiting) and waiting[i] == self._key(entry):
+            del waiting[i]
+
+    def _record(self, specialization, minutes):
+        key = specialization.lower()
+        if key in self._average:
+            self._average[key] += DURATION_SMOOTHING * (minutes - self._average[key])
+        else:
+            self._average[key] = float(minutes)
+
+    def average_minutes(self, specialization):
+        return self._average.get(specialization.lower(), DEFAULT_CONSULT_MINUTES)
+
+    def add(self, entry, before, after):
+        if self._advance(before, after):
+            self._push(entry)
+
+    def started(self, entry_id, doctor_name, started_at, before, after):
+        if self._advance(before, after):
+            entry = self._entries[entry_id]
+            self._unqueue(entry)
+            entry.update(status='in_consultation', doctorName=doctor_name, startedAt=started_at)
+
+    def finished(self, entry_id, finished_at, before, after):
+        if self._advance(before, after):
+            entry = self._entries.pop(entry_id)
+            self._record(entry['specialization'], (finished_at - entry['startedAt']).total_seconds() / 60)
+
+    def left(self, entry_id, before, after):
+        if self._advance(before, after):
+            self._unqueue(self._entries.pop(entry_id))
+
+    def next_waiting(self, specialization):
+        waiting = self._waiting.get(specialization.lower())
+        return self._entries[waiting[0][2]] if waiting else None
+
+    def specializations(self):
+        """Specializations with walk-ins waiting or being seen, as first written"""
+        names = {}
+        for entry in self._entries.values():
+            names.setdefault(entry['specialization'].lower(), entry['specialization'])
+        return sorted(names.values())
+
+    def board(self, specialization, doctors, now):
+        """The walk-ins of ``specialization``: waiting ones in the order they will
+        be seen, with 'position' and 'estimatedWaitMinutes' (None when no shift
+        on duty reaches them), and those in consultation.
+
+        ``doctors`` maps each doctor on duty at ``now`` to (end of shift,
+        booked (start, end) still ahead, sorted).
+        """
+        key = specialization.lower()
+        length = timedelta(minutes=self.average_minutes(key))
+        seeing = [entry for entry in self._entries.values()
+                  if entry['status'] == 'in_consultation' and entry['specialization'].lower() == key]
+        free_from = {entry['doctorName']: entry['startedAt'] + length for entry in seeing}
+        waiting = [self._entries[item[2]] for item in self._waiting.get(key, ())]
+        starts = estimate_starts(len(waiting), {
+            name: (free_from.get(name, now), shift_end, booked) for name, (shift_end, booked) in doctors.items()
+        }, now, length)
+        return {
+            'specialization': specialization,
+            'averageMinutes': round(length.total_seconds() / 60, 1),
+            'doctorsOnDuty': sorted(doctors),
+            'waiting': [{
+                **entry,
+                'position': position,
+                'estimatedWaitMinutes': None if start is None else max(0, round((start - now).total_seconds() / 60)),
+            } for position, (entry, start) in enumerate(zip(waiting, starts), 1)],
+            'inConsultation': [dict(entry) for entry in seeing],
+        }
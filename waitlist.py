@@ -0,0 +1,99 @@
+# waitlist.py
+"""In-process priority queues over the ``waitlist`` table.
+
+Waiting requests are kept in one heap per doctor and one per
+specialization, ordered by priority (highest first) and then by request
+id (first come, first served).  When a slot is freed, ``take`` pops the
+best request from the doctor's heap and the doctor's specialization heap
+in O(log n); requests whose date window does not contain the slot are set
+aside and pushed back, and requests that are no longer waiting are dropped
+lazily as they surface.  The table stays the source of truth: the queue
+only proposes candidates, and the caller claims them with a conditional
+UPDATE.
+"""
+import heapq
+
+
+class WaitlistQueue:
+    """``loader()`` returns (max_id, waiting entries) where each entry is a
+    dict with 'id', 'patientName', 'doctorName', 'specialization',
+    'earliestTs', 'latestTs' (sortable timestamps) and 'priority'.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.max_id = None
+        self._entries = None
+        self._heaps = {}
+
+    def invalidate(self):
+        self.max_id = None
+        self._entries = None
+        self._heaps = {}
+
+    def _load(self):
+        self._entries = {}
+        self._heaps = {}
+        self.max_id, entries = self.loader()
+        for entry in entries:
+            self._push(entry)
+
+    def ensure_loaded(self, max_id=None):
+        """Load on first use, or reload when the table has rows this queue never saw."""
+        if self._entries is None or (max_id is not None and max_id != self.max_id):
+            self._load()
+
+    @staticmethod
+    def _keys(entry):
+        if entry['doctorName']:
+            yield ('doctor', entry['doctorName'])
+        if entry['specialization']:
+            yield ('specialization', entry['specialization'].lower())
+
+    def _push(self, entry):
+        self._entries[entry['id']] = entry
+        for key in self._keys(entry):
+            heapq.heappush(self._heaps.setdefault(key, []), (-entry['priority'], entry['id']))
+
+    def add(self, entry):
+        if self._entries is None:
+            return
+        self._push(entry)
+        self.max_id = max(self.max_id or 0, entry['id'])
+
+    def discard(self, entry_id):
+        # Heap items of a discarded entry are skipped when they reach the top
+        if self._entries is not None:
+            self._entries.pop(entry_id, None)
+
+    def __len__(self):
+        return len(self._entries or ())
+
+    def take(self, doctor_name, specialization, slot_ts):
+        """Remove and return the best waiting entry whose window contains ``slot_ts``."""
+        self.ensure_loaded()
+        heaps = [self._heaps[key] for key in (('doctor', doctor_name),
+                                              ('specialization', (specialization or "").lower()))
+                 if key in self._heaps]
+        set_aside = []
+        found = None
+        while found is None:
+            best = None
+            for heap in heaps:
+                while heap and heap[0][1] not in self._entries:
+                    heapq.heappop(heap)
+                if heap and (best is None or heap[0] < best[0]):
+                    best = heap
+            if best is None:
+                break
+            item = heapq.heappop(best)
+            entry = self._entries[item[1]]
+            if entry['earliestTs'] <= slot_ts <= entry['latestTs']:
+                found = entry
+            else:
+                set_aside.append((best, item))
+        for heap, item in set_aside:
+            heapq.heappush(heap, item)
+        if found is not None:
+            del self._entries[found['id']]
+        return found